@@ -2,6 +2,7 @@ from flask import Flask, session
 from flask_cors import CORS
 from flask_wtf.csrf import CSRFProtect
 from flask_login import LoginManager
+from flask_caching import Cache
 from .models import db, User
 from datetime import timedelta
 from flask import request
@@ -9,6 +10,10 @@ from flask import request
 # Inicializar extensiones
 csrf = CSRFProtect()
 login_manager = LoginManager()
+cache = Cache()
+
+# Tablas con contador de versión (ETag en la API)
+VERSIONED_TABLES = ('patients', 'appointments', 'medical_records')
 
 def create_app(test_config=None):
     app = Flask(__name__)
@@ -24,6 +29,7 @@ def create_app(test_config=None):
     db.init_app(app)
     csrf.init_app(app)
     login_manager.init_app(app)
+    cache.init_app(app)
     login_manager.login_view = 'auth.login'
     # CORS solo para rutas de API
     try:
@@ -65,9 +71,33 @@ def create_app(test_config=None):
         except Exception as e:
             app.logger.debug(f"No se pudo registrar {mod}: {e}")
     
+    # Tope del cuerpo de cada petición: Werkzeug responde 413 antes de volcar a
+    # disco una subida mayor que ATTACHMENT_MAX_MB (+1 MB para el resto del formulario)
+    if app.config.get('MAX_CONTENT_LENGTH') is None:
+        app.config['MAX_CONTENT_LENGTH'] = (app.config.get('ATTACHMENT_MAX_MB', 64) + 1) * 1024 * 1024
+
+    # Diccionario compartido opcional para comprimir las notas clínicas
+    if app.config.get('NOTES_COMPRESSION_DICT'):
+        from .infrastructure.persistence.compressed_text import configure_dictionary
+        with open(app.config['NOTES_COMPRESSION_DICT'], 'rb') as fh:
+            configure_dictionary(fh.read())
+
     # Crear tablas
     with app.app_context():
         db.create_all()
+        # Índice full-text de pacientes (SQLite FTS5); sin él la búsqueda usa ILIKE
+        from .adapters.sql_patient_search import install_patient_fts
+        app.extensions['patient_fts'] = (
+            app.config.get('PATIENT_FTS_ENABLED', True) and install_patient_fts(db.engine)
+        )
+        # Índice full-text de la historia clínica (título y notas)
+        from .adapters.sql_record_search import install_record_fts
+        app.extensions['record_fts'] = (
+            app.config.get('RECORD_FTS_ENABLED', True) and install_record_fts(db.engine)
+        )
+        # Contadores de versión por tabla para ETag / GET condicional
+        from .adapters.sql_table_versions import install_table_versions
+        install_table_versions(db.engine, VERSIONED_TABLES)
     
     # Agregar headers de seguridad (ISO 27001 - A.14.1.2, A.14.1.3)
     @app.after_request
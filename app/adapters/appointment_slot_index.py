@@ -0,0 +1,227 @@
+"""
+Índice de intervalos por día para la agenda de citas.
+
+Cada día cargado guarda la lista ordenada de inicios de las citas que ocupan
+agenda (todo estado salvo 'cancelled'). Como cada cita dura
+``Appointment.DURATION_MINUTES``, los fines quedan en el mismo orden que los
+inicios y una búsqueda binaria basta para saber si un intervalo choca con
+alguna cita: O(log n) por consulta, sin tocar la base de datos. Para cada
+cita se precalcula además el fin del bloque de citas contiguas que empieza en
+ella, de modo que un día lleno se salta en un solo paso.
+
+Hay una agenda por profesional (``employee_id``; ``None`` agrupa las citas
+sin profesional asignado). Los días se cargan bajo demanda con una consulta de
+rango sobre el índice compuesto ``(employee_id, scheduled_at)`` (varios días
+contiguos en una sola consulta) y se invalidan cuando una transacción que
+modificó citas de ese profesional y día hace commit, con los mismos eventos de
+sesión que el índice de prefijos de pacientes.
+"""
+import threading
+from bisect import bisect_left, bisect_right
+from functools import partial
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Dict, Iterable, List, Tuple
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, select
+from ..models import Appointment, db
+
+EXTENSION_KEY = "appointment_slot_index"
+_PENDING_KEY = "appointment_slot_index_pending"
+
+# Granularidad de los horarios ofrecidos y días que se exploran como máximo
+SLOT_STEP = timedelta(minutes=15)
+SEARCH_HORIZON_DAYS = 90
+_LOAD_CHUNK_DAYS = 14
+
+Loader = Callable[[datetime, datetime], Iterable[Tuple[int, datetime]]]
+
+
+def _round_up(moment: datetime, step: timedelta) -> datetime:
+    midnight = datetime.combine(moment.date(), time.min)
+    remainder = (moment - midnight) % step
+    return moment if not remainder else moment + (step - remainder)
+
+
+def load_booked(start: datetime, end: datetime, employee_id: int | None = None) -> List[Tuple[int, datetime]]:
+    """Citas del profesional que ocupan agenda con inicio en [start, end), vía (employee_id, scheduled_at)."""
+    provider = Appointment.employee_id.is_(None) if employee_id is None else Appointment.employee_id == employee_id
+    rows = db.session.execute(
+        select(Appointment.id, Appointment.scheduled_at)
+        .where(provider)
+        .where(Appointment.scheduled_at >= start)
+        .where(Appointment.scheduled_at < end)
+        .where(Appointment.status != 'cancelled')
+    )
+    return [tuple(row) for row in rows]
+
+
+class AppointmentSlotIndex:
+    def __init__(self, loader: Loader = load_booked, duration: timedelta | None = None):
+        self._loader = loader
+        self.duration = duration or timedelta(minutes=Appointment.DURATION_MINUTES)
+        # día -> (inicios ordenados, ids, fin del bloque contiguo desde cada cita)
+        self._days: Dict[date, Tuple[List[datetime], List[int], List[datetime]]] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._days)
+
+    # --- Carga e invalidación --- #
+
+    def load(self, first: date, last: date) -> None:
+        """Carga (o recarga) los días [first, last] con una única consulta de rango."""
+        start = datetime.combine(first, time.min)
+        end = datetime.combine(last + timedelta(days=1), time.min)
+        days: Dict[date, List[Tuple[datetime, int]]] = {
+            first + timedelta(days=i): [] for i in range((last - first).days + 1)
+        }
+        for appointment_id, scheduled_at in self._loader(start, end):
+            days[scheduled_at.date()].append((scheduled_at, appointment_id))
+        loaded = {day: self._day_entry(sorted(entries)) for day, entries in days.items()}
+        with self._lock:
+            self._days.update(loaded)
+
+    def _day_entry(self, entries: List[Tuple[datetime, int]]) -> Tuple[List[datetime], List[int], List[datetime]]:
+        starts = [s for s, _ in entries]
+        run_ends = [s + self.duration for s in starts]
+        for i in range(len(starts) - 2, -1, -1):
+            if starts[i + 1] <= run_ends[i]:
+                run_ends[i] = run_ends[i + 1]
+        return starts, [i for _, i in entries], run_ends
+
+    def ensure(self, first: date, last: date) -> None:
+        with self._lock:
+            missing = [
+                first + timedelta(days=i)
+                for i in range((last - first).days + 1)
+                if first + timedelta(days=i) not in self._days
+            ]
+        if missing:
+            self.load(missing[0], missing[-1])
+
+    def invalidate(self, days: Iterable[date]) -> None:
+        with self._lock:
+            for day in days:
+                self._days.pop(day, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._days.clear()
+
+    # --- Consultas --- #
+
+    def _blocked_until(self, start: datetime, end: datetime) -> datetime | None:
+        """Si [start, end) choca con alguna cita cargada, fin del bloque que la contiene; si no, None."""
+        day = (start - self.duration).date()
+        while day <= end.date():
+            starts, _, run_ends = self._days.get(day, ((), (), ()))
+            # Primera cita que termina después de `start` (s + duración > start)
+            pos = bisect_right(starts, start - self.duration)
+            if pos < len(starts) and starts[pos] < end:
+                return run_ends[pos]
+            day += timedelta(days=1)
+        return None
+
+    def overlapping(self, start: datetime, end: datetime, refresh: bool = False) -> List[int]:
+        """
+        IDs de las citas que se solapan con [start, end); carga los días
+        necesarios. Con ``refresh`` los relee de la base de datos, para que la
+        validación al agendar no dependa de otro proceso.
+        """
+        first, last = (start - self.duration).date(), end.date()
+        if refresh:
+            self.load(first, last)
+        else:
+            self.ensure(first, last)
+        result = []
+        with self._lock:
+            day = first
+            while day <= last:
+                starts, ids, _ = self._days.get(day, ((), (), ()))
+                pos = bisect_right(starts, start - self.duration)
+                stop = bisect_left(starts, end)
+                result.extend(ids[pos:stop])
+                day += timedelta(days=1)
+        return result
+
+    def free_slots(self, after: datetime, length: timedelta, limit: int,
+                   workday: Tuple[time, time], horizon_days: int = SEARCH_HORIZON_DAYS) -> List[datetime]:
+        """
+        Próximos `limit` inicios libres de duración `length` desde `after`,
+        alineados a SLOT_STEP y dentro del horario `workday` de cada día.
+        Los horarios devueltos no se solapan entre sí.
+        """
+        if limit < 1 or length <= timedelta(0):
+            return []
+        opens, closes = workday
+        slots: List[datetime] = []
+        day = after.date()
+        last_day = day + timedelta(days=horizon_days)
+        while day <= last_day and len(slots) < limit:
+            if day not in self._days or day - timedelta(days=1) not in self._days:
+                self.ensure(day - timedelta(days=1), min(day + timedelta(days=_LOAD_CHUNK_DAYS), last_day))
+            with self._lock:
+                candidate = _round_up(max(after, datetime.combine(day, opens)), SLOT_STEP)
+                close = datetime.combine(day, closes)
+                while candidate + length <= close and len(slots) < limit:
+                    blocked_until = self._blocked_until(candidate, candidate + length)
+                    if blocked_until is None:
+                        slots.append(candidate)
+                        candidate += length
+                    else:
+                        candidate = _round_up(blocked_until, SLOT_STEP)
+            day += timedelta(days=1)
+        return slots
+
+
+def get_appointment_slot_index(employee_id: int | None = None) -> AppointmentSlotIndex:
+    """Retorna la agenda del profesional en la aplicación actual, creándola en el primer uso."""
+    indexes = current_app.extensions.setdefault(EXTENSION_KEY, {})
+    index = indexes.get(employee_id)
+    if index is None:
+        index = AppointmentSlotIndex(partial(load_booked, employee_id=employee_id))
+        indexes[employee_id] = index
+    return index
+
+
+# --- Invalidación con eventos de sesión --- #
+
+def queue_slot_invalidation(session, changes: Iterable[Tuple[int | None, datetime]]) -> None:
+    """
+    Registra pares (employee_id, scheduled_at) modificados con SQL Core (sin
+    flush ORM) para invalidar esos días en el próximo commit, igual que los
+    cambios vía ORM.
+    """
+    pending = session.info.setdefault(_PENDING_KEY, set())
+    pending.update((employee_id, moment.date()) for employee_id, moment in changes if moment is not None)
+
+
+@event.listens_for(db.session, "after_flush")
+def _collect_appointment_days(session, flush_context):
+    changes = []
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Appointment):
+            state = inspect(obj)
+            # Al reprogramar o reasignar, el día y profesional anteriores también cambian
+            employees = {obj.employee_id, *(state.attrs.employee_id.history.deleted or ())}
+            moments = {obj.scheduled_at, *(state.attrs.scheduled_at.history.deleted or ())}
+            changes.extend((employee_id, moment) for employee_id in employees for moment in moments)
+    if changes:
+        queue_slot_invalidation(session, changes)
+
+
+@event.listens_for(db.session, "after_commit")
+def _apply_appointment_days(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending or not has_app_context():
+        return
+    indexes = current_app.extensions.get(EXTENSION_KEY) or {}
+    for employee_id, day in pending:
+        index = indexes.get(employee_id)
+        if index is not None:
+            index.invalidate([day])
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def _discard_appointment_days(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,172 @@
+"""
+Índice de prefijos en memoria para el autocompletado de pacientes.
+
+Mantiene un arreglo ordenado de tuplas (clave_normalizada, patient_id) y
+resuelve cada consulta con búsqueda binaria: O(log n + k) por sugerencia.
+Las claves son el documento y cada sufijo por palabras del nombre completo
+("jose perez gomez", "perez gomez", "gomez", "perez gomez jose"), sin
+acentos y en minúsculas.
+
+El índice vive por aplicación en ``app.extensions`` y se construye en el
+primer uso. Después se actualiza de forma incremental con los eventos de
+sesión de SQLAlchemy: los pacientes insertados, modificados o eliminados en
+un flush se aplican al índice solo cuando la transacción hace commit.
+"""
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Tuple
+from flask import current_app, has_app_context
+from sqlalchemy import event, select
+from ..models import Patient, db
+
+EXTENSION_KEY = "patient_prefix_index"
+_PENDING_KEY = "patient_prefix_index_pending"
+
+
+def normalize(value: str | None) -> str:
+    """Minúsculas, sin acentos y con espacios colapsados."""
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.casefold().split())
+
+
+def _keys_for(first_name: str | None, last_name: str | None, document: str | None) -> List[str]:
+    words = normalize(f"{first_name or ''} {last_name or ''}").split()
+    keys = {" ".join(words[i:]) for i in range(len(words))}
+    last_first = normalize(f"{last_name or ''} {first_name or ''}")
+    if last_first:
+        keys.add(last_first)
+    doc = normalize(document)
+    if doc:
+        keys.add(doc)
+    return sorted(keys)
+
+
+class PatientPrefixIndex:
+    def __init__(self):
+        self._entries: List[Tuple[str, int]] = []
+        self._patients: Dict[int, Tuple[str, str, str, List[str]]] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._patients)
+
+    def build(self, rows: Iterable[Tuple[int, str, str, str]]) -> None:
+        """Reconstruye el índice completo a partir de filas (id, first_name, last_name, document)."""
+        entries: List[Tuple[str, int]] = []
+        patients: Dict[int, Tuple[str, str, str, List[str]]] = {}
+        for patient_id, first_name, last_name, document in rows:
+            keys = _keys_for(first_name, last_name, document)
+            patients[patient_id] = (first_name, last_name, document, keys)
+            entries.extend((key, patient_id) for key in keys)
+        entries.sort()
+        with self._lock:
+            self._entries = entries
+            self._patients = patients
+
+    def upsert(self, patient_id: int, first_name: str, last_name: str, document: str) -> None:
+        with self._lock:
+            self._remove_entries(patient_id)
+            keys = _keys_for(first_name, last_name, document)
+            self._patients[patient_id] = (first_name, last_name, document, keys)
+            for key in keys:
+                insort(self._entries, (key, patient_id))
+
+    def remove(self, patient_id: int) -> None:
+        with self._lock:
+            self._remove_entries(patient_id)
+            self._patients.pop(patient_id, None)
+
+    def _remove_entries(self, patient_id: int) -> None:
+        current = self._patients.get(patient_id)
+        if not current:
+            return
+        for key in current[3]:
+            pos = bisect_left(self._entries, (key, patient_id))
+            if pos < len(self._entries) and self._entries[pos] == (key, patient_id):
+                del self._entries[pos]
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[dict]:
+        """Retorna hasta `limit` pacientes distintos cuya clave empieza por `prefix`."""
+        needle = normalize(prefix)
+        if not needle or limit < 1:
+            return []
+        results: List[dict] = []
+        seen = set()
+        with self._lock:
+            pos = bisect_left(self._entries, (needle,))
+            while pos < len(self._entries) and len(results) < limit:
+                key, patient_id = self._entries[pos]
+                if not key.startswith(needle):
+                    break
+                if patient_id not in seen:
+                    seen.add(patient_id)
+                    first_name, last_name, document, _ = self._patients[patient_id]
+                    results.append({
+                        "id": patient_id,
+                        "first_name": first_name,
+                        "last_name": last_name,
+                        "document": document,
+                    })
+                pos += 1
+        return results
+
+
+def get_patient_prefix_index() -> PatientPrefixIndex:
+    """Retorna el índice de la aplicación actual, construyéndolo en el primer uso."""
+    index = current_app.extensions.get(EXTENSION_KEY)
+    if index is None:
+        index = PatientPrefixIndex()
+        rows = db.session.execute(
+            select(Patient.id, Patient.first_name, Patient.last_name, Patient.document)
+            .execution_options(yield_per=10000)
+        )
+        index.build(tuple(row) for row in rows)
+        current_app.extensions[EXTENSION_KEY] = index
+    return index
+
+
+# --- Sincronización incremental con eventos de sesión --- #
+
+def queue_patient_upserts(session, rows: Iterable[dict]) -> None:
+    """
+    Registra altas/cambios hechos con SQL Core (sin flush ORM) para aplicarlos
+    al índice en el próximo commit, igual que los cambios vía ORM.
+    """
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    for row in rows:
+        pending[row["id"]] = (row["first_name"], row["last_name"], row["document"])
+
+
+@event.listens_for(db.session, "after_flush")
+def _collect_patient_changes(session, flush_context):
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    for obj in session.new.union(session.dirty):
+        if isinstance(obj, Patient):
+            pending[obj.id] = (obj.first_name, obj.last_name, obj.document)
+    for obj in session.deleted:
+        if isinstance(obj, Patient):
+            pending[obj.id] = None
+
+
+@event.listens_for(db.session, "after_commit")
+def _apply_patient_changes(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending or not has_app_context():
+        return
+    index = current_app.extensions.get(EXTENSION_KEY)
+    if index is None:
+        return
+    for patient_id, values in pending.items():
+        if values is None:
+            index.remove(patient_id)
+        else:
+            index.upsert(patient_id, *values)
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def _discard_patient_changes(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
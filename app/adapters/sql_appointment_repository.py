@@ -1,6 +1,58 @@
-from typing import List
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta
+from typing import Dict, List, Tuple
+from sqlalchemy import and_, exists, func, insert, literal, or_, select, union_all, update
+from sqlalchemy.orm import joinedload, selectinload
 from ..services.ports import AppointmentRepositoryPort
 from ..models import Appointment, db
+from .appointment_slot_index import get_appointment_slot_index, queue_slot_invalidation
+
+
+# Clave (pg_advisory_xact_lock) que serializa las reservas de un mismo profesional
+SCHEDULE_LOCK_ID = 4201
+
+# Estrategias para precargar Appointment.patient y evitar un SELECT por cita
+PATIENT_LOADERS = {
+    'joined': joinedload,
+    'selectin': selectinload,
+}
+
+
+def _with_patient(query, load_patient: str | None):
+    if load_patient is None:
+        return query
+    try:
+        loader = PATIENT_LOADERS[load_patient]
+    except KeyError:
+        raise ValueError(f"Estrategia de carga no soportada: {load_patient}")
+    return query.options(loader(Appointment.patient))
+
+
+def _provider(employee_id: int | None):
+    return Appointment.employee_id.is_(None) if employee_id is None else Appointment.employee_id == employee_id
+
+
+def _period_bucket(period: str):
+    """Expresión SQL con el inicio del día o de la semana (lunes) de scheduled_at."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        return func.date(func.date_trunc(period, Appointment.scheduled_at))
+    if period == "week":
+        return func.date(Appointment.scheduled_at, "weekday 0", "-6 days")
+    return func.date(Appointment.scheduled_at)
+
+
+def _filtered(query, patient_id: int | None, date_from: datetime | None, date_to: datetime | None,
+              employee_id: int | None = None):
+    if patient_id is not None:
+        query = query.filter(Appointment.patient_id == patient_id)
+    if employee_id is not None:
+        query = query.filter(Appointment.employee_id == employee_id)
+    if date_from is not None:
+        query = query.filter(Appointment.scheduled_at >= date_from)
+    if date_to is not None:
+        query = query.filter(Appointment.scheduled_at < date_to)
+    return query
 
 
 class SqlAlchemyAppointmentRepository(AppointmentRepositoryPort):
@@ -9,15 +61,176 @@ class SqlAlchemyAppointmentRepository(AppointmentRepositoryPort):
         db.session.commit()
         return appointment
 
-    def get(self, appointment_id: int) -> Appointment | None:
-        return Appointment.query.get(appointment_id)
+    def add_if_free(self, appointment: Appointment) -> Appointment | None:
+        ids, _ = self.add_many_if_free([{
+            "patient_id": appointment.patient_id, "scheduled_at": appointment.scheduled_at,
+            "reason": appointment.reason, "employee_id": appointment.employee_id,
+        }])
+        return db.session.get(Appointment, ids[0]) if ids else None
+
+    def add_many_if_free(self, rows: List[dict]) -> Tuple[List[int], List[datetime]]:
+        if not rows:
+            return [], []
+        duration = timedelta(minutes=Appointment.DURATION_MINUTES)
+        columns = Appointment.__table__.c
+        now = datetime.utcnow()
+        rows = [{"employee_id": None, "reason": None, "status": "scheduled", "created_at": now, **row} for row in rows]
+        names = ["patient_id", "employee_id", "scheduled_at", "reason", "status", "created_at"]
+        # Una fila candidata por cita con su ventana de choque (lo, hi)
+        selects = [
+            select(
+                *(literal(row[name], columns[name].type).label(name) for name in names),
+                literal(row["scheduled_at"] - duration, columns.scheduled_at.type).label("lo"),
+                literal(row["scheduled_at"] + duration, columns.scheduled_at.type).label("hi"),
+            )
+            for row in rows
+        ]
+        candidates = (selects[0] if len(selects) == 1 else union_all(*selects)).subquery("candidates")
+        taken = (
+            select(Appointment.id)
+            .where(Appointment.employee_id.is_not_distinct_from(candidates.c.employee_id))
+            .where(Appointment.status != 'cancelled')
+            .where(Appointment.scheduled_at > candidates.c.lo, Appointment.scheduled_at < candidates.c.hi)
+        )
+        # Un solo INSERT ... SELECT ... WHERE NOT EXISTS: el choque se revisa
+        # en la misma sentencia que escribe (SQLite serializa las escrituras)
+        stmt = insert(Appointment).from_select(
+            names, select(*(candidates.c[name] for name in names)).where(~exists(taken))
+        ).returning(Appointment.id, Appointment.scheduled_at, Appointment.employee_id)
+        try:
+            if db.session.get_bind().dialect.name == "postgresql":
+                # En READ COMMITTED el NOT EXISTS no ve la reserva de otra
+                # transacción en curso: se serializan las del mismo profesional
+                for employee_id in sorted({row["employee_id"] or 0 for row in rows}):
+                    db.session.execute(select(func.pg_advisory_xact_lock(SCHEDULE_LOCK_ID, employee_id)))
+            inserted = db.session.execute(stmt).all()
+            if len(inserted) < len(rows):
+                # Todo o nada: si una cita choca no se guarda ninguna
+                db.session.rollback()
+                placed = {scheduled_at for _, scheduled_at, _ in inserted}
+                return [], [row["scheduled_at"] for row in rows if row["scheduled_at"] not in placed]
+            queue_slot_invalidation(db.session, [(employee_id, scheduled_at) for _, scheduled_at, employee_id in inserted])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return sorted(row[0] for row in inserted), []
+
+    def get(self, appointment_id: int, load_patient: str | None = None) -> Appointment | None:
+        if load_patient is None:
+            return Appointment.query.get(appointment_id)
+        return _with_patient(Appointment.query, load_patient).filter(Appointment.id == appointment_id).one_or_none()
 
     def update(self, appointment: Appointment) -> Appointment:
         db.session.commit()
         return appointment
 
-    def list(self) -> List[Appointment]:
-        return Appointment.query.order_by(Appointment.scheduled_at.asc()).all()
+    def list(self, load_patient: str | None = None) -> List[Appointment]:
+        return _with_patient(Appointment.query, load_patient).order_by(Appointment.scheduled_at.asc()).all()
 
     def list_by_patient(self, patient_id: int) -> List[Appointment]:
         return Appointment.query.filter_by(patient_id=patient_id).order_by(Appointment.scheduled_at.desc()).all()
+
+    def search_page(self, page: int, per_page: int, status: str | None = None, patient_id: int | None = None,
+                    date_from: datetime | None = None, date_to: datetime | None = None,
+                    load_patient: str | None = None, employee_id: int | None = None) -> List[Appointment]:
+        query = _filtered(_with_patient(Appointment.query, load_patient), patient_id, date_from, date_to, employee_id)
+        if status:
+            query = query.filter(Appointment.status == status)
+        return (
+            query.order_by(Appointment.scheduled_at.asc(), Appointment.id.asc())
+            .offset((page - 1) * per_page)
+            .limit(per_page)
+            .all()
+        )
+
+    def count_by_status(self, patient_id: int | None = None, date_from: datetime | None = None,
+                        date_to: datetime | None = None, employee_id: int | None = None) -> Dict[str, int]:
+        query = db.session.query(Appointment.status, func.count(Appointment.id))
+        query = _filtered(query, patient_id, date_from, date_to, employee_id).group_by(Appointment.status)
+        return {status: count for status, count in query.all()}
+
+    def find_conflicts(self, starts: List[datetime], employee_id: int | None = None) -> Dict[datetime, List[int]]:
+        if not starts:
+            return {}
+        duration = timedelta(minutes=Appointment.DURATION_MINUTES)
+        # Una ventana (t - duración, t + duración) por inicio, unidas con OR en
+        # una sola consulta: cada rango se resuelve con (employee_id, scheduled_at)
+        windows = [
+            and_(Appointment.scheduled_at > start - duration, Appointment.scheduled_at < start + duration)
+            for start in starts
+        ]
+        rows = db.session.execute(
+            select(Appointment.scheduled_at, Appointment.id)
+            .where(_provider(employee_id))
+            .where(Appointment.status != 'cancelled')
+            .where(or_(*windows))
+            .order_by(Appointment.scheduled_at)
+        ).all()
+        booked = [scheduled_at for scheduled_at, _ in rows]
+        conflicts = {}
+        for start in starts:
+            lo = bisect_right(booked, start - duration)
+            hi = bisect_left(booked, start + duration)
+            if lo < hi:
+                conflicts[start] = [appointment_id for _, appointment_id in rows[lo:hi]]
+        return conflicts
+
+    def find_overlapping(self, start: datetime, end: datetime, employee_id: int | None = None) -> List[int]:
+        return get_appointment_slot_index(employee_id).overlapping(start, end, refresh=True)
+
+    def next_free_slots(self, after: datetime, length: timedelta, limit: int,
+                        workday: Tuple[time, time], employee_id: int | None = None) -> List[datetime]:
+        return get_appointment_slot_index(employee_id).free_slots(after, length, limit, workday)
+
+    def list_for_provider(self, employee_id: int, start: datetime, end: datetime) -> List[Appointment]:
+        return (
+            Appointment.query.options(joinedload(Appointment.patient))
+            .filter(Appointment.employee_id == employee_id)
+            .filter(Appointment.scheduled_at >= start, Appointment.scheduled_at < end)
+            .order_by(Appointment.scheduled_at.asc(), Appointment.id.asc())
+            .all()
+        )
+
+    def booked_by_provider(self, date_from: datetime, date_to: datetime,
+                           period: str = "day") -> List[Tuple[int, str, int]]:
+        bucket = _period_bucket(period).label("bucket")
+        rows = db.session.execute(
+            select(Appointment.employee_id, bucket, func.count(Appointment.id))
+            .where(Appointment.employee_id.is_not(None))
+            .where(Appointment.scheduled_at >= date_from, Appointment.scheduled_at < date_to)
+            .where(Appointment.status != 'cancelled')
+            .group_by(Appointment.employee_id, bucket)
+            .order_by(Appointment.employee_id, bucket)
+        )
+        return [(employee_id, str(day), count) for employee_id, day, count in rows]
+
+    def transition_returning(self, appointment_id: int, from_status: str,
+                             to_status: str) -> Tuple[datetime, int | None, int] | None:
+        changed = self._transition_rows([appointment_id], from_status, to_status)
+        return tuple(changed[0][1:]) if changed else None
+
+    def transition_many(self, appointment_ids: List[int], from_status: str, to_status: str) -> List[int]:
+        return sorted(row[0] for row in self._transition_rows(appointment_ids, from_status, to_status))
+
+    def _transition_rows(self, appointment_ids: List[int], from_status: str,
+                         to_status: str) -> List[Tuple[int, datetime, int | None, int]]:
+        condition = (Appointment.id.in_(appointment_ids), Appointment.status == from_status)
+        stmt = update(Appointment).where(*condition).values(status=to_status)
+        if db.session.get_bind().dialect.update_returning:
+            changed = db.session.execute(
+                stmt.returning(Appointment.id, Appointment.scheduled_at, Appointment.employee_id,
+                               Appointment.patient_id),
+                execution_options={"synchronize_session": "fetch"},
+            ).all()
+        else:
+            # Sin UPDATE ... RETURNING: se bloquean y leen las filas candidatas
+            # y se actualizan con la misma condición dentro de la transacción
+            changed = db.session.execute(
+                select(Appointment.id, Appointment.scheduled_at, Appointment.employee_id, Appointment.patient_id)
+                .where(*condition).with_for_update()
+            ).all()
+            db.session.execute(stmt, execution_options={"synchronize_session": "fetch"})
+        queue_slot_invalidation(db.session, [(row.employee_id, row.scheduled_at) for row in changed])
+        db.session.commit()
+        return [tuple(row) for row in changed]
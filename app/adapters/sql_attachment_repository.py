@@ -0,0 +1,16 @@
+from typing import List
+from ..models import RecordAttachment, db
+from ..services.ports import AttachmentRepositoryPort
+
+
+class SqlAlchemyAttachmentRepository(AttachmentRepositoryPort):
+    def add(self, attachment: RecordAttachment) -> RecordAttachment:
+        db.session.add(attachment)
+        db.session.commit()
+        return attachment
+
+    def get(self, attachment_id: int) -> RecordAttachment | None:
+        return db.session.get(RecordAttachment, attachment_id)
+
+    def list_by_record(self, record_id: int) -> List[RecordAttachment]:
+        return RecordAttachment.query.filter_by(record_id=record_id).order_by(RecordAttachment.id).all()
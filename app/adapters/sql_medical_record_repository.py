@@ -1,5 +1,12 @@
+from datetime import datetime
+from typing import List, Tuple
+from flask import current_app
+from sqlalchemy import and_, func, literal_column, or_, select
+from sqlalchemy.orm import defer
 from ..services.ports import MedicalRecordRepositoryPort
-from ..models import MedicalRecord, db
+from ..models import MedicalRecord, Patient, db
+from .sql_patient_search import build_match_query
+from .sql_record_search import FTS_TABLE, MARK_END, MARK_START, SNIPPET_TOKENS, TITLE_WEIGHT, records_fts
 
 
 class SqlAlchemyMedicalRecordRepository(MedicalRecordRepositoryPort):
@@ -8,5 +15,61 @@ class SqlAlchemyMedicalRecordRepository(MedicalRecordRepositoryPort):
         db.session.commit()
         return record
 
-    def list_by_patient(self, patient_id: int) -> list[MedicalRecord]:
-        return MedicalRecord.query.filter_by(patient_id=patient_id).order_by(MedicalRecord.created_at.desc()).all()
+    def get(self, record_id: int) -> MedicalRecord | None:
+        return db.session.get(MedicalRecord, record_id)
+
+    def list_by_patient(self, patient_id: int, after: Tuple[datetime, int] | None = None,
+                        limit: int = 20) -> Tuple[List[MedicalRecord], bool]:
+        # notes puede ser muy larga: se difiere y el listado usa preview
+        query = MedicalRecord.query.options(defer(MedicalRecord.notes)).filter(MedicalRecord.patient_id == patient_id)
+        if after is not None:
+            created_at, record_id = after
+            # Equivalente a (created_at, id) < (:created_at, :id), soportado por SQLite
+            query = query.filter(
+                or_(
+                    MedicalRecord.created_at < created_at,
+                    and_(MedicalRecord.created_at == created_at, MedicalRecord.id < record_id),
+                )
+            )
+        # Se pide una fila extra para saber si existe página siguiente sin COUNT
+        rows = (
+            query.order_by(MedicalRecord.created_at.desc(), MedicalRecord.id.desc())
+            .limit(limit + 1)
+            .all()
+        )
+        return rows[:limit], len(rows) > limit
+
+    def search(self, q: str, page: int, per_page: int) -> Tuple[List[dict], bool]:
+        match = build_match_query(q) if current_app.extensions.get("record_fts") else None
+        columns = [
+            MedicalRecord.id, MedicalRecord.patient_id, MedicalRecord.created_at,
+            Patient.first_name, Patient.last_name, Patient.document,
+        ]
+        if match:
+            fts = literal_column(FTS_TABLE)
+            stmt = (
+                select(
+                    *columns,
+                    func.highlight(fts, 0, MARK_START, MARK_END).label("title"),
+                    func.snippet(fts, 1, MARK_START, MARK_END, "…", SNIPPET_TOKENS).label("snippet"),
+                )
+                .select_from(records_fts)
+                .join(MedicalRecord, MedicalRecord.id == records_fts.c.rowid)
+                .join(Patient, Patient.id == MedicalRecord.patient_id)
+                .where(records_fts.c[FTS_TABLE].match(match))
+                # bm25: menor valor = más relevante
+                .order_by(func.bm25(fts, TITLE_WEIGHT, 1.0), MedicalRecord.created_at.desc())
+            )
+        else:
+            # Sin FTS5 (otro motor): coincidencia simple, sin ranking ni resaltado.
+            # notes está comprimida: solo se compara el título y el extracto
+            like = f"%{q}%"
+            stmt = (
+                select(*columns, MedicalRecord.title, MedicalRecord.preview.label("snippet"))
+                .join(Patient, Patient.id == MedicalRecord.patient_id)
+                .where(or_(MedicalRecord.title.ilike(like), MedicalRecord.preview.ilike(like)))
+                .order_by(MedicalRecord.created_at.desc(), MedicalRecord.id.desc())
+            )
+        # Se pide una fila extra para saber si existe página siguiente sin COUNT
+        rows = db.session.execute(stmt.offset((page - 1) * per_page).limit(per_page + 1)).mappings().all()
+        return [dict(row) for row in rows[:per_page]], len(rows) > per_page
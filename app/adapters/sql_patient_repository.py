@@ -1,7 +1,50 @@
-from typing import List, Tuple
+from datetime import datetime
+from typing import Iterator, List, Tuple
+from flask import current_app
 from ..services.ports import PatientRepositoryPort
 from ..models import Patient, db
-from sqlalchemy import or_
+from .sql_patient_search import patients_fts, build_match_query
+from .sql_table_versions import get_table_version
+from .patient_prefix_index import get_patient_prefix_index, queue_patient_upserts
+from sqlalchemy import or_, and_, func, select, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import load_only, selectinload
+
+ESTIMATE_COUNT_CAP = 1000
+EXPORT_BATCH_SIZE = 1000
+_RELATION_TABLES = {"appointments": "appointments", "records": "medical_records"}
+
+
+def _dialect_insert():
+    """insert() del dialecto activo si soporta ON CONFLICT, o None."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "sqlite":
+        return sqlite.insert(Patient)
+    if dialect == "postgresql":
+        return postgresql.insert(Patient)
+    return None
+
+
+def _insert_ignoring_duplicates():
+    """INSERT que omite conflictos en `document` (red de seguridad ante carreras)."""
+    stmt = _dialect_insert()
+    if stmt is None:
+        return insert(Patient)
+    return stmt.on_conflict_do_nothing(index_elements=["document"])
+
+
+def _project(query, columns: List[str] | None, as_rows: bool):
+    """
+    Proyección de columnas. Con as_rows la query retorna filas planas (Row)
+    con `columns` (todas por defecto), sin entidades ORM ni identity map; si
+    no, entidades con solo `columns` (y la PK) cargadas y el resto diferido.
+    """
+    if as_rows:
+        names = columns or [c.key for c in Patient.__table__.columns]
+        return query.with_entities(*(getattr(Patient, c) for c in names))
+    if not columns:
+        return query
+    return query.options(load_only(*(getattr(Patient, c) for c in columns)))
 
 
 class SqlAlchemyPatientRepository(PatientRepositoryPort):
@@ -29,8 +72,77 @@ class SqlAlchemyPatientRepository(PatientRepositoryPort):
     def list(self) -> List[Patient]:
         return Patient.query.order_by(Patient.created_at.desc()).all()
 
-    def search_paginated(self, q: str | None, page: int, per_page: int) -> Tuple[List[Patient], int]:
-        query = Patient.query
+    def get_existing_documents(self, documents: List[str]) -> set[str]:
+        if not documents:
+            return set()
+        stmt = select(Patient.document).where(Patient.document.in_(set(documents)))
+        return set(db.session.scalars(stmt))
+
+    def add_many(self, rows: List[dict]) -> dict[str, int]:
+        if not rows:
+            return {}
+        stmt = _insert_ignoring_duplicates().returning(
+            Patient.id, Patient.first_name, Patient.last_name, Patient.document
+        )
+        try:
+            inserted = [dict(r._mapping) for r in db.session.execute(stmt, rows)]
+            queue_patient_upserts(db.session, inserted)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return {r["document"]: r["id"] for r in inserted}
+
+    def upsert_by_document(self, values: dict) -> Tuple[Patient, bool]:
+        # created_at explícito: si la fila retornada lo conserva, fue un INSERT;
+        # en conflicto el UPDATE no toca created_at y retorna el original
+        now = datetime.utcnow()
+        stmt = _dialect_insert()
+        if stmt is None:
+            return self._upsert_by_document_fallback(values)
+        update_cols = {k: getattr(stmt.excluded, k) for k in values if k != "document"}
+        stmt = (
+            stmt.values(**values, created_at=now)
+            .on_conflict_do_update(index_elements=["document"], set_=update_cols)
+            .returning(Patient)
+        )
+        try:
+            patient = db.session.scalars(stmt, execution_options={"populate_existing": True}).one()
+            queue_patient_upserts(db.session, [{
+                "id": patient.id,
+                "first_name": patient.first_name,
+                "last_name": patient.last_name,
+                "document": patient.document,
+            }])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return patient, patient.created_at == now
+
+    def _upsert_by_document_fallback(self, values: dict) -> Tuple[Patient, bool]:
+        # Motores sin ON CONFLICT: dos round trips (SELECT + INSERT/UPDATE)
+        patient = self.get_by_document(values["document"])
+        if patient is None:
+            return self.add(Patient(**values)), True
+        for key, value in values.items():
+            setattr(patient, key, value)
+        return self.update(patient), False
+
+    def _search_query(self, q: str | None, query=None):
+        """
+        Aplica el filtro de búsqueda a `query` (Query ORM o select() Core; por
+        defecto Patient.query). Retorna (query, ranked): ranked indica que la
+        query filtra por FTS5.
+        """
+        if query is None:
+            query = Patient.query
+        match = build_match_query(q) if q and current_app.extensions.get("patient_fts") else None
+        if match:
+            query = query.join(patients_fts, patients_fts.c.rowid == Patient.id).filter(
+                patients_fts.c.patients_fts.match(match)
+            )
+            return query, True
         if q:
             like = f"%{q}%"
             query = query.filter(
@@ -40,11 +152,82 @@ class SqlAlchemyPatientRepository(PatientRepositoryPort):
                     Patient.document.ilike(like),
                 )
             )
-        total = query.count()
-        items = (
-            query.order_by(Patient.created_at.desc())
+        return query, False
+
+    def search_paginated(self, q: str | None, page: int, per_page: int) -> Tuple[List[Patient], int]:
+        return self.search_page(q, page, per_page), self.count(q)
+
+    def search_page(self, q: str | None, page: int, per_page: int, columns: List[str] | None = None,
+                    as_rows: bool = False) -> List[Patient]:
+        query, ranked = self._search_query(q)
+        query = _project(query, columns, as_rows)
+        order = [Patient.created_at.desc(), Patient.id.desc()]
+        if ranked:
+            # bm25: menor rank = más relevante
+            order.insert(0, patients_fts.c.rank)
+        return (
+            query.order_by(*order)
             .offset((page - 1) * per_page)
             .limit(per_page)
             .all()
         )
-        return items, total
+
+    def count(self, q: str | None) -> int:
+        query, _ = self._search_query(q)
+        return query.count()
+
+    def estimate_count(self, q: str | None) -> int:
+        if not q:
+            # max(id) se resuelve con la clave primaria sin recorrer la tabla
+            return db.session.scalar(select(func.max(Patient.id))) or 0
+        # Con filtro se cuenta hasta un tope: cota inferior de costo acotado
+        query, _ = self._search_query(q)
+        capped = query.with_entities(Patient.id).limit(ESTIMATE_COUNT_CAP).subquery()
+        return db.session.scalar(select(func.count()).select_from(capped)) or 0
+
+    def search_keyset(self, q: str | None, after: Tuple[datetime, int] | None, limit: int, columns: List[str] | None = None,
+                      as_rows: bool = False) -> Tuple[List[Patient], bool]:
+        query, _ = self._search_query(q)
+        # id y created_at hacen parte del cursor siguiente
+        query = _project(query, columns and list(dict.fromkeys([*columns, "id", "created_at"])), as_rows)
+        if after is not None:
+            created_at, patient_id = after
+            # Equivalente a (created_at, id) < (:created_at, :id), soportado por SQLite
+            query = query.filter(
+                or_(
+                    Patient.created_at < created_at,
+                    and_(Patient.created_at == created_at, Patient.id < patient_id),
+                )
+            )
+        # Se pide una fila extra para saber si existe página siguiente sin COUNT
+        rows = (
+            query.order_by(Patient.created_at.desc(), Patient.id.desc())
+            .limit(limit + 1)
+            .all()
+        )
+        return rows[:limit], len(rows) > limit
+
+    def iter_rows(self, q: str | None) -> Iterator[dict]:
+        # Core select + yield_per: filas planas por lotes, sin objetos ORM
+        # ni identity map, para que la memoria no crezca con la tabla
+        stmt, _ = self._search_query(q, select(*Patient.__table__.columns))
+        stmt = stmt.order_by(Patient.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+        for row in db.session.execute(stmt):
+            yield dict(row._mapping)
+
+    def get_many(self, patient_ids: List[int], include: List[str] | None = None) -> List[Patient]:
+        if not patient_ids:
+            return []
+        options = [selectinload(getattr(Patient, rel)) for rel in (include or [])]
+        return Patient.query.options(*options).filter(Patient.id.in_(set(patient_ids))).all()
+
+    def data_version(self, include: List[str] | None = None) -> int | None:
+        # Los contadores solo crecen: la suma cambia con cualquier escritura
+        tables = [Patient.__tablename__] + [_RELATION_TABLES[rel] for rel in (include or [])]
+        versions = [get_table_version(table) for table in tables]
+        if any(v is None for v in versions):
+            return None
+        return sum(versions)
+
+    def suggest(self, prefix: str, limit: int) -> List[dict]:
+        return get_patient_prefix_index().suggest(prefix, limit)
@@ -0,0 +1,85 @@
+"""
+Índice de búsqueda full-text de pacientes sobre SQLite FTS5.
+
+La tabla virtual ``patients_fts`` usa ``patients`` como contenido externo
+(solo guarda el índice invertido) y se mantiene sincronizada mediante
+triggers de INSERT/UPDATE/DELETE, por lo que cualquier escritura -vía
+repositorio, ORM o SQL directo- queda indexada. El tokenizador
+``unicode61 remove_diacritics 2`` pliega acentos: "Perez" encuentra "Pérez".
+"""
+import re
+from sqlalchemy import column, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+FTS_TABLE = "patients_fts"
+
+patients_fts = table(FTS_TABLE, column("rowid"), column("rank"), column(FTS_TABLE))
+
+_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        first_name, last_name, document,
+        content='patients', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS patients_fts_ai AFTER INSERT ON patients BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, first_name, last_name, document)
+        VALUES (new.id, new.first_name, new.last_name, new.document);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS patients_fts_ad AFTER DELETE ON patients BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, first_name, last_name, document)
+        VALUES ('delete', old.id, old.first_name, old.last_name, old.document);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS patients_fts_au AFTER UPDATE OF first_name, last_name, document ON patients BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, first_name, last_name, document)
+        VALUES ('delete', old.id, old.first_name, old.last_name, old.document);
+        INSERT INTO {FTS_TABLE}(rowid, first_name, last_name, document)
+        VALUES (new.id, new.first_name, new.last_name, new.document);
+    END
+    """,
+]
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def install_patient_fts(engine: Engine) -> bool:
+    """
+    Crea (si no existe) el índice FTS5 y sus triggers. Si el índice es nuevo
+    se reconstruye a partir de las filas existentes. Retorna False cuando el
+    motor no es SQLite o no tiene FTS5 compilado; en ese caso la búsqueda
+    sigue usando ILIKE.
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": FTS_TABLE},
+            ).first()
+            for ddl in _DDL:
+                conn.execute(text(ddl))
+            if not exists:
+                conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    except OperationalError:
+        return False
+    return True
+
+
+def build_match_query(q: str) -> str | None:
+    """
+    Convierte el texto libre del usuario en una consulta MATCH segura: cada
+    palabra se cita y se busca como prefijo, combinadas con AND implícito.
+    Retorna None si no hay términos indexables.
+    """
+    tokens = _TOKEN_RE.findall(q)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
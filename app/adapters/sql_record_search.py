@@ -0,0 +1,138 @@
+"""
+Índice de búsqueda full-text de la historia clínica sobre SQLite FTS5.
+
+Como ``patients_fts``, la tabla ``medical_records_fts`` es de contenido
+externo: solo guarda el índice invertido, no una segunda copia (sin
+comprimir) de las notas. Su contenido es la vista ``medical_records_text``,
+que descomprime ``notes`` con la función SQL ``ips_notes_text`` registrada
+en cada conexión del pool; ``highlight()`` y ``snippet()`` leen el texto por
+ahí. El índice se sincroniza en el mismo flush que escribe la entrada
+(eventos de sesión de SQLAlchemy), así que ``MedicalRecordService.add_entry``
+y cualquier otra escritura vía ORM quedan indexadas en la misma transacción.
+
+MATCH recorre solo las listas invertidas de los términos buscados: el costo
+depende del número de coincidencias, no del total de notas.
+"""
+from flask import current_app, has_app_context
+from sqlalchemy import column, event, inspect, select, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from ..infrastructure.persistence.compressed_text import decompress_text
+from ..models import MedicalRecord, Patient, db
+
+FTS_TABLE = "medical_records_fts"
+CONTENT_VIEW = "medical_records_text"
+NOTES_FUNCTION = "ips_notes_text"
+
+records_fts = table(FTS_TABLE, column("rowid"), column("rank"), column(FTS_TABLE))
+
+# Marcadores de resaltado: caracteres de control que no aparecen en notas
+# escritas a mano, para que la vista escape el texto antes de convertirlos
+MARK_START = "\x02"
+MARK_END = "\x03"
+SNIPPET_TOKENS = 24
+# bm25 por columna: una coincidencia en el título pesa más que en las notas
+TITLE_WEIGHT = 4.0
+
+_DDL = [
+    f"""
+    CREATE VIEW IF NOT EXISTS {CONTENT_VIEW} AS
+    SELECT id, title, {NOTES_FUNCTION}(notes) AS notes FROM medical_records
+    """,
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, notes,
+        content='{CONTENT_VIEW}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+]
+
+
+def _register_functions(dbapi_connection, connection_record, connection_proxy=None) -> None:
+    # Una vez por conexión física: la vista la necesita para leer las notas
+    if not connection_record.info.get(NOTES_FUNCTION):
+        dbapi_connection.create_function(NOTES_FUNCTION, 1, decompress_text, deterministic=True)
+        connection_record.info[NOTES_FUNCTION] = True
+
+
+def install_record_fts(engine: Engine) -> bool:
+    """
+    Crea (si no existe) el índice FTS5 de la historia clínica y, si es nuevo,
+    lo llena con las entradas existentes. Un índice de la versión anterior
+    (con copia propia del texto) se reemplaza. Retorna False cuando el motor
+    no es SQLite o no tiene FTS5 compilado; en ese caso la búsqueda usa ILIKE.
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+    if not event.contains(engine, "checkout", _register_functions):
+        # checkout y no connect: el pool ya puede tener conexiones abiertas
+        event.listen(engine, "checkout", _register_functions)
+    try:
+        with engine.begin() as conn:
+            current = conn.execute(
+                text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": FTS_TABLE},
+            ).scalar()
+            if current is not None and "content=" not in current:
+                conn.execute(text(f"DROP TABLE {FTS_TABLE}"))
+                current = None
+            for ddl in _DDL:
+                conn.execute(text(ddl))
+            if current is None:
+                rebuild_record_fts(conn)
+    except OperationalError:
+        return False
+    return True
+
+
+def rebuild_record_fts(conn) -> None:
+    """Re-indexa todas las entradas leyendo la vista de contenido."""
+    conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+# --- Sincronización en el flush --- #
+
+def _fts_enabled() -> bool:
+    return has_app_context() and bool(current_app.extensions.get("record_fts"))
+
+
+def _changed(obj) -> bool:
+    attrs = inspect(obj).attrs
+    return attrs.title.history.has_changes() or attrs.notes.history.has_changes()
+
+
+@event.listens_for(db.session, "before_flush")
+def _unindex_old_records(session, flush_context, instances):
+    # Con contenido externo, 'delete' necesita los valores indexados: se
+    # leen de la vista antes de que el flush sobrescriba o borre la fila
+    if not _fts_enabled():
+        return
+    removed = {obj.id for obj in session.deleted if isinstance(obj, MedicalRecord)}
+    removed |= {obj.id for obj in session.dirty
+                if isinstance(obj, MedicalRecord) and obj.id is not None and _changed(obj)}
+    # Las entradas de un paciente borrado caen por cascada dentro del flush
+    patient_ids = [obj.id for obj in session.deleted if isinstance(obj, Patient)]
+    if patient_ids:
+        removed.update(session.connection().execute(
+            select(MedicalRecord.id).where(MedicalRecord.patient_id.in_(patient_ids))
+        ).scalars())
+    if removed:
+        session.connection().execute(
+            text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, notes) "
+                 f"SELECT 'delete', id, title, notes FROM {CONTENT_VIEW} WHERE id = :id"),
+            [{"id": i} for i in sorted(removed)],
+        )
+
+
+@event.listens_for(db.session, "after_flush")
+def _sync_record_fts(session, flush_context):
+    if not _fts_enabled():
+        return
+    added = [obj for obj in session.new if isinstance(obj, MedicalRecord)]
+    added += [obj for obj in session.dirty if isinstance(obj, MedicalRecord) and _changed(obj)]
+    if added:
+        session.connection().execute(
+            text(f"INSERT INTO {FTS_TABLE}(rowid, title, notes) VALUES (:id, :title, :notes)"),
+            [{"id": r.id, "title": r.title, "notes": r.notes} for r in added],
+        )
@@ -0,0 +1,57 @@
+"""
+Contadores de versión por tabla para validación condicional (ETag).
+
+``table_versions`` guarda un entero por tabla que los triggers de SQLite
+incrementan en cada INSERT, UPDATE o DELETE, sin importar si la escritura
+viene del ORM, de SQL Core o de un script externo. Leer la versión es una
+búsqueda por clave primaria, mucho más barata que la consulta que protege.
+"""
+from typing import Iterable
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from ..models import db
+
+VERSIONS_TABLE = "table_versions"
+
+
+def install_table_versions(engine: Engine, tables: Iterable[str]) -> bool:
+    """
+    Crea la tabla de versiones y los triggers de las tablas indicadas.
+    Retorna False si el motor no es SQLite; en ese caso no hay versiones y
+    las respuestas no llevan ETag.
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {VERSIONS_TABLE} ("
+                "name VARCHAR(64) PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)"
+            ))
+            for table in tables:
+                conn.execute(
+                    text(f"INSERT OR IGNORE INTO {VERSIONS_TABLE}(name, version) VALUES (:name, 0)"),
+                    {"name": table},
+                )
+                for op in ("INSERT", "UPDATE", "DELETE"):
+                    conn.execute(text(
+                        f"CREATE TRIGGER IF NOT EXISTS {table}_version_{op.lower()} "
+                        f"AFTER {op} ON {table} BEGIN "
+                        f"UPDATE {VERSIONS_TABLE} SET version = version + 1 WHERE name = '{table}'; "
+                        "END"
+                    ))
+    except OperationalError:
+        return False
+    return True
+
+
+def get_table_version(table: str) -> int | None:
+    """Versión actual de `table`, o None si no hay contadores instalados."""
+    try:
+        return db.session.execute(
+            text(f"SELECT version FROM {VERSIONS_TABLE} WHERE name = :name"), {"name": table}
+        ).scalar()
+    except OperationalError:
+        db.session.rollback()
+        return None
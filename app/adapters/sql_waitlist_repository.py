@@ -0,0 +1,50 @@
+from datetime import datetime
+from typing import List, Set, Tuple
+from sqlalchemy import update
+from sqlalchemy.orm import joinedload
+from ..services.ports import WaitlistRepositoryPort
+from ..models import WaitlistEntry, db
+from .waitlist_matcher import get_waitlist_matcher, queue_waitlist_changes
+
+
+class SqlAlchemyWaitlistRepository(WaitlistRepositoryPort):
+    def add(self, entry: WaitlistEntry) -> WaitlistEntry:
+        db.session.add(entry)
+        db.session.commit()
+        return entry
+
+    def get(self, entry_id: int) -> WaitlistEntry | None:
+        return db.session.get(WaitlistEntry, entry_id)
+
+    def list_page(self, page: int, per_page: int) -> Tuple[List[WaitlistEntry], int]:
+        query = WaitlistEntry.query.filter(WaitlistEntry.status.in_(('waiting', 'offered')))
+        total = query.count()
+        items = (
+            query.options(joinedload(WaitlistEntry.patient))
+            .order_by(WaitlistEntry.priority.asc(), WaitlistEntry.created_at.asc(), WaitlistEntry.id.asc())
+            .offset((page - 1) * per_page)
+            .limit(per_page)
+            .all()
+        )
+        return items, total
+
+    def best_candidate(self, slot_start: datetime, exclude: Set[int] | None = None) -> int | None:
+        return get_waitlist_matcher().best(slot_start, exclude or frozenset())
+
+    def set_status(self, entry_id: int, from_status: str, to_status: str,
+                   offered_slot: datetime | None = None, offered_employee_id: int | None = None) -> int:
+        values = {"status": to_status}
+        if to_status == 'offered':
+            values.update(offered_slot=offered_slot, offered_employee_id=offered_employee_id,
+                          offered_at=datetime.utcnow())
+        result = db.session.execute(
+            update(WaitlistEntry)
+            .where(WaitlistEntry.id == entry_id, WaitlistEntry.status == from_status)
+            .values(**values),
+            execution_options={"synchronize_session": "fetch"},
+        )
+        if result.rowcount:
+            # synchronize_session="fetch" deja la entrada de la sesión al día
+            queue_waitlist_changes(db.session, [db.session.get(WaitlistEntry, entry_id)])
+        db.session.commit()
+        return result.rowcount
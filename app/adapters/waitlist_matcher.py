@@ -0,0 +1,205 @@
+"""
+Emparejador de la lista de espera: qué paciente recibe un cupo liberado.
+
+El tiempo se discretiza en pasos de SLOT_STEP y cada entrada en espera cubre
+los pasos de todos los inicios de cita que caben en su ventana, redondeando
+hacia afuera (piso del inicio, techo del último inicio posible) para que un
+cupo fuera de la grilla también la encuentre; el candidato se valida luego
+contra la ventana exacta. Ese rango se descompone
+en O(log T) nodos de un árbol de segmentos implícito (nodo = (nivel, índice))
+y la entrada se empuja al montículo de cada nodo con la clave
+(prioridad, llegada, id). Para un cupo en el paso p basta mirar la cima del
+montículo de los ~LEVELS nodos que contienen a p: O(log n) por cancelación,
+sin recorrer la lista de espera.
+
+Las bajas son perezosas: una entrada ofrecida o retirada sale de ``_active`` y
+sus copias se descartan cuando llegan a la cima. Como el índice del prefijo de
+pacientes, vive en ``app.extensions``, se construye en el primer uso y se
+sincroniza en cada commit con los eventos de sesión de SQLAlchemy.
+"""
+import heapq
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Set, Tuple
+from flask import current_app, has_app_context
+from sqlalchemy import event, select
+from ..models import Appointment, WaitlistEntry, db
+from .appointment_slot_index import SLOT_STEP
+
+EXTENSION_KEY = "waitlist_matcher"
+_PENDING_KEY = "waitlist_matcher_pending"
+
+EPOCH = datetime(2000, 1, 1)
+# 2**24 pasos de 15 minutos: ~478 años desde EPOCH
+LEVELS = 24
+
+Key = Tuple[int, float, int]
+
+
+class WaitlistMatcher:
+    def __init__(self, duration: timedelta | None = None, step: timedelta = SLOT_STEP):
+        self.duration = duration or timedelta(minutes=Appointment.DURATION_MINUTES)
+        self.step = step
+        self._heaps: Dict[Tuple[int, int], List[Key]] = {}
+        # id -> (clave, window_start, window_end) de las entradas en espera
+        self._active: Dict[int, Tuple[Key, datetime, datetime]] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._active)
+
+    def _floor(self, moment: datetime) -> int:
+        return (moment - EPOCH) // self.step
+
+    def _ceil(self, moment: datetime) -> int:
+        return -((EPOCH - moment) // self.step)
+
+    def _nodes(self, first: int, last: int) -> Iterable[Tuple[int, int]]:
+        """Nodos canónicos que cubren los pasos [first, last]."""
+        lo, hi, level = first, last + 1, 0
+        while lo < hi:
+            if lo & 1:
+                yield level, lo
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                yield level, hi
+            lo >>= 1
+            hi >>= 1
+            level += 1
+
+    def build(self, rows: Iterable[Tuple[int, int, datetime, datetime, datetime]]) -> None:
+        """Reconstruye el índice desde filas (id, priority, created_at, window_start, window_end)."""
+        with self._lock:
+            self._heaps = {}
+            self._active = {}
+            for row in rows:
+                self._push(*row)
+            for heap in self._heaps.values():
+                heapq.heapify(heap)
+
+    def upsert(self, entry_id: int, priority: int, created_at: datetime,
+               window_start: datetime, window_end: datetime) -> None:
+        with self._lock:
+            self._active.pop(entry_id, None)
+            self._push(entry_id, priority, created_at, window_start, window_end, heapify=True)
+
+    def _push(self, entry_id, priority, created_at, window_start, window_end, heapify=False) -> None:
+        if window_end - window_start < self.duration:
+            return
+        # best() consulta el piso del cupo: todo cupo s que cabe cumple
+        # piso(window_start) <= piso(s) <= techo(window_end - duración)
+        first = self._floor(window_start)
+        last = self._ceil(window_end - self.duration)
+        if first < 0:
+            return
+        key = (priority, (created_at - EPOCH).total_seconds(), entry_id)
+        self._active[entry_id] = (key, window_start, window_end)
+        for node in self._nodes(first, last):
+            heap = self._heaps.setdefault(node, [])
+            if heapify:
+                heapq.heappush(heap, key)
+            else:
+                heap.append(key)
+
+    def remove(self, entry_id: int) -> None:
+        with self._lock:
+            self._active.pop(entry_id, None)
+
+    def best(self, slot_start: datetime, exclude: Set[int] = frozenset()) -> int | None:
+        """ID de la entrada en espera de mayor prioridad cuya ventana contiene el cupo, o None."""
+        point = self._floor(slot_start)
+        if point < 0:
+            return None
+        slot_end = slot_start + self.duration
+        best_key = None
+        with self._lock:
+            for level in range(LEVELS + 1):
+                node = (level, point >> level)
+                heap = self._heaps.get(node)
+                if not heap:
+                    continue
+                skipped = []
+                while heap:
+                    key = heap[0]
+                    current = self._active.get(key[2])
+                    if current is None or current[0] != key:
+                        heapq.heappop(heap)  # copia obsoleta
+                        continue
+                    # Los cupos fuera de la grilla de pasos se verifican contra la ventana exacta
+                    if key[2] in exclude or not (current[1] <= slot_start and slot_end <= current[2]):
+                        skipped.append(heapq.heappop(heap))
+                        continue
+                    if best_key is None or key < best_key:
+                        best_key = key
+                    break
+                for key in skipped:
+                    heapq.heappush(heap, key)
+                if not heap:
+                    del self._heaps[node]
+        return best_key[2] if best_key else None
+
+
+def get_waitlist_matcher() -> WaitlistMatcher:
+    """Retorna el emparejador de la aplicación actual, construyéndolo en el primer uso."""
+    matcher = current_app.extensions.get(EXTENSION_KEY)
+    if matcher is None:
+        matcher = WaitlistMatcher()
+        rows = db.session.execute(
+            select(WaitlistEntry.id, WaitlistEntry.priority, WaitlistEntry.created_at,
+                   WaitlistEntry.window_start, WaitlistEntry.window_end)
+            .where(WaitlistEntry.status == 'waiting')
+            .where(WaitlistEntry.window_end > datetime.now())
+        )
+        matcher.build(tuple(row) for row in rows)
+        current_app.extensions[EXTENSION_KEY] = matcher
+    return matcher
+
+
+# --- Sincronización incremental con eventos de sesión --- #
+
+def _matcher_values(entry: WaitlistEntry):
+    if entry.status != 'waiting':
+        return None
+    return entry.priority, entry.created_at, entry.window_start, entry.window_end
+
+
+def queue_waitlist_changes(session, entries: Iterable[WaitlistEntry]) -> None:
+    """
+    Registra cambios de estado hechos con SQL Core (sin flush ORM) para
+    aplicarlos al emparejador en el próximo commit, igual que los cambios vía ORM.
+    """
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    for entry in entries:
+        pending[entry.id] = _matcher_values(entry)
+
+
+@event.listens_for(db.session, "after_flush")
+def _collect_waitlist_changes(session, flush_context):
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, WaitlistEntry):
+            pending[obj.id] = _matcher_values(obj)
+    for obj in session.deleted:
+        if isinstance(obj, WaitlistEntry):
+            pending[obj.id] = None
+
+
+@event.listens_for(db.session, "after_commit")
+def _apply_waitlist_changes(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending or not has_app_context():
+        return
+    matcher = current_app.extensions.get(EXTENSION_KEY)
+    if matcher is None:
+        return
+    for entry_id, values in pending.items():
+        if values is None:
+            matcher.remove(entry_id)
+        else:
+            matcher.upsert(entry_id, *values)
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def _discard_waitlist_changes(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
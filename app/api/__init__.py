@@ -1,9 +1,21 @@
-from flask import Blueprint, jsonify, current_app, request
-from datetime import datetime, timezone
+import csv
+import hashlib
+import io
+import json
+from flask import Blueprint, Response, jsonify, current_app, request, stream_with_context
+from flask_login import current_user, login_required
+from datetime import date, datetime, timezone
+from functools import lru_cache, wraps
 from marshmallow import Schema, fields, validates, ValidationError
 from sqlalchemy.exc import IntegrityError
+from ..adapters.sql_appointment_repository import SqlAlchemyAppointmentRepository
 from ..adapters.sql_patient_repository import SqlAlchemyPatientRepository
-from ..services.patient_service import PatientService
+from ..services.appointment_service import AppointmentService, BULK_TARGET_STATUSES
+from ..services.patient_service import PatientService, COUNT_MODES, INCLUDE_RELATIONS
+from .. import cache
+from .fast_json import compile_row_serializer, json_response
+from ..infrastructure.audit.audit_log import AuditLogger
+from ..infrastructure.security.access_control import require_any_role
 
 api_bp = Blueprint("api", __name__, url_prefix="/api/v1")
 
@@ -36,13 +48,96 @@ class PatientSchema(Schema):
             raise ValidationError("document must be at least 5 characters")
 
 
+class AppointmentSchema(Schema):
+    id = fields.Int(dump_only=True)
+    patient_id = fields.Int()
+    scheduled_at = fields.DateTime()
+    reason = fields.Str(allow_none=True)
+    status = fields.Str()
+    created_at = fields.DateTime(dump_only=True)
+
+
+class MedicalRecordSchema(Schema):
+    id = fields.Int(dump_only=True)
+    patient_id = fields.Int()
+    title = fields.Str()
+    notes = fields.Str(allow_none=True)
+    created_at = fields.DateTime(dump_only=True)
+
+
 patient_schema = PatientSchema()
 patients_schema = PatientSchema(many=True)
+appointments_schema = AppointmentSchema(many=True)
+records_schema = MedicalRecordSchema(many=True)
+INCLUDE_SCHEMAS = {"appointments": appointments_schema, "records": records_schema}
+# Roles que pueden ver cada relación (mismos que las vistas HTML)
+INCLUDE_ROLES = {"records": ("admin", "medico", "enfermero")}
+MAX_BATCH_IDS = 100
+# Roles que pueden aplicar cada transición (mismos que cancel/complete en la vista HTML)
+STATUS_ROLES = {"cancelled": ("admin", "recepcionista", "medico"), "completed": ("admin", "medico")}
 repo = SqlAlchemyPatientRepository()
-service = PatientService(repo)
+service = PatientService(repo, cache=cache)
+appointment_service = AppointmentService(SqlAlchemyAppointmentRepository(), cache=cache)
+audit = AuditLogger()
+
+EXPORT_FIELDS = list(PatientSchema().fields)
+EXPORT_CHUNK_ROWS = 500
+IMPORT_CHUNK_ROWS = 1000
+
+
+def conditional(version_fn):
+    """
+    GET condicional: ETag fuerte derivado de la versión de los datos y de la
+    URL completa. Si If-None-Match coincide responde 304 sin ejecutar la
+    vista (ni su consulta). La versión se lee antes de la vista, así una
+    escritura concurrente solo puede producir un ETag más viejo, nunca
+    servir datos obsoletos con el ETag nuevo.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            version = version_fn()
+            if version is None:
+                return view(*args, **kwargs)
+            etag = hashlib.sha1(f"{version}|{request.full_path}".encode("utf-8")).hexdigest()
+            if request.if_none_match.contains(etag):
+                response = current_app.response_class(status=304)
+                response.set_etag(etag)
+                return response
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+                response.headers["Cache-Control"] = "no-cache"
+            return response
+        return wrapper
+    return decorator
+
+
+@lru_cache(maxsize=64)
+def _row_serializer_for(fields: tuple[str, ...] | None, cursor: bool = False):
+    """
+    Retorna (columnas, serializer) para el listado: columnas a seleccionar y
+    función precompilada fila -> dict con solo los campos pedidos. En modo
+    cursor se seleccionan además id y created_at para construir el cursor.
+    """
+    output = list(fields or EXPORT_FIELDS)
+    columns = list(dict.fromkeys([*output, "id", "created_at"])) if cursor else output
+    return columns, compile_row_serializer(patient_schema, columns, output)
+
+
+def _parse_fields(raw: str | None) -> tuple[str, ...] | None:
+    """Parsea ?fields=a,b,c. Lanza ValueError con campos desconocidos."""
+    if not raw:
+        return None
+    requested = tuple(dict.fromkeys(f.strip() for f in raw.split(",") if f.strip()))
+    unknown = [f for f in requested if f not in EXPORT_FIELDS]
+    if unknown or not requested:
+        raise ValueError(", ".join(unknown))
+    return requested
 
 
 @api_bp.get("/patients")
+@conditional(service.data_version)
 def list_patients():
     try:
         page = int(request.args.get("page", 1))
@@ -50,17 +145,300 @@ def list_patients():
         q = (request.args.get("q") or "").strip()
     except ValueError:
         return jsonify({"error": "invalid pagination params"}), 400
+    try:
+        fields = _parse_fields(request.args.get("fields"))
+    except ValueError as exc:
+        return jsonify({"error": f"unknown fields: {exc}"}), 400
 
-    items, total = service.list_paginated(q, page, per_page)
+    # Modo cursor (keyset): se activa al enviar el parámetro `cursor`, vacío para la primera página
+    if "cursor" in request.args:
+        columns, serialize = _row_serializer_for(fields, cursor=True)
+        try:
+            rows, next_cursor = service.list_after_cursor(
+                q, request.args.get("cursor"), per_page, fields=columns, as_rows=True
+            )
+        except ValueError:
+            return jsonify({"error": "invalid cursor"}), 400
+        return json_response({
+            "items": [serialize(row) for row in rows],
+            "next_cursor": next_cursor,
+            "per_page": per_page,
+        })
 
-    return jsonify({
-        "items": patients_schema.dump(items),
+    total_mode = request.args.get("total", "exact")
+    if total_mode not in COUNT_MODES:
+        return jsonify({"error": f"total must be one of {', '.join(COUNT_MODES)}"}), 400
+    # Camino rápido: filas planas + serializador precompilado (mismo JSON que PatientSchema)
+    columns, serialize = _row_serializer_for(fields)
+    rows, total = service.list_paginated(q, page, per_page, total=total_mode, fields=columns, as_rows=True)
+
+    return json_response({
+        "items": [serialize(row) for row in rows],
         "total": total,
         "page": page,
         "per_page": per_page,
+    })
+
+
+def _parse_include() -> list[str]:
+    raw = request.args.get("include") or ""
+    return list(dict.fromkeys(r.strip() for r in raw.split(",") if r.strip()))
+
+
+def include_guard(view):
+    """Valida ?include= y los roles requeridos por cada relación antes del GET condicional."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        include = _parse_include()
+        unknown = [rel for rel in include if rel not in INCLUDE_RELATIONS]
+        if unknown:
+            return jsonify({"error": f"unknown include: {', '.join(unknown)}"}), 400
+        for rel in include:
+            roles = INCLUDE_ROLES.get(rel)
+            if roles and not current_user.has_any_role(*roles):
+                return jsonify({"error": f"include={rel} requires one of roles: {', '.join(roles)}"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _dump_patient_detail(patient, include: list[str]) -> dict:
+    data = patient_schema.dump(patient)
+    for rel in include:
+        data[rel] = INCLUDE_SCHEMAS[rel].dump(getattr(patient, rel))
+    return data
+
+
+@api_bp.get("/patients/<int:patient_id>")
+@login_required
+@include_guard
+@conditional(lambda: service.data_version(_parse_include()))
+def get_patient(patient_id: int):
+    include = _parse_include()
+    patients = service.get_many([patient_id], include)
+    if not patients:
+        return jsonify({"error": "patient not found"}), 404
+    return jsonify(_dump_patient_detail(patients[0], include)), 200
+
+
+@api_bp.get("/patients/batch")
+@login_required
+@include_guard
+@conditional(lambda: service.data_version(_parse_include()))
+def get_patients_batch():
+    try:
+        ids = [int(i) for i in (request.args.get("ids") or "").split(",") if i.strip()]
+    except ValueError:
+        return jsonify({"error": "ids must be a comma-separated list of integers"}), 400
+    if not ids or len(ids) > MAX_BATCH_IDS:
+        return jsonify({"error": f"ids must contain between 1 and {MAX_BATCH_IDS} values"}), 400
+    include = _parse_include()
+    patients = service.get_many(ids, include)
+    found = {p.id for p in patients}
+    return jsonify({
+        "items": [_dump_patient_detail(p, include) for p in patients],
+        "missing": [i for i in dict.fromkeys(ids) if i not in found],
     }), 200
 
 
+@api_bp.get("/patients/suggest")
+@login_required
+def suggest_patients():
+    try:
+        limit = int(request.args.get("limit", 10))
+    except ValueError:
+        return jsonify({"error": "invalid limit"}), 400
+    items = service.suggest(request.args.get("prefix"), limit)
+    return jsonify({"items": items}), 200
+
+
+def _export_value(value):
+    # Mismo formato que PatientSchema: fechas ISO 8601
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _iter_ndjson(rows):
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps({f: _export_value(row[f]) for f in EXPORT_FIELDS}, ensure_ascii=False))
+        if len(chunk) >= EXPORT_CHUNK_ROWS:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+
+def _iter_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    pending = 0
+    for row in rows:
+        writer.writerow(["" if row[f] is None else _export_value(row[f]) for f in EXPORT_FIELDS])
+        pending += 1
+        if pending >= EXPORT_CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+@api_bp.get("/patients/export")
+@login_required
+@require_any_role("admin")
+def export_patients():
+    fmt = request.args.get("format", "csv")
+    if fmt not in ("csv", "ndjson"):
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+    q = (request.args.get("q") or "").strip()
+    audit.log_action("patient_export", {"format": fmt, "q": q})
+
+    rows = service.export(q)
+    if fmt == "csv":
+        body, mimetype = _iter_csv(rows), "text/csv"
+    else:
+        body, mimetype = _iter_ndjson(rows), "application/x-ndjson"
+    filename = f"patients.{fmt}"
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
+class ImportDecodeError(ValueError):
+    """El cuerpo dejó de ser UTF-8 válido; `row` es la fila que se estaba leyendo."""
+
+    def __init__(self, row: int):
+        super().__init__(f"body is not valid UTF-8 (row {row})")
+        self.row = row
+
+
+def _iter_import_rows(fmt: str):
+    """
+    Lee el cuerpo de la petición como stream y produce (número_de_fila, dict | None).
+    None indica una línea NDJSON que no es un objeto JSON válido. Lanza
+    ImportDecodeError si el cuerpo no es UTF-8.
+    """
+    text = io.TextIOWrapper(request.stream, encoding="utf-8", errors="strict", newline="")
+    number = 0
+    try:
+        if fmt == "csv":
+            for number, row in enumerate(csv.DictReader(text), start=1):
+                # Celdas vacías de CSV = campo ausente
+                yield number, {k: v for k, v in row.items() if k and v not in ("", None)}
+            return
+        for line in text:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield number, row if isinstance(row, dict) else None
+    except UnicodeDecodeError:
+        raise ImportDecodeError(number + 1) from None
+
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _import_chunk(chunk, results) -> None:
+    """Valida e inserta un bloque de filas (un commit); agrega el resultado de cada fila."""
+    valid_rows, valid_numbers = [], []
+    for number, raw in chunk:
+        if raw is None:
+            results.append({"row": number, "status": "invalid", "errors": {"_schema": ["invalid JSON object"]}})
+            continue
+        try:
+            valid_rows.append(patient_schema.load(raw))
+            valid_numbers.append(number)
+        except ValidationError as ve:
+            results.append({"row": number, "status": "invalid", "errors": ve.messages})
+    for number, (ok, _, patient_id) in zip(valid_numbers, service.create_many(valid_rows)):
+        if ok:
+            results.append({"row": number, "status": "created", "id": patient_id})
+        else:
+            results.append({"row": number, "status": "duplicate", "error": "document must be unique"})
+
+
+def _import_summary(results) -> dict:
+    results.sort(key=lambda r: r["row"])
+    summary = {"created": 0, "duplicate": 0, "invalid": 0}
+    for r in results:
+        summary[r["status"]] += 1
+    return summary
+
+
+@api_bp.post("/patients/bulk")
+@login_required
+@require_any_role("admin", "recepcionista")
+def bulk_create_patients():
+    mimetype = request.mimetype
+    if mimetype in ("application/x-ndjson", "application/jsonl"):
+        fmt = "ndjson"
+    elif mimetype == "text/csv":
+        fmt = "csv"
+    else:
+        return jsonify({"error": "content-type must be application/x-ndjson or text/csv"}), 415
+
+    results = []
+    committed_chunks, committed_rows = 0, 0
+    try:
+        for chunk in _chunked(_iter_import_rows(fmt), IMPORT_CHUNK_ROWS):
+            _import_chunk(chunk, results)
+            committed_chunks, committed_rows = committed_chunks + 1, chunk[-1][0]
+    except ImportDecodeError as exc:
+        # Los bloques anteriores ya quedaron guardados: se informa hasta dónde
+        summary = _import_summary(results)
+        audit.log_action("patient_bulk_create", {"format": fmt, "decode_error_row": exc.row, **summary})
+        return jsonify({
+            "error": str(exc),
+            "row": exc.row,
+            "committed_chunks": committed_chunks,
+            "committed_rows": committed_rows,
+            "summary": summary,
+            "results": results,
+        }), 400
+
+    summary = _import_summary(results)
+    audit.log_action("patient_bulk_create", {"format": fmt, **summary})
+    return jsonify({"summary": summary, "results": results}), 200
+
+
+@api_bp.put("/patients/by-document/<document>")
+@login_required
+@require_any_role("admin", "recepcionista")
+def upsert_patient(document: str):
+    if not request.is_json:
+        return jsonify({"error": "content-type must be application/json"}), 415
+    payload = request.get_json() or {}
+    if not isinstance(payload, dict):
+        # Mismo error que PatientSchema.load para un cuerpo que no es objeto
+        return jsonify({"errors": {"_schema": ["Invalid input type."]}}), 422
+    if payload.setdefault("document", document) != document:
+        return jsonify({"errors": {"document": ["must match the document in the URL"]}}), 422
+    try:
+        data = patient_schema.load(payload)
+    except ValidationError as ve:
+        return jsonify({"errors": ve.messages}), 422
+
+    patient, created = service.upsert(**data)
+    audit.log_action("patient_upsert", {"patient_id": patient.id, "created": created})
+    return jsonify(patient_schema.dump(patient)), 201 if created else 200
+
+
 @api_bp.post("/patients")
 def create_patient():
     # Expect JSON payload
@@ -78,3 +456,50 @@ def create_patient():
             return jsonify({"error": "document must be unique"}), 409
         return jsonify({"error": msg}), 400
     return jsonify(patient_schema.dump(patient)), 201
+
+
+@api_bp.get("/appointments/slots")
+@login_required
+def appointment_slots():
+    """Próximos horarios libres: ?after=ISO-8601&count=5&length=30 (minutos)&employee_id=N."""
+    try:
+        after = datetime.fromisoformat(request.args["after"]) if request.args.get("after") else datetime.now()
+        count = int(request.args.get("count", 5))
+        length = int(request.args.get("length", 0)) or None
+        employee_id = int(request.args.get("employee_id", 0)) or None
+    except ValueError:
+        return jsonify({"error": "invalid after, count, length or employee_id"}), 400
+    if after.tzinfo is not None:
+        return jsonify({"error": "after must be a local time without offset"}), 400
+    if length is not None and length < 0:
+        return jsonify({"error": "invalid length"}), 400
+    slots = appointment_service.next_available_slots(after, count, length, employee_id=employee_id)
+    return jsonify({"slots": [slot.isoformat() for slot in slots]}), 200
+
+
+@api_bp.post("/appointments/status")
+@login_required
+@require_any_role("admin", "recepcionista", "medico")
+def bulk_appointment_status():
+    """Cierre de jornada: {"ids": [...], "status": "completed"|"cancelled"} en un solo UPDATE."""
+    if not request.is_json:
+        return jsonify({"error": "content-type must be application/json"}), 415
+    payload = request.get_json() or {}
+    if not isinstance(payload, dict):
+        return jsonify({"errors": {"_schema": ["Invalid input type."]}}), 422
+    status = payload.get("status")
+    ids = payload.get("ids")
+    if status not in BULK_TARGET_STATUSES:
+        return jsonify({"errors": {"status": [f"must be one of {', '.join(BULK_TARGET_STATUSES)}"]}}), 422
+    if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return jsonify({"errors": {"ids": ["must be a list of integers"]}}), 422
+    if not current_user.has_any_role(*STATUS_ROLES[status]):
+        return jsonify({"error": "forbidden"}), 403
+
+    ok, msg, changed = appointment_service.transition_many(ids, status)
+    if not ok:
+        return jsonify({"errors": {"ids": [msg]}}), 422
+    changed_set = set(changed)
+    skipped = sorted(i for i in set(ids) if i not in changed_set)
+    audit.log_action("appointment_bulk_status", {"status": status, "requested": len(set(ids)), "updated": changed})
+    return jsonify({"status": status, "updated": changed, "skipped": skipped}), 200
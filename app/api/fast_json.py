@@ -0,0 +1,73 @@
+"""
+Serialización JSON rápida para los endpoints de lectura más usados.
+
+Produce el mismo JSON que los schemas de marshmallow (mismos campos y
+formatos) pero a partir de filas planas de SQLAlchemy Core: la conversión
+fila -> dict se precompila una vez por (schema, columnas) y se codifica con
+orjson cuando está instalado.
+"""
+import json
+from datetime import date, datetime
+from typing import Callable, Sequence
+from flask import current_app
+from marshmallow import Schema, fields
+
+try:
+    import orjson
+except ImportError:  # Dependencia opcional
+    orjson = None
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+def _converter_for(field: fields.Field) -> Callable | None:
+    """
+    Conversión equivalente al dump del campo; None si el valor de la base ya
+    es el valor JSON (Int, Str, Email...).
+    """
+    if isinstance(field, (fields.DateTime, fields.Date)):
+        return _isoformat
+    return None
+
+
+def compile_row_serializer(schema: Schema, columns: Sequence[str], output: Sequence[str] | None = None) -> Callable:
+    """
+    Retorna una función fila -> dict para filas con `columns` en ese orden.
+    Solo emite los campos de `output` (por defecto, todos los de `columns`).
+    """
+    positions = {name: i for i, name in enumerate(columns)}
+    plain, converted = [], []
+    for name in output or columns:
+        converter = _converter_for(schema.fields[name])
+        if converter is None:
+            plain.append((name, positions[name]))
+        else:
+            converted.append((name, positions[name], converter))
+
+    def serialize(row) -> dict:
+        out = {name: row[i] for name, i in plain}
+        for name, i, converter in converted:
+            value = row[i]
+            out[name] = None if value is None else converter(value)
+        return out
+
+    return serialize
+
+
+def _default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(obj) -> bytes:
+    """Codifica con orjson si está disponible; si no, json estándar compacto."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(obj, default=_default, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def json_response(obj, status: int = 200):
+    return current_app.response_class(dumps(obj), status=status, mimetype="application/json")
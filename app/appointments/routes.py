@@ -1,26 +1,87 @@
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from flask import render_template, redirect, url_for, flash, request
 from flask_login import login_required
 from . import appointments_bp
-from ..forms import AppointmentForm
+from ..forms import AppointmentForm, WaitlistForm
 from ..adapters.sql_appointment_repository import SqlAlchemyAppointmentRepository
+from ..adapters.sql_employee_repository import SqlAlchemyEmployeeRepository
 from ..adapters.sql_patient_repository import SqlAlchemyPatientRepository
-from ..services.appointment_service import AppointmentService
+from ..adapters.sql_waitlist_repository import SqlAlchemyWaitlistRepository
+from ..domain.recurrence import RecurrenceRule
+from ..services.appointment_service import AppointmentService, STATUSES, UTILIZATION_PERIODS
+from ..services.waitlist_service import WaitlistService
+from .. import cache
 from ..infrastructure.audit.audit_log import AuditLogger
 from ..infrastructure.security.rate_limiter import rate_limit
 from ..infrastructure.security.access_control import require_any_role
 
 appt_repo = SqlAlchemyAppointmentRepository()
 patient_repo = SqlAlchemyPatientRepository()
-service = AppointmentService(appt_repo)
+employee_repo = SqlAlchemyEmployeeRepository()
+waitlist_service = WaitlistService(SqlAlchemyWaitlistRepository())
+service = AppointmentService(appt_repo, waitlist=waitlist_service, cache=cache)
 audit = AuditLogger()
 
 
+PER_PAGE = 24
+MAX_PER_PAGE = 96
+
+
+def _parse_day(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d') if value else None
+    except ValueError:
+        return None
+
+
 @appointments_bp.route('/')
 @login_required
 def index():
-    appointments = service.list()
-    return render_template('appointments/index.html', appointments=appointments, title='Citas')
+    # Filtros y paginación en la base de datos; los contadores de estado
+    # salen de un único GROUP BY en lugar de recorrer todo el historial
+    status = request.args.get('status') or None
+    if status not in STATUSES:
+        status = None
+    patient_id = request.args.get('patient_id', type=int)
+    employee_id = request.args.get('employee_id', type=int)
+    date_from = _parse_day(request.args.get('date_from'))
+    date_to = _parse_day(request.args.get('date_to'))
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', PER_PAGE, type=int), 1), MAX_PER_PAGE)
+
+    appointments, total, counts = service.list_paginated(
+        page,
+        per_page,
+        status=status,
+        patient_id=patient_id,
+        date_from=date_from,
+        # date_to es inclusivo en el formulario: se consulta hasta el día siguiente
+        date_to=date_to + timedelta(days=1) if date_to else None,
+        # Las tarjetas muestran nombre y documento del paciente: un JOIN
+        # many-to-one no altera el LIMIT y evita un SELECT por cita
+        load_patient='joined',
+        employee_id=employee_id,
+    )
+    filters = {
+        'patient_id': patient_id,
+        'employee_id': employee_id,
+        'date_from': date_from.strftime('%Y-%m-%d') if date_from else None,
+        'date_to': date_to.strftime('%Y-%m-%d') if date_to else None,
+    }
+    patient = patient_repo.get(patient_id) if patient_id else None
+    return render_template(
+        'appointments/index.html',
+        appointments=appointments,
+        total=total,
+        counts=counts,
+        status=status,
+        filters=filters,
+        patient=patient,
+        page=page,
+        pages=max(1, -(-total // per_page)),
+        per_page=per_page,
+        title='Citas',
+    )
 
 
 @appointments_bp.route('/create', methods=['GET', 'POST'])
@@ -29,30 +90,77 @@ def index():
 @rate_limit
 def create():
     form = AppointmentForm()
-    # fill choices dynamically
-    patients = patient_repo.list()
-    form.patient_id.choices = [(p.id, f"{p.full_name()} ({p.document})") for p in patients]
+    # Las opciones se cargan bajo demanda desde /api/v1/patients/suggest;
+    # aquí solo se incluye el paciente enviado para poder validarlo.
+    _patient_choices(form)
+    _employee_choices(form)
 
     if form.validate_on_submit():
+        employee_id = form.employee_id.data or None
         try:
             scheduled_at = datetime.strptime(form.scheduled_at.data, '%Y-%m-%d %H:%M')
         except ValueError:
             flash('Formato de fecha inválido. Use YYYY-MM-DD HH:MM', 'danger')
-            return render_template('appointments/form.html', form=form, title='Agendar Cita')
+            return _render_form(form)
 
-        ok, msg, appt = service.schedule(
-            patient_id=form.patient_id.data,
-            scheduled_at=scheduled_at,
-            reason=form.reason.data,
-        )
-        if ok:
-            flash('Cita agendada correctamente', 'success')
+        if form.repeat.data:
+            rule = RecurrenceRule(
+                frequency=form.repeat.data,
+                interval=form.repeat_interval.data or 1,
+                count=form.repeat_count.data,
+                until=form.repeat_until.data,
+                weekdays=tuple(form.repeat_weekdays.data or ()),
+            )
+            ok, msg, created = service.schedule_series(
+                patient_id=form.patient_id.data,
+                start=scheduled_at,
+                rule=rule,
+                reason=form.reason.data,
+                employee_id=employee_id,
+            )
+            if ok:
+                flash(msg, 'success')
+            else:
+                flash(f'Error al agendar serie: {msg}', 'danger')
+            audit.log_action('appointment_series_create', {
+                'patient_id': form.patient_id.data, 'count': len(created), 'success': ok,
+            })
         else:
-            flash(f'Error al agendar cita: {msg}', 'danger')
-        audit.log_action('appointment_create', {'patient_id': form.patient_id.data, 'success': ok})
+            ok, msg, appt = service.schedule(
+                patient_id=form.patient_id.data,
+                scheduled_at=scheduled_at,
+                reason=form.reason.data,
+                employee_id=employee_id,
+            )
+            if ok:
+                flash('Cita agendada correctamente', 'success')
+            else:
+                flash(f'Error al agendar cita: {msg}', 'danger')
+            audit.log_action('appointment_create', {'patient_id': form.patient_id.data, 'success': ok})
         if ok:
             return redirect(url_for('appointments.index'))
-    return render_template('appointments/form.html', form=form, title='Agendar Cita')
+    return _render_form(form)
+
+
+def _patient_choices(form):
+    # Igual que en create(): solo el paciente enviado, el resto llega por /suggest
+    form.patient_id.choices = []
+    if form.patient_id.data:
+        selected = patient_repo.get(form.patient_id.data)
+        if selected:
+            form.patient_id.choices = [(selected.id, f"{selected.full_name()} ({selected.document})")]
+
+
+def _employee_choices(form):
+    form.employee_id.choices = [(0, 'Sin asignar')] + [
+        (e.id, f"{e.full_name()} - {e.position}") for e in employee_repo.list()
+    ]
+
+
+def _render_form(form):
+    # Próximos cupos libres desde el índice de agenda en memoria (del profesional elegido)
+    slots = service.next_available_slots(datetime.now(), 5, employee_id=form.employee_id.data or None)
+    return render_template('appointments/form.html', form=form, slots=slots, title='Agendar Cita')
 
 
 @appointments_bp.route('/<int:appointment_id>/cancel', methods=['POST'])
@@ -62,7 +170,8 @@ def create():
 def cancel(appointment_id):
     ok, msg = service.cancel(appointment_id)
     if ok:
-        flash('Cita cancelada correctamente', 'success')
+        # Incluye, si aplica, la entrada de la lista de espera que recibió el cupo
+        flash(msg, 'success')
     else:
         flash(f'Error al cancelar cita: {msg}', 'danger')
     audit.log_action('appointment_cancel', {'appointment_id': appointment_id, 'success': ok})
@@ -86,8 +195,141 @@ def complete(appointment_id):
 @appointments_bp.route('/<int:appointment_id>')
 @login_required
 def view(appointment_id):
-    appt = service.get(appointment_id)
+    appt = service.get(appointment_id, load_patient='joined')
     if not appt:
         flash('Cita no encontrada', 'danger')
         return redirect(url_for('appointments.index'))
     return render_template('appointments/view.html', appointment=appt, title='Detalle de Cita')
+
+
+# --- Agenda por profesional --- #
+
+@appointments_bp.route('/calendar')
+@login_required
+def calendar():
+    employees = employee_repo.list()
+    employee_id = request.args.get('employee_id', type=int)
+    day = (_parse_day(request.args.get('date')) or datetime.now()).date()
+    employee = next((e for e in employees if e.id == employee_id), None)
+    # Un rango sobre el índice (employee_id, scheduled_at): solo las citas del día
+    appointments = service.provider_day(employee.id, day) if employee else []
+    return render_template(
+        'appointments/calendar.html',
+        employees=employees,
+        employee=employee,
+        appointments=appointments,
+        day=day,
+        prev_day=day - timedelta(days=1),
+        next_day=day + timedelta(days=1),
+        title='Agenda por profesional',
+    )
+
+
+@appointments_bp.route('/utilization')
+@login_required
+@require_any_role('admin')
+def utilization():
+    today = date.today()
+    date_from = _parse_day(request.args.get('date_from'))
+    date_to = _parse_day(request.args.get('date_to'))
+    date_from = date_from.date() if date_from else today - timedelta(days=today.weekday())
+    date_to = date_to.date() if date_to else date_from + timedelta(days=6)
+    if date_to < date_from:
+        date_from, date_to = date_to, date_from
+    period = request.args.get('period', 'day')
+    if period not in UTILIZATION_PERIODS:
+        period = 'day'
+    rows = service.utilization_report(date_from, date_to, period)
+    employees = {e.id: e for e in employee_repo.list()}
+    return render_template(
+        'appointments/utilization.html',
+        rows=rows,
+        employees=employees,
+        date_from=date_from,
+        date_to=date_to,
+        period=period,
+        title='Ocupación de agendas',
+    )
+
+
+# --- Lista de espera --- #
+
+@appointments_bp.route('/waitlist', methods=['GET', 'POST'])
+@login_required
+@require_any_role('admin', 'recepcionista', 'medico')
+def waitlist():
+    form = WaitlistForm()
+    _patient_choices(form)
+    if form.validate_on_submit():
+        try:
+            window_start = datetime.strptime(form.window_start.data, '%Y-%m-%d %H:%M')
+            window_end = datetime.strptime(form.window_end.data, '%Y-%m-%d %H:%M')
+        except ValueError:
+            flash('Formato de fecha inválido. Use YYYY-MM-DD HH:MM', 'danger')
+        else:
+            ok, msg, entry = waitlist_service.join(
+                patient_id=form.patient_id.data,
+                window_start=window_start,
+                window_end=window_end,
+                priority=form.priority.data,
+                reason=form.reason.data,
+            )
+            flash(msg, 'success' if ok else 'danger')
+            audit.log_action('waitlist_join', {'patient_id': form.patient_id.data, 'success': ok})
+            if ok:
+                return redirect(url_for('appointments.waitlist'))
+
+    page = max(request.args.get('page', 1, type=int), 1)
+    entries, total = waitlist_service.list_page(page, PER_PAGE)
+    return render_template(
+        'appointments/waitlist.html',
+        form=form,
+        entries=entries,
+        total=total,
+        page=page,
+        pages=max(1, -(-total // PER_PAGE)),
+        title='Lista de espera',
+    )
+
+
+@appointments_bp.route('/waitlist/<int:entry_id>/accept', methods=['POST'])
+@login_required
+@require_any_role('admin', 'recepcionista', 'medico')
+@rate_limit
+def waitlist_accept(entry_id):
+    entry = waitlist_service.get(entry_id)
+    if not entry or entry.status != 'offered':
+        flash('No hay una oferta pendiente para esta entrada', 'danger')
+        return redirect(url_for('appointments.waitlist'))
+    ok, msg, appt = service.schedule(entry.patient_id, entry.offered_slot, entry.reason,
+                                     employee_id=entry.offered_employee_id)
+    if ok and waitlist_service.mark_booked(entry_id):
+        flash('Cupo asignado desde la lista de espera', 'success')
+    else:
+        flash(f'Error al asignar el cupo: {msg}', 'danger')
+    audit.log_action('waitlist_accept', {'entry_id': entry_id, 'success': ok})
+    return redirect(url_for('appointments.waitlist'))
+
+
+@appointments_bp.route('/waitlist/<int:entry_id>/decline', methods=['POST'])
+@login_required
+@require_any_role('admin', 'recepcionista', 'medico')
+@rate_limit
+def waitlist_decline(entry_id):
+    ok, msg, offered = waitlist_service.decline(entry_id)
+    if ok and offered:
+        msg = f'{msg} Cupo ofrecido a la entrada #{offered.id}.'
+    flash(msg, 'success' if ok else 'danger')
+    audit.log_action('waitlist_decline', {'entry_id': entry_id, 'success': ok})
+    return redirect(url_for('appointments.waitlist'))
+
+
+@appointments_bp.route('/waitlist/<int:entry_id>/remove', methods=['POST'])
+@login_required
+@require_any_role('admin', 'recepcionista', 'medico')
+@rate_limit
+def waitlist_remove(entry_id):
+    ok = waitlist_service.remove(entry_id)
+    flash('Entrada retirada de la lista de espera' if ok else 'Entrada no encontrada', 'success' if ok else 'danger')
+    audit.log_action('waitlist_remove', {'entry_id': entry_id, 'success': ok})
+    return redirect(url_for('appointments.waitlist'))
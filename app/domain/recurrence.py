@@ -0,0 +1,107 @@
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+FREQUENCIES = ('daily', 'weekly', 'monthly')
+MAX_OCCURRENCES = 200
+# Tope de pasos del generador: aun con días o meses que no coinciden, una
+# regla válida produce al menos una cita cada 7 pasos
+MAX_STEPS = MAX_OCCURRENCES * 7
+
+
+@dataclass
+class RecurrenceRule:
+    """
+    Regla de repetición de una serie de citas.
+
+    frequency: 'daily', 'weekly' o 'monthly'; interval: cada cuántas unidades.
+    La serie termina tras `count` citas o en la fecha `until` (inclusive), lo
+    que ocurra primero. `weekdays` (0=lunes ... 6=domingo) restringe las
+    series diarias y define los días de las semanales; si se omite en una
+    serie semanal se usa el día de la primera cita.
+    """
+    frequency: str = 'weekly'
+    interval: int = 1
+    count: Optional[int] = None
+    until: Optional[date] = None
+    weekdays: Tuple[int, ...] = field(default_factory=tuple)
+
+    def validate(self, start: Optional[datetime] = None) -> List[str]:
+        """Errores de la regla; con `start` también valida que la serie pueda generar citas."""
+        errors = []
+        if self.frequency not in FREQUENCIES:
+            errors.append("Frecuencia inválida")
+        if self.interval < 1:
+            errors.append("El intervalo debe ser mayor o igual a 1")
+        if self.count is None and self.until is None:
+            errors.append("Indique el número de citas o la fecha final")
+        if self.count is not None and not 1 <= self.count <= MAX_OCCURRENCES:
+            errors.append(f"El número de citas debe estar entre 1 y {MAX_OCCURRENCES}")
+        if any(d not in range(7) for d in self.weekdays):
+            errors.append("Días de la semana inválidos")
+        if self.weekdays and self.frequency == 'monthly':
+            errors.append("Los días de la semana no aplican a series mensuales")
+        if (start is not None and self.frequency == 'daily' and self.weekdays and self.interval >= 1
+                and not set(self.weekdays) & self._reachable_weekdays(start)):
+            errors.append("Con ese intervalo la serie nunca cae en los días de la semana elegidos")
+        return errors
+
+    def _reachable_weekdays(self, start: datetime) -> set:
+        # Cada `interval` días el día de la semana avanza interval % 7 posiciones
+        return {(start.weekday() + k * self.interval) % 7 for k in range(7)}
+
+    def occurrences(self, start: datetime) -> List[datetime]:
+        """
+        Fechas de la serie a partir de `start` (incluida si cumple la regla).
+        Lanza ValueError si la regla es inválida o supera MAX_OCCURRENCES.
+        """
+        errors = self.validate(start)
+        if errors:
+            raise ValueError("; ".join(errors))
+        limit = self.count or MAX_OCCURRENCES + 1
+        result: List[datetime] = []
+        for moment in self._candidates(start):
+            result.append(moment)
+            if len(result) >= limit:
+                break
+        if len(result) > MAX_OCCURRENCES:
+            raise ValueError(f"La serie supera el máximo de {MAX_OCCURRENCES} citas")
+        return result
+
+    def _past_until(self, moment: datetime) -> bool:
+        return self.until is not None and moment.date() > self.until
+
+    def _candidates(self, start: datetime):
+        # `until` se revisa en cada paso (coincida o no) y los pasos tienen
+        # tope, así que el generador siempre termina
+        if self.frequency == 'daily':
+            for step in range(MAX_STEPS):
+                moment = start + timedelta(days=step * self.interval)
+                if self._past_until(moment):
+                    return
+                if not self.weekdays or moment.weekday() in self.weekdays:
+                    yield moment
+        elif self.frequency == 'weekly':
+            weekdays = sorted(set(self.weekdays)) or [start.weekday()]
+            monday = start - timedelta(days=start.weekday())
+            for week in range(MAX_STEPS):
+                for weekday in weekdays:
+                    moment = monday + timedelta(weeks=week * self.interval, days=weekday)
+                    if self._past_until(moment):
+                        return
+                    if moment >= start:
+                        yield moment
+        else:
+            # Mismo día del mes; los meses sin ese día (p. ej. 31) se omiten
+            for months in range(MAX_STEPS):
+                total = start.month - 1 + months * self.interval
+                year, month = start.year + total // 12, total % 12 + 1
+                if year > date.max.year:
+                    return
+                try:
+                    moment = start.replace(year=year, month=month)
+                except ValueError:
+                    continue
+                if self._past_until(moment):
+                    return
+                yield moment
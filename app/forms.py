@@ -1,6 +1,9 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SubmitField, DateField, TextAreaField, SelectField
-from wtforms.validators import DataRequired, EqualTo, ValidationError, Optional
+from flask_wtf.file import FileField, FileRequired
+from wtforms import StringField, PasswordField, SubmitField, DateField, TextAreaField, SelectField, \
+    IntegerField, SelectMultipleField
+from wtforms.validators import DataRequired, EqualTo, ValidationError, Optional, NumberRange
+from .domain.recurrence import MAX_OCCURRENCES
 from .models import User, Patient
 
 class LoginForm(FlaskForm):
@@ -62,16 +65,47 @@ class PatientForm(FlaskForm):
 class AppointmentForm(FlaskForm):
     patient_id = SelectField('Paciente', coerce=int, validators=[DataRequired(message='Seleccione un paciente')])
     scheduled_at = StringField('Fecha y hora (YYYY-MM-DD HH:MM)', validators=[DataRequired(message='La fecha es requerida')])
+    # 0 = sin profesional asignado; las opciones se cargan en la vista
+    employee_id = SelectField('Profesional', coerce=int, default=0, validators=[Optional()])
     reason = StringField('Motivo', validators=[Optional()])
+    # Serie de citas (opcional)
+    repeat = SelectField('Repetir', choices=[
+        ('', 'No se repite'),
+        ('daily', 'Diariamente'),
+        ('weekly', 'Semanalmente'),
+        ('monthly', 'Mensualmente'),
+    ], default='', validators=[Optional()])
+    repeat_interval = IntegerField('Cada', default=1, validators=[Optional(), NumberRange(min=1, max=52)])
+    repeat_count = IntegerField('Número de citas', validators=[Optional(), NumberRange(min=1, max=MAX_OCCURRENCES)])
+    repeat_until = DateField('Hasta', validators=[Optional()])
+    repeat_weekdays = SelectMultipleField('Días', coerce=int, choices=[
+        (0, 'Lun'), (1, 'Mar'), (2, 'Mié'), (3, 'Jue'), (4, 'Vie'), (5, 'Sáb'), (6, 'Dom'),
+    ], validators=[Optional()])
     submit = SubmitField('Agendar')
 
 
+class WaitlistForm(FlaskForm):
+    patient_id = SelectField('Paciente', coerce=int, validators=[DataRequired(message='Seleccione un paciente')])
+    window_start = StringField('Disponible desde (YYYY-MM-DD HH:MM)', validators=[DataRequired(message='La fecha es requerida')])
+    window_end = StringField('Disponible hasta (YYYY-MM-DD HH:MM)', validators=[DataRequired(message='La fecha es requerida')])
+    priority = SelectField('Prioridad', coerce=int, default=3, choices=[
+        (1, '1 - Urgente'), (2, '2 - Alta'), (3, '3 - Media'), (4, '4 - Baja'), (5, '5 - Sin urgencia'),
+    ])
+    reason = StringField('Motivo', validators=[Optional()])
+    submit = SubmitField('Agregar a lista de espera')
+
+
 class MedicalRecordForm(FlaskForm):
     title = StringField('Título', validators=[DataRequired(message='El título es requerido')])
     notes = TextAreaField('Notas', validators=[Optional()])
     submit = SubmitField('Agregar')
 
 
+class AttachmentForm(FlaskForm):
+    file = FileField('Archivo', validators=[FileRequired(message='Seleccione un archivo')])
+    submit = SubmitField('Adjuntar')
+
+
 class EmployeeForm(FlaskForm):
     first_name = StringField('Nombre', validators=[DataRequired(message='El nombre es requerido')])
     last_name = StringField('Apellido', validators=[DataRequired(message='El apellido es requerido')])
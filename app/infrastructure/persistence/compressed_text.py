@@ -0,0 +1,114 @@
+"""
+Tipo de columna para textos largos guardados comprimidos (zlib).
+
+Cada valor se guarda como BLOB con un byte de formato al inicio:
+
+- ``0x00``: UTF-8 sin comprimir (textos cortos, donde zlib no ahorra nada)
+- ``0x01``: zlib
+- ``0x02``: zlib con diccionario compartido; siguen 4 bytes con el id del
+  diccionario (crc32) para poder leerlo aunque luego se configure otro
+
+Las filas anteriores a la migración siguen como TEXT y se retornan tal cual,
+de modo que la migración por lotes puede hacerse en caliente. zstd ofrecería
+mejor razón de compresión, pero zlib está en la librería estándar.
+"""
+import struct
+import zlib
+from collections import Counter
+from typing import Dict, Iterable
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+RAW = b"\x00"
+ZLIB = b"\x01"
+ZLIB_DICT = b"\x02"
+
+# Por debajo de este tamaño el encabezado zlib cuesta más de lo que ahorra
+MIN_COMPRESS_BYTES = 256
+LEVEL = 6
+# zlib solo usa los últimos 32 KB del diccionario
+MAX_DICT_BYTES = 32 * 1024
+
+_dictionaries: Dict[int, bytes] = {}
+_active_dict_id: int | None = None
+
+
+def configure_dictionary(zdict: bytes | None) -> int | None:
+    """
+    Activa un diccionario compartido para las escrituras nuevas (None lo
+    desactiva). Los diccionarios activados antes siguen disponibles para
+    leer. Retorna el id del diccionario.
+    """
+    global _active_dict_id
+    if not zdict:
+        _active_dict_id = None
+        return None
+    dict_id = zlib.crc32(zdict)
+    _dictionaries[dict_id] = zdict
+    _active_dict_id = dict_id
+    return dict_id
+
+
+def build_dictionary(samples: Iterable[str], size: int = MAX_DICT_BYTES) -> bytes:
+    """
+    Arma un diccionario con las líneas que más se repiten en `samples`
+    (plantillas de dictado, encabezados, frases frecuentes). Las más comunes
+    van al final, donde zlib las alcanza con distancias más cortas.
+    """
+    counts = Counter(
+        line.strip() for text in samples for line in (text or "").splitlines() if len(line.strip()) > 8
+    )
+    chunks, total = [], 0
+    for line, seen in counts.most_common():
+        if seen < 2:
+            break
+        encoded = (line + "\n").encode("utf-8")
+        if total + len(encoded) > size:
+            break
+        chunks.append(encoded)
+        total += len(encoded)
+    return b"".join(reversed(chunks))
+
+
+def compress_text(value: str | None) -> bytes | None:
+    if value is None:
+        return None
+    data = value.encode("utf-8")
+    if len(data) < MIN_COMPRESS_BYTES:
+        return RAW + data
+    if _active_dict_id is not None:
+        compressor = zlib.compressobj(LEVEL, zdict=_dictionaries[_active_dict_id])
+        return ZLIB_DICT + struct.pack(">I", _active_dict_id) + compressor.compress(data) + compressor.flush()
+    return ZLIB + zlib.compress(data, LEVEL)
+
+
+def decompress_text(value: bytes | str | None) -> str | None:
+    """Decodifica un valor guardado por `compress_text`; los TEXT sin migrar se retornan igual."""
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    tag, body = value[:1], value[1:]
+    if tag == RAW:
+        return body.decode("utf-8")
+    if tag == ZLIB:
+        return zlib.decompress(body).decode("utf-8")
+    if tag == ZLIB_DICT:
+        (dict_id,) = struct.unpack(">I", body[:4])
+        zdict = _dictionaries.get(dict_id)
+        if zdict is None:
+            raise LookupError(f"Diccionario de compresión {dict_id:08x} no configurado")
+        decompressor = zlib.decompressobj(zdict=zdict)
+        return (decompressor.decompress(body[4:]) + decompressor.flush()).decode("utf-8")
+    raise ValueError("Formato de texto comprimido desconocido")
+
+
+class CompressedText(TypeDecorator):
+    """Texto en Python, BLOB comprimido en la base de datos."""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        return decompress_text(value)
@@ -1,5 +1,7 @@
 from flask_login import UserMixin
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import validates
+from .infrastructure.persistence.compressed_text import CompressedText
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, date
 
@@ -67,6 +69,10 @@ class User(UserMixin, db.Model):
 
 class Patient(db.Model):
     __tablename__ = 'patients'
+    # Índice compuesto para paginación por cursor (created_at, id)
+    __table_args__ = (
+        db.Index('ix_patients_created_at_id', 'created_at', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     first_name = db.Column(db.String(100), nullable=False)
     last_name = db.Column(db.String(100), nullable=False)
@@ -77,8 +83,10 @@ class Patient(db.Model):
     address = db.Column(db.String(255), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
-    appointments = db.relationship('Appointment', backref='patient', lazy=True, cascade="all, delete-orphan")
-    records = db.relationship('MedicalRecord', backref='patient', lazy=True, cascade="all, delete-orphan")
+    appointments = db.relationship('Appointment', backref='patient', lazy=True, cascade="all, delete-orphan",
+                                   order_by='Appointment.scheduled_at.desc()')
+    records = db.relationship('MedicalRecord', backref='patient', lazy=True, cascade="all, delete-orphan",
+                              order_by='MedicalRecord.created_at.desc()')
     
     def __init__(self, **kwargs):
         # Permitir aliases en español para compatibilidad con tests
@@ -160,23 +168,94 @@ class Patient(db.Model):
 
 class Appointment(db.Model):
     __tablename__ = 'appointments'
+    __table_args__ = (
+        db.Index('ix_appointments_status_scheduled_at', 'status', 'scheduled_at'),
+        # Agenda por profesional: rango de fechas de un employee_id en un solo recorrido
+        db.Index('ix_appointments_employee_scheduled_at', 'employee_id', 'scheduled_at'),
+    )
+    # Duración fija de cada cita en la agenda (no hay columna de duración)
+    DURATION_MINUTES = 30
+
     id = db.Column(db.Integer, primary_key=True)
-    patient_id = db.Column(db.Integer, db.ForeignKey('patients.id'), nullable=False)
-    scheduled_at = db.Column(db.DateTime, nullable=False)
+    patient_id = db.Column(db.Integer, db.ForeignKey('patients.id'), nullable=False, index=True)
+    # Profesional que atiende la cita (opcional para citas antiguas)
+    employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=True)
+    scheduled_at = db.Column(db.DateTime, nullable=False, index=True)
     reason = db.Column(db.String(255), nullable=True)
     status = db.Column(db.String(20), default='scheduled', nullable=False)  # scheduled|cancelled|completed
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     # Note: relationship defined in Patient model with backref='patient'
+    employee = db.relationship('Employee')
+
+
+class WaitlistEntry(db.Model):
+    """Paciente en lista de espera para un cupo dentro de [window_start, window_end]."""
+    __tablename__ = 'waitlist_entries'
+    __table_args__ = (
+        db.Index('ix_waitlist_entries_status_window', 'status', 'window_end'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    patient_id = db.Column(db.Integer, db.ForeignKey('patients.id'), nullable=False, index=True)
+    # 1 = urgente ... 5 = baja; a igual prioridad, primero quien llegó antes
+    priority = db.Column(db.Integer, default=3, nullable=False)
+    window_start = db.Column(db.DateTime, nullable=False)
+    window_end = db.Column(db.DateTime, nullable=False)
+    reason = db.Column(db.String(255), nullable=True)
+    status = db.Column(db.String(20), default='waiting', nullable=False)  # waiting|offered|booked|removed
+    offered_slot = db.Column(db.DateTime, nullable=True)
+    offered_employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=True)
+    offered_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    patient = db.relationship('Patient')
 
 
 class MedicalRecord(db.Model):
     __tablename__ = 'medical_records'
+    # Línea de tiempo del paciente: WHERE patient_id ORDER BY created_at, id
+    __table_args__ = (
+        db.Index('ix_medical_records_patient_created_at', 'patient_id', 'created_at'),
+    )
+    PREVIEW_LENGTH = 200
+
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('patients.id'), nullable=False)
     title = db.Column(db.String(200), nullable=False)
-    notes = db.Column(db.Text, nullable=True)
+    # Comprimida con zlib en la base de datos; texto plano en Python
+    notes = db.Column(CompressedText, nullable=True)
+    # Extracto de notes para los listados, que no cargan la nota completa
+    preview = db.Column(db.String(PREVIEW_LENGTH), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    @validates('notes')
+    def _sync_preview(self, key, notes):
+        self.preview = self.make_preview(notes)
+        return notes
+
+    @classmethod
+    def make_preview(cls, notes: str | None) -> str:
+        text = ' '.join((notes or '').split())
+        if len(text) <= cls.PREVIEW_LENGTH:
+            return text
+        return text[:cls.PREVIEW_LENGTH - 1].rstrip() + '…'
+
+
+class RecordAttachment(db.Model):
+    """Metadatos de un adjunto; el contenido vive en disco, direccionado por SHA-256."""
+    __tablename__ = 'record_attachments'
+    id = db.Column(db.Integer, primary_key=True)
+    record_id = db.Column(db.Integer, db.ForeignKey('medical_records.id'), nullable=False, index=True)
+    # Varios adjuntos con el mismo contenido comparten un solo archivo
+    sha256 = db.Column(db.String(64), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    content_type = db.Column(db.String(100), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    uploaded_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
+    record = db.relationship('MedicalRecord', backref=db.backref('attachments', lazy=True, cascade="all, delete-orphan",
+                                                                 order_by='RecordAttachment.id'))
+
 
 class Employee(db.Model):
     __tablename__ = 'employees'
@@ -4,20 +4,39 @@ from . import patients_bp
 from ..forms import PatientForm
 from ..adapters.sql_patient_repository import SqlAlchemyPatientRepository
 from ..services.patient_service import PatientService
+from .. import cache
 from ..infrastructure.audit.audit_log import AuditLogger
 from ..infrastructure.security.rate_limiter import rate_limit
 from ..infrastructure.security.access_control import require_any_role
 
 repo = SqlAlchemyPatientRepository()
-service = PatientService(repo)
+service = PatientService(repo, cache=cache)
 audit = AuditLogger()
 
+PER_PAGE = 20
+MAX_PER_PAGE = 100
+
 
 @patients_bp.route('/')
 @login_required
 def index():
-    patients = service.list()
-    return render_template('patients/index.html', patients=patients, title='Pacientes')
+    # Mismo camino paginado y filtrado que /api/v1/patients: memoria y
+    # latencia acotadas por per_page, sin importar el tamaño de la tabla
+    q = (request.args.get('q') or request.args.get('search') or '').strip()
+    page = request.args.get('page', 1, type=int)
+    per_page = min(max(request.args.get('per_page', PER_PAGE, type=int), 1), MAX_PER_PAGE)
+    patients, total = service.list_paginated(q, page, per_page)
+    pages = max(1, -(-total // per_page))
+    return render_template(
+        'patients/index.html',
+        patients=patients,
+        total=total,
+        q=q,
+        page=max(page, 1),
+        pages=pages,
+        per_page=per_page,
+        title='Pacientes',
+    )
 
 
 @patients_bp.route('/create', methods=['GET', 'POST'])
@@ -0,0 +1,74 @@
+"""
+Almacén de adjuntos direccionado por contenido.
+
+Cada archivo se guarda una sola vez en ``<raíz>/ab/cd/<sha256>``: dos subidas
+idénticas producen el mismo hash y comparten el archivo. La subida se copia
+por bloques a un temporal en la misma raíz mientras se calcula el hash y
+luego se mueve con ``os.replace`` (atómico dentro del mismo sistema de
+archivos), así que nunca queda un archivo a medio escribir con nombre final
+ni se carga el contenido completo en memoria.
+"""
+import hashlib
+import os
+import tempfile
+from typing import BinaryIO, Tuple
+from ..services.ports import BlobStorePort
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class BlobTooLarge(ValueError):
+    pass
+
+
+class EmptyBlob(ValueError):
+    pass
+
+
+class ContentAddressedStore(BlobStorePort):
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, sha256: str) -> str:
+        if len(sha256) != 64 or any(c not in "0123456789abcdef" for c in sha256):
+            raise ValueError("hash inválido")
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def exists(self, sha256: str) -> bool:
+        return os.path.exists(self.path(sha256))
+
+    def put(self, stream: BinaryIO, max_bytes: int | None = None) -> Tuple[str, int, bool]:
+        """
+        Guarda el contenido de `stream` leyéndolo por bloques. Retorna
+        (sha256, tamaño, creado); creado es False si el contenido ya existía.
+        Lanza BlobTooLarge si supera max_bytes y EmptyBlob si está vacío, en
+        ambos casos sin dejar rastros en disco.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if max_bytes is not None and size > max_bytes:
+                        raise BlobTooLarge(f"El archivo supera {max_bytes // (1024 * 1024)} MB")
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            if size == 0:
+                raise EmptyBlob("El archivo está vacío.")
+            sha256 = digest.hexdigest()
+            final = self.path(sha256)
+            if os.path.exists(final):
+                return sha256, size, False
+            os.makedirs(os.path.dirname(final), exist_ok=True)
+            os.replace(tmp_path, final)
+            tmp_path = None
+            return sha256, size, True
+        finally:
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
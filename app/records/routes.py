@@ -1,30 +1,150 @@
-from flask import render_template, redirect, url_for, flash
+import os
+from flask import current_app, render_template, redirect, url_for, flash, request, abort, send_file
+from flask_login import current_user
+from markupsafe import Markup, escape
 from flask_login import login_required
 from . import records_bp
-from ..forms import MedicalRecordForm
+from ..forms import AttachmentForm, MedicalRecordForm
+from ..adapters.sql_appointment_repository import SqlAlchemyAppointmentRepository
 from ..adapters.sql_medical_record_repository import SqlAlchemyMedicalRecordRepository
 from ..adapters.sql_patient_repository import SqlAlchemyPatientRepository
-from ..services.medical_record_service import MedicalRecordService
+from ..adapters.sql_record_search import MARK_END, MARK_START
+from ..adapters.sql_attachment_repository import SqlAlchemyAttachmentRepository
+from ..services.attachment_service import AttachmentService
+from .attachment_store import ContentAddressedStore
+from ..services.chart_service import ChartService
+from ..services.medical_record_service import MedicalRecordService, MIN_SEARCH_LENGTH
+from .. import cache
 from ..infrastructure.audit.audit_log import AuditLogger
 from ..infrastructure.security.rate_limiter import rate_limit
 from ..infrastructure.security.access_control import require_any_role
 
 record_repo = SqlAlchemyMedicalRecordRepository()
 patient_repo = SqlAlchemyPatientRepository()
-service = MedicalRecordService(record_repo)
+service = MedicalRecordService(record_repo, cache=cache)
+chart_service = ChartService(patient_repo, service, SqlAlchemyAppointmentRepository(), cache=cache)
 audit = AuditLogger()
+attachment_repo = SqlAlchemyAttachmentRepository()
+
+PER_PAGE = 20
+
+
+def _attachments() -> AttachmentService:
+    # La raíz del almacén y el tope dependen de la configuración de la app
+    root = current_app.config.get('ATTACHMENTS_DIR') or os.path.join(current_app.instance_path, 'attachments')
+    max_bytes = current_app.config.get('ATTACHMENT_MAX_MB', 64) * 1024 * 1024
+    return AttachmentService(attachment_repo, ContentAddressedStore(root), max_bytes)
+
+
+def _highlight(value: str | None) -> Markup:
+    # Se escapa el texto de la nota y solo después se convierten los marcadores
+    html = str(escape(value or ''))
+    return Markup(html.replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+@records_bp.route('/search')
+@login_required
+@require_any_role('admin', 'medico')
+def search():
+    q = (request.args.get('q') or '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    hits, has_more = service.search(q, page, PER_PAGE)
+    for hit in hits:
+        hit['title'] = _highlight(hit['title'])
+        hit['snippet'] = _highlight(hit['snippet'])
+    audit.log_action('record_search', {'query_length': len(q), 'page': page, 'hits': len(hits)})
+    return render_template('records/search.html', q=q, hits=hits, page=page, has_more=has_more,
+                           min_length=MIN_SEARCH_LENGTH, title='Buscar en historias clínicas')
 
 
 @records_bp.route('/<int:patient_id>')
 @login_required
 @require_any_role('admin', 'medico', 'enfermero')
 def list_by_patient(patient_id: int):
-    patient = patient_repo.get(patient_id)
-    if not patient:
+    cursor = request.args.get('cursor') or None
+    try:
+        # Keyset sobre (created_at, id) y caché versionada por paciente: las
+        # vistas repetidas no consultan la base hasta la siguiente escritura
+        chart = chart_service.get_chart(patient_id, cursor, PER_PAGE)
+    except ValueError:
+        flash('Página inválida')
+        return redirect(url_for('records.list_by_patient', patient_id=patient_id))
+    if chart is None:
         flash('Paciente no encontrado')
         return redirect(url_for('patients.index'))
-    records = service.list_by_patient(patient_id)
-    return render_template('records/list.html', patient=patient, records=records, title='Historial Clínico')
+    return render_template('records/list.html', patient=chart['patient'], records=chart['records'],
+                           next_cursor=chart['next_cursor'], appointments=chart['appointments'],
+                           first_page=cursor is None, title='Historial Clínico')
+
+
+@records_bp.route('/<int:patient_id>/entries/<int:record_id>')
+@login_required
+@require_any_role('admin', 'medico', 'enfermero')
+def view(patient_id: int, record_id: int):
+    # Aquí sí se carga la nota completa
+    record = service.get(record_id)
+    if not record or record.patient_id != patient_id:
+        abort(404)
+    return render_template('records/view.html', patient=record.patient, record=record,
+                           attachments=_attachments().list_by_record(record_id), form=AttachmentForm(),
+                           title=record.title)
+
+
+@records_bp.route('/<int:patient_id>/entries/<int:record_id>/attachments', methods=['POST'])
+@login_required
+@require_any_role('admin', 'medico')
+@rate_limit
+def upload_attachment(patient_id: int, record_id: int):
+    record = service.get(record_id)
+    if not record or record.patient_id != patient_id:
+        abort(404)
+    form = AttachmentForm()
+    if form.validate_on_submit():
+        upload = form.file.data
+        # Werkzeug ya volcó el archivo a un temporal; se copia por bloques al almacén
+        ok, msg, attachment = _attachments().attach(record_id, upload.stream, upload.filename, current_user.id)
+        audit.log_action('record_attachment_add', {
+            'record_id': record_id, 'success': ok, 'size': attachment.size if attachment else None,
+        })
+        flash(msg, 'success' if ok else 'danger')
+    else:
+        for error in form.file.errors:
+            flash(error, 'danger')
+    return redirect(url_for('records.view', patient_id=patient_id, record_id=record_id))
+
+
+@records_bp.errorhandler(413)
+def upload_too_large(error):
+    # Werkzeug cortó el cuerpo antes de llegar a la vista (MAX_CONTENT_LENGTH)
+    flash(f"El archivo supera {current_app.config.get('ATTACHMENT_MAX_MB', 64)} MB", 'danger')
+    args = request.view_args or {}
+    if 'patient_id' in args and 'record_id' in args:
+        return redirect(url_for('records.view', patient_id=args['patient_id'], record_id=args['record_id']))
+    return redirect(url_for('patients.index'))
+
+
+@records_bp.route('/<int:patient_id>/entries/<int:record_id>/attachments/<int:attachment_id>')
+@login_required
+@require_any_role('admin', 'medico', 'enfermero')
+def download_attachment(patient_id: int, record_id: int, attachment_id: int):
+    attachments = _attachments()
+    attachment = attachments.get(attachment_id)
+    if not attachment or attachment.record_id != record_id or attachment.record.patient_id != patient_id:
+        abort(404)
+    path = attachments.blob_path(attachment)
+    if path is None:
+        abort(410)
+    audit.log_action('record_attachment_download', {'attachment_id': attachment_id})
+    # send_file con ruta: lectura por bloques, ETag y respuestas parciales (Range)
+    return send_file(
+        path,
+        mimetype=attachment.content_type,
+        as_attachment=not attachments.is_inline(attachment),
+        download_name=attachment.filename,
+        etag=attachment.sha256,
+        conditional=True,
+        max_age=0,
+    )
 
 
 @records_bp.route('/<int:patient_id>/add', methods=['GET', 'POST'])
@@ -1,39 +1,203 @@
-from typing import Tuple, Optional, List
-from datetime import datetime
+from typing import Dict, Tuple, Optional, List
+from datetime import date, datetime, time, timedelta
+from ..domain.recurrence import RecurrenceRule
 from ..models import Appointment
+from .chart_cache import bump_all_charts, bump_chart
 from .ports import AppointmentRepositoryPort
 
 
+STATUSES = ('scheduled', 'completed', 'cancelled')
+# Horario de atención en el que se ofrecen cupos
+WORKDAY = (time(8, 0), time(18, 0))
+MAX_SLOTS = 50
+# Máquina de estados: destino -> estado del que debe partir la cita
+TRANSITIONS = {
+    'completed': 'scheduled',
+    'cancelled': 'scheduled',
+}
+BULK_TARGET_STATUSES = tuple(TRANSITIONS)
+MAX_BULK_IDS = 1000
+UTILIZATION_PERIODS = ('day', 'week')
+
+
+def _taken_message(starts) -> str:
+    taken = ", ".join(moment.strftime('%Y-%m-%d %H:%M') for moment in sorted(starts)[:5])
+    more = f" y {len(starts) - 5} más" if len(starts) > 5 else ""
+    return f"Horarios ocupados: {taken}{more}."
+
+
 class AppointmentService:
-    def __init__(self, repo: AppointmentRepositoryPort):
+    def __init__(self, repo: AppointmentRepositoryPort, waitlist=None, cache=None):
         self.repo = repo
+        # WaitlistService opcional: recibe los cupos que libera una cancelación
+        self.waitlist = waitlist
+        # Backend de caché opcional: las citas forman parte de la historia del paciente
+        self.cache = cache
 
-    def schedule(self, patient_id: int, scheduled_at: datetime, reason: str | None = None) -> Tuple[bool, str, Optional[Appointment]]:
-        appt = Appointment(patient_id=patient_id, scheduled_at=scheduled_at, reason=reason or "")
-        self.repo.add(appt)
+    def schedule(self, patient_id: int, scheduled_at: datetime, reason: str | None = None,
+                 employee_id: int | None = None) -> Tuple[bool, str, Optional[Appointment]]:
+        # Cada profesional tiene su propia agenda: solo choca con sus citas.
+        # El índice en memoria descarta rápido los choques conocidos; la
+        # inserción condicional cubre otra petición o worker simultáneo
+        duration = timedelta(minutes=Appointment.DURATION_MINUTES)
+        taken = "El horario ya está ocupado por otra cita."
+        if self.repo.find_overlapping(scheduled_at, scheduled_at + duration, employee_id=employee_id):
+            return False, taken, None
+        appt = self.repo.add_if_free(Appointment(patient_id=patient_id, scheduled_at=scheduled_at,
+                                                 reason=reason or "", employee_id=employee_id))
+        if appt is None:
+            return False, taken, None
+        bump_chart(self.cache, patient_id)
         return True, "Cita creada correctamente.", appt
 
-    def cancel(self, appointment_id: int) -> Tuple[bool, str]:
-        appt = self.repo.get(appointment_id)
-        if not appt:
-            return False, "Cita no encontrada."
-        appt.status = 'cancelled'
-        self.repo.update(appt)
+    def schedule_series(self, patient_id: int, start: datetime, rule: RecurrenceRule,
+                        reason: str | None = None, employee_id: int | None = None) -> Tuple[bool, str, List[int]]:
+        """
+        Agenda una serie completa o nada: expande la regla, valida los choques
+        de todas las fechas con una sola consulta e inserta las citas en lote.
+        Retorna (ok, mensaje, ids_creados).
+        """
+        try:
+            starts = rule.occurrences(start)
+        except ValueError as exc:
+            return False, str(exc), []
+        if not starts:
+            return False, "La regla no genera ninguna cita.", []
+        conflicts = self.repo.find_conflicts(starts, employee_id=employee_id)
+        if conflicts:
+            return False, _taken_message(conflicts), []
+        # La inserción vuelve a comprobar los choques: otra reserva pudo
+        # ocupar un horario después de find_conflicts
+        ids, taken = self.repo.add_many_if_free([
+            {"patient_id": patient_id, "scheduled_at": moment, "reason": reason or "", "employee_id": employee_id}
+            for moment in starts
+        ])
+        if taken:
+            return False, _taken_message(taken), []
+        bump_chart(self.cache, patient_id)
+        return True, f"Serie de {len(ids)} citas creada correctamente.", ids
+
+    def transition(self, appointment_id: int, status: str) -> Tuple[bool, str]:
+        """
+        Cambia el estado con un compare-and-set (UPDATE ... WHERE status =
+        :esperado): una sola sentencia, sin cargar la cita, y segura ante
+        peticiones concurrentes (una cita recién cancelada no se completa).
+        """
+        expected = TRANSITIONS.get(status)
+        if expected is None:
+            return False, "Transición de estado inválida."
+        freed = self.repo.transition_returning(appointment_id, expected, status)
+        if freed is None:
+            return False, "Cita no encontrada o ya no está programada."
+        scheduled_at, employee_id, patient_id = freed
+        bump_chart(self.cache, patient_id)
+        if status == 'completed':
+            return True, "Cita completada."
+        if self.waitlist is not None:
+            offered = self.waitlist.offer_slot(scheduled_at, employee_id=employee_id)
+            if offered is not None:
+                return True, f"Cita cancelada. Cupo ofrecido a la lista de espera (entrada #{offered.id})."
         return True, "Cita cancelada."
 
+    def cancel(self, appointment_id: int) -> Tuple[bool, str]:
+        return self.transition(appointment_id, 'cancelled')
+
     def complete(self, appointment_id: int) -> Tuple[bool, str]:
-        appt = self.repo.get(appointment_id)
-        if not appt:
-            return False, "Cita no encontrada."
-        appt.status = 'completed'
-        self.repo.update(appt)
-        return True, "Cita completada."
+        return self.transition(appointment_id, 'completed')
+
+    def next_available_slots(self, after: datetime, count: int = 5, length_minutes: int | None = None,
+                             employee_id: int | None = None) -> List[datetime]:
+        """
+        Próximos `count` horarios libres de `length_minutes` (por defecto, una
+        cita) desde `after` en la agenda de `employee_id` (None: sin profesional).
+        """
+        count = min(max(count, 0), MAX_SLOTS)
+        length = timedelta(minutes=length_minutes or Appointment.DURATION_MINUTES)
+        return self.repo.next_free_slots(after, length, count, WORKDAY, employee_id=employee_id)
+
+    def provider_day(self, employee_id: int, day: date) -> List[Appointment]:
+        """Agenda de un profesional para un día (rango sobre el índice (employee_id, scheduled_at))."""
+        start = datetime.combine(day, time.min)
+        return self.repo.list_for_provider(employee_id, start, start + timedelta(days=1))
 
-    def get(self, appointment_id: int) -> Optional[Appointment]:
-        return self.repo.get(appointment_id)
+    def utilization_report(self, date_from: date, date_to: date, period: str = 'day') -> List[Dict]:
+        """
+        Ocupación por profesional y periodo en [date_from, date_to]: minutos
+        agendados frente a la capacidad del horario de atención. Los conteos
+        se agregan en la base de datos; aquí solo se calcula la proporción.
+        """
+        if period not in UTILIZATION_PERIODS:
+            period = 'day'
+        start = datetime.combine(date_from, time.min)
+        end = datetime.combine(date_to, time.min) + timedelta(days=1)
+        day_minutes = (datetime.combine(date_from, WORKDAY[1]) - datetime.combine(date_from, WORKDAY[0])).seconds // 60
+        report = []
+        for employee_id, bucket, booked in self.repo.booked_by_provider(start, end, period):
+            first = date.fromisoformat(bucket)
+            last = first + timedelta(days=7 if period == 'week' else 1)
+            # Una semana puede quedar recortada por el rango consultado
+            days = (min(last, end.date()) - max(first, date_from)).days
+            capacity = day_minutes * days
+            minutes = booked * Appointment.DURATION_MINUTES
+            report.append({
+                'employee_id': employee_id,
+                'period': first,
+                'appointments': booked,
+                'booked_minutes': minutes,
+                'capacity_minutes': capacity,
+                'utilization': minutes / capacity if capacity else 0.0,
+            })
+        return report
 
-    def list(self) -> List[Appointment]:
-        return self.repo.list()
+    def transition_many(self, appointment_ids: List[int], status: str) -> Tuple[bool, str, List[int]]:
+        """
+        Completa o cancela muchas citas programadas con un solo UPDATE
+        condicional, con la misma máquina de estados que `transition`.
+        Retorna (ok, mensaje, ids_cambiados); las citas inexistentes o que ya
+        no estaban programadas se omiten.
+        """
+        if status not in BULK_TARGET_STATUSES:
+            return False, "Estado destino inválido.", []
+        ids = sorted(set(appointment_ids))
+        if not ids:
+            return False, "No se enviaron citas.", []
+        if len(ids) > MAX_BULK_IDS:
+            return False, f"Máximo {MAX_BULK_IDS} citas por lote.", []
+        changed = self.repo.transition_many(ids, TRANSITIONS[status], status)
+        if changed:
+            # El lote puede tocar muchos pacientes: se invalida la generación completa
+            bump_all_charts(self.cache)
+        return True, f"{len(changed)} de {len(ids)} citas actualizadas.", changed
+
+    def get(self, appointment_id: int, load_patient: str | None = None) -> Optional[Appointment]:
+        return self.repo.get(appointment_id, load_patient=load_patient)
+
+    def list(self, load_patient: str | None = None) -> List[Appointment]:
+        return self.repo.list(load_patient=load_patient)
 
     def list_by_patient(self, patient_id: int) -> List[Appointment]:
         return self.repo.list_by_patient(patient_id)
+
+    def list_paginated(self, page: int, per_page: int, status: str | None = None, patient_id: int | None = None,
+                       date_from: datetime | None = None, date_to: datetime | None = None,
+                       load_patient: str | None = None,
+                       employee_id: int | None = None) -> Tuple[List[Appointment], int, Dict[str, int]]:
+        """
+        Retorna (items, total, counts): la página filtrada, el total de la
+        vista actual y el conteo por estado (sin filtrar por estado). El total
+        sale del mismo GROUP BY, sin COUNT adicional.
+        """
+        if page < 1:
+            page = 1
+        if per_page < 1:
+            per_page = 20
+        if status not in STATUSES:
+            status = None
+        counts = self.repo.count_by_status(patient_id=patient_id, date_from=date_from, date_to=date_to,
+                                           employee_id=employee_id)
+        counts = {s: counts.get(s, 0) for s in STATUSES}
+        total = counts[status] if status else sum(counts.values())
+        items = self.repo.search_page(page, per_page, status=status, patient_id=patient_id,
+                                      date_from=date_from, date_to=date_to, load_patient=load_patient,
+                                      employee_id=employee_id)
+        return items, total, counts
@@ -0,0 +1,53 @@
+import mimetypes
+import os
+from typing import BinaryIO, List, Optional, Tuple
+from werkzeug.utils import secure_filename
+from ..models import RecordAttachment
+from .ports import AttachmentRepositoryPort, BlobStorePort
+
+# Resultados de laboratorio escaneados, imágenes y estudios
+ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'tif', 'tiff', 'dcm', 'txt'}
+# Tipos que el navegador puede mostrar sin riesgo; el resto se descarga
+INLINE_TYPES = {'application/pdf', 'image/png', 'image/jpeg'}
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class AttachmentService:
+    def __init__(self, repo: AttachmentRepositoryPort, store: BlobStorePort, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.repo = repo
+        self.store = store
+        self.max_bytes = max_bytes
+
+    def attach(self, record_id: int, stream: BinaryIO, filename: str | None,
+               user_id: int | None = None) -> Tuple[bool, str, Optional[RecordAttachment]]:
+        """
+        Guarda el archivo en el almacén (una sola copia por contenido) y
+        registra sus metadatos en la entrada. El tipo se deduce de la
+        extensión, no del encabezado enviado por el cliente.
+        """
+        name = secure_filename(filename or '')
+        extension = os.path.splitext(name)[1].lower().lstrip('.')
+        if extension not in ALLOWED_EXTENSIONS:
+            return False, f"Tipo de archivo no permitido. Use: {', '.join(sorted(ALLOWED_EXTENSIONS))}.", None
+        try:
+            sha256, size, _ = self.store.put(stream, self.max_bytes)
+        except ValueError as exc:
+            return False, str(exc), None
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        attachment = RecordAttachment(record_id=record_id, sha256=sha256, filename=name, content_type=content_type,
+                                      size=size, uploaded_by=user_id)
+        self.repo.add(attachment)
+        return True, "Archivo adjuntado.", attachment
+
+    def get(self, attachment_id: int) -> Optional[RecordAttachment]:
+        return self.repo.get(attachment_id)
+
+    def list_by_record(self, record_id: int) -> List[RecordAttachment]:
+        return self.repo.list_by_record(record_id)
+
+    def blob_path(self, attachment: RecordAttachment) -> str | None:
+        return self.store.path(attachment.sha256) if self.store.exists(attachment.sha256) else None
+
+    @staticmethod
+    def is_inline(attachment: RecordAttachment) -> bool:
+        return attachment.content_type in INLINE_TYPES
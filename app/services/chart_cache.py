@@ -0,0 +1,37 @@
+"""
+Versiones de la historia clínica en caché.
+
+La clave de cada historia incluye la versión del paciente y una generación
+global. Quien escribe reemplaza la versión después del commit: las lecturas
+siguientes usan una clave nueva y nunca ven datos anteriores a la escritura;
+las entradas viejas simplemente expiran.
+"""
+import uuid
+
+_ALL_CHARTS_KEY = "chart:generation"
+
+
+def _version(cache, key: str) -> str:
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(key, version, timeout=0)
+    return version
+
+
+def chart_key(cache, patient_id: int, *parts) -> str:
+    version = _version(cache, f"chart:{patient_id}:version")
+    generation = _version(cache, _ALL_CHARTS_KEY)
+    return ":".join(["chart", str(patient_id), version, generation, *(str(p) for p in parts)])
+
+
+def bump_chart(cache, patient_id: int | None) -> None:
+    """Invalida la historia en caché de un paciente."""
+    if cache is not None and patient_id is not None:
+        cache.set(f"chart:{patient_id}:version", uuid.uuid4().hex, timeout=0)
+
+
+def bump_all_charts(cache) -> None:
+    """Invalida todas las historias (escrituras en lote sin paciente conocido)."""
+    if cache is not None:
+        cache.set(_ALL_CHARTS_KEY, uuid.uuid4().hex, timeout=0)
@@ -0,0 +1,59 @@
+from datetime import datetime, time
+from typing import Optional
+from .chart_cache import chart_key
+from .medical_record_service import MedicalRecordService
+from .ports import AppointmentRepositoryPort, PatientRepositoryPort
+
+UPCOMING_APPOINTMENTS = 5
+
+
+class ChartService:
+    """Historia clínica armada (paciente, página de entradas y próximas citas), con caché por paciente."""
+
+    def __init__(self, patients: PatientRepositoryPort, records: MedicalRecordService,
+                 appointments: AppointmentRepositoryPort, cache=None):
+        self.patients = patients
+        self.records = records
+        self.appointments = appointments
+        self.cache = cache
+
+    def get_chart(self, patient_id: int, cursor: str | None = None, per_page: int = 20) -> Optional[dict]:
+        """
+        Datos planos (dicts) de la historia listos para la vista, o None si
+        el paciente no existe. Lanza ValueError si el cursor es inválido.
+        """
+        key = chart_key(self.cache, patient_id, per_page, cursor or '') if self.cache is not None else None
+        if key:
+            chart = self.cache.get(key)
+            if chart is not None:
+                return chart
+        chart = self._build(patient_id, cursor, per_page)
+        if key and chart is not None:
+            self.cache.set(key, chart)
+        return chart
+
+    def _build(self, patient_id: int, cursor: str | None, per_page: int) -> Optional[dict]:
+        patient = self.patients.get(patient_id)
+        if not patient:
+            return None
+        records, next_cursor = self.records.list_by_patient(patient_id, cursor, per_page)
+        today = datetime.combine(datetime.now().date(), time.min)
+        upcoming = self.appointments.search_page(1, UPCOMING_APPOINTMENTS, status='scheduled',
+                                                 patient_id=patient_id, date_from=today)
+        return {
+            'patient': {
+                'id': patient.id,
+                'full_name': patient.full_name(),
+                'document': patient.document,
+                'phone': patient.phone,
+            },
+            'records': [
+                {'id': r.id, 'title': r.title, 'preview': r.preview, 'created_at': r.created_at}
+                for r in records
+            ],
+            'next_cursor': next_cursor,
+            'appointments': [
+                {'id': a.id, 'scheduled_at': a.scheduled_at, 'reason': a.reason}
+                for a in upcoming
+            ],
+        }
@@ -1,16 +1,49 @@
-from typing import Tuple
+from typing import List, Optional, Tuple
 from ..models import MedicalRecord
+from .chart_cache import bump_chart
+from .patient_service import decode_cursor, encode_cursor
 from .ports import MedicalRecordRepositoryPort
 
+MAX_PER_PAGE = 100
+# Mínimo de caracteres útiles para buscar en notas de todos los pacientes
+MIN_SEARCH_LENGTH = 3
+
 
 class MedicalRecordService:
-    def __init__(self, repo: MedicalRecordRepositoryPort):
+    def __init__(self, repo: MedicalRecordRepositoryPort, cache=None):
+        """cache: backend opcional (Flask-Caching) cuyas historias en caché se invalidan al escribir."""
         self.repo = repo
+        self.cache = cache
 
     def add_entry(self, patient_id: int, title: str, notes: str | None = None) -> Tuple[bool, str, MedicalRecord]:
         record = MedicalRecord(patient_id=patient_id, title=title, notes=notes or "")
         self.repo.add(record)
+        bump_chart(self.cache, patient_id)
         return True, "Entrada agregada al historial clínico.", record
 
-    def list_by_patient(self, patient_id: int) -> list[MedicalRecord]:
-        return self.repo.list_by_patient(patient_id)
+    def get(self, record_id: int) -> Optional[MedicalRecord]:
+        return self.repo.get(record_id)
+
+    def list_by_patient(self, patient_id: int, cursor: str | None = None,
+                        per_page: int = 20) -> Tuple[List[MedicalRecord], str | None]:
+        """
+        Página de la historia clínica, de la más reciente a la más antigua:
+        retorna (items, next_cursor), con next_cursor None en la última
+        página. Lanza ValueError si el cursor es inválido.
+        """
+        per_page = min(max(per_page, 1), MAX_PER_PAGE)
+        after = decode_cursor(cursor) if cursor else None
+        items, has_more = self.repo.list_by_patient(patient_id, after, per_page)
+        next_cursor = encode_cursor(items[-1]) if has_more and items else None
+        return items, next_cursor
+
+    def search(self, q: str | None, page: int = 1, per_page: int = 20) -> Tuple[List[dict], bool]:
+        """
+        Busca en títulos y notas de todos los pacientes, por relevancia.
+        Retorna (hits, has_more); sin consulta si q es muy corto.
+        """
+        q = (q or "").strip()
+        if len(q) < MIN_SEARCH_LENGTH:
+            return [], False
+        per_page = min(max(per_page, 1), MAX_PER_PAGE)
+        return self.repo.search(q, max(page, 1), per_page)
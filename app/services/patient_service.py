@@ -1,11 +1,62 @@
-from typing import Tuple, Optional, List
-from ..models import Patient
+import base64
+import hashlib
+import uuid
+from datetime import datetime
+from typing import Iterator, Tuple, Optional, List
+from ..models import MedicalRecord, Patient
+from .chart_cache import bump_chart
 from .ports import PatientRepositoryPort
 
 
+def encode_cursor(row: Patient | MedicalRecord) -> str:
+    """Codifica la posición (created_at, id) de un paciente o entrada clínica como cursor opaco."""
+    raw = f"{row.created_at.isoformat()}|{row.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decodifica un cursor opaco. Lanza ValueError si el cursor es inválido."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        created_at, patient_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), int(patient_id)
+    except Exception as exc:
+        raise ValueError("cursor inválido") from exc
+
+
+COUNT_MODES = ("exact", "estimate", "none")
+INCLUDE_RELATIONS = ("appointments", "records")
+PATIENT_FIELDS = ("first_name", "last_name", "document", "birth_date", "phone", "email", "address")
+_COUNT_GENERATION_KEY = "patients:count:generation"
+
+
 class PatientService:
-    def __init__(self, repo: PatientRepositoryPort):
+    def __init__(self, repo: PatientRepositoryPort, cache=None):
+        """
+        cache: backend opcional con interfaz get/set (p. ej. Flask-Caching)
+        para los totales de list_paginated. Sin cache siempre se cuenta.
+        Las escrituras invalidan también la historia clínica en caché.
+        """
         self.repo = repo
+        self.cache = cache
+
+    # --- Caché de totales --- #
+    # Las claves incluyen una generación aleatoria; crear, actualizar o
+    # eliminar pacientes la reemplaza y deja obsoletas todas las entradas.
+
+    def _count_key(self, q: str) -> str:
+        generation = self.cache.get(_COUNT_GENERATION_KEY)
+        if generation is None:
+            generation = uuid.uuid4().hex
+            self.cache.set(_COUNT_GENERATION_KEY, generation, timeout=0)
+        normalized = " ".join(q.casefold().split())
+        digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+        return f"patients:count:{generation}:{digest}"
+
+    def _invalidate_counts(self) -> None:
+        if self.cache is not None:
+            self.cache.set(_COUNT_GENERATION_KEY, uuid.uuid4().hex, timeout=0)
 
     def create(self, first_name: str, last_name: str, document: str, **kwargs) -> Tuple[bool, str, Optional[Patient]]:
         if self.repo.get_by_document(document):
@@ -20,16 +71,61 @@ class PatientService:
             address=kwargs.get("address"),
         )
         self.repo.add(patient)
+        self._invalidate_counts()
         return True, "Paciente creado correctamente.", patient
 
+    def create_many(self, rows: List[dict]) -> List[Tuple[bool, str, Optional[int]]]:
+        """
+        Alta masiva de pacientes ya validados. Verifica duplicados del lote
+        (contra la base y dentro del propio lote) con una sola consulta e
+        inserta todo en una transacción. Retorna (ok, mensaje, id) por fila,
+        en el mismo orden de entrada.
+        """
+        existing = self.repo.get_existing_documents([row["document"] for row in rows])
+        seen = set(existing)
+        to_insert = []
+        for row in rows:
+            if row["document"] not in seen:
+                seen.add(row["document"])
+                to_insert.append({field: row.get(field) for field in PATIENT_FIELDS})
+        inserted = self.repo.add_many(to_insert)
+
+        results = []
+        for row in rows:
+            patient_id = inserted.pop(row["document"], None)
+            if patient_id is None:
+                results.append((False, "El documento ya existe.", None))
+            else:
+                results.append((True, "Paciente creado correctamente.", patient_id))
+        if to_insert:
+            self._invalidate_counts()
+        return results
+
+    def upsert(self, document: str, first_name: str, last_name: str, **kwargs) -> Tuple[Patient, bool]:
+        """
+        Crea o actualiza el paciente identificado por documento con una sola
+        sentencia INSERT ... ON CONFLICT, sin SELECT previo ni carreras entre
+        altas concurrentes. Los campos opcionales no enviados conservan su
+        valor. Retorna (paciente, creado).
+        """
+        values = {"document": document, "first_name": first_name, "last_name": last_name}
+        values.update({k: v for k, v in kwargs.items() if k in PATIENT_FIELDS and k not in values})
+        patient, created = self.repo.upsert_by_document(values)
+        self._invalidate_counts()
+        if not created:
+            bump_chart(self.cache, patient.id)
+        return patient, created
+
     def update(self, patient_id: int, **kwargs) -> Tuple[bool, str, Optional[Patient]]:
         patient = self.repo.get(patient_id)
         if not patient:
             return False, "Paciente no encontrado.", None
-        for field in ["first_name","last_name","document","birth_date","phone","email","address"]:
+        for field in PATIENT_FIELDS:
             if field in kwargs and kwargs[field] is not None:
                 setattr(patient, field, kwargs[field])
         self.repo.update(patient)
+        self._invalidate_counts()
+        bump_chart(self.cache, patient_id)
         return True, "Paciente actualizado correctamente.", patient
 
     def delete(self, patient_id: int) -> Tuple[bool, str]:
@@ -37,6 +133,8 @@ class PatientService:
         if not patient:
             return False, "Paciente no encontrado."
         self.repo.delete(patient_id)
+        self._invalidate_counts()
+        bump_chart(self.cache, patient_id)
         return True, "Paciente eliminado correctamente."
 
     def get(self, patient_id: int) -> Optional[Patient]:
@@ -45,10 +143,78 @@ class PatientService:
     def list(self) -> List[Patient]:
         return self.repo.list()
 
-    def list_paginated(self, q: str | None, page: int, per_page: int) -> Tuple[List[Patient], int]:
+    def list_paginated(self, q: str | None, page: int, per_page: int, total: str = "exact",
+                       fields: List[str] | None = None, as_rows: bool = False) -> Tuple[List[Patient], Optional[int]]:
+        """
+        Retorna (items, total). total controla el cálculo del total:
+          - "exact": total exacto, servido desde la caché cuando es posible
+          - "estimate": total aproximado sin COUNT completo (o exacto si está en caché)
+          - "none": no calcula el total (None)
+        fields limita las columnas cargadas desde la base (el resto no se lee).
+        as_rows retorna filas planas en lugar de entidades Patient.
+        """
         q = (q or "").strip()
         if page < 1:
             page = 1
         if per_page < 1:
             per_page = 10
-        return self.repo.search_paginated(q or None, page, per_page)
+        if total not in COUNT_MODES:
+            raise ValueError(f"total debe ser uno de {COUNT_MODES}")
+
+        items = self.repo.search_page(q or None, page, per_page, fields, as_rows)
+        if total == "none":
+            return items, None
+
+        key = self._count_key(q) if self.cache is not None else None
+        # Una página incompleta ya determina el total sin contar
+        if len(items) < per_page and (items or page == 1):
+            count = (page - 1) * per_page + len(items)
+        else:
+            count = self.cache.get(key) if key else None
+            if count is not None:
+                return items, count
+            if total == "estimate":
+                return items, self.repo.estimate_count(q or None)
+            count = self.repo.count(q or None)
+        if key:
+            self.cache.set(key, count)
+        return items, count
+
+    def get_many(self, patient_ids: List[int], include: List[str] | None = None) -> List[Patient]:
+        """Pacientes en el orden de patient_ids (los inexistentes se omiten)."""
+        unknown = set(include or []) - set(INCLUDE_RELATIONS)
+        if unknown:
+            raise ValueError(f"include inválido: {', '.join(sorted(unknown))}")
+        by_id = {p.id: p for p in self.repo.get_many(patient_ids, include)}
+        return [by_id[pid] for pid in dict.fromkeys(patient_ids) if pid in by_id]
+
+    def data_version(self, include: List[str] | None = None) -> Optional[int]:
+        """Versión actual de los datos de pacientes, para validación condicional."""
+        return self.repo.data_version(include)
+
+    def export(self, q: str | None = None) -> Iterator[dict]:
+        """Itera los pacientes (filtrados por q) para exportación en streaming."""
+        q = (q or "").strip()
+        return self.repo.iter_rows(q or None)
+
+    def suggest(self, prefix: str | None, limit: int = 10) -> List[dict]:
+        prefix = (prefix or "").strip()
+        if not prefix:
+            return []
+        limit = max(1, min(limit, 50))
+        return self.repo.suggest(prefix, limit)
+
+    def list_after_cursor(self, q: str | None, cursor: str | None, per_page: int,
+                          fields: List[str] | None = None, as_rows: bool = False) -> Tuple[List[Patient], Optional[str]]:
+        """
+        Paginación por cursor: retorna (items, next_cursor). El costo de cada
+        página es constante sin importar su profundidad. next_cursor es None
+        en la última página. Lanza ValueError si el cursor es inválido.
+        """
+        q = (q or "").strip()
+        if per_page < 1:
+            per_page = 10
+        after = decode_cursor(cursor) if cursor else None
+        items, has_more = self.repo.search_keyset(q or None, after, per_page, fields, as_rows)
+        next_cursor = encode_cursor(items[-1]) if has_more and items else None
+        return items, next_cursor
@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
-from typing import List, Tuple
-from ..models import User, Patient, Appointment, MedicalRecord, Employee
+from datetime import datetime, time, timedelta
+from typing import BinaryIO, Dict, Iterator, List, Set, Tuple
+from ..models import User, Patient, Appointment, MedicalRecord, Employee, WaitlistEntry, RecordAttachment
 
 class UserRepositoryPort(ABC):
     """
@@ -46,6 +47,29 @@ class PatientRepositoryPort(ABC):
     def list(self) -> List[Patient]:
         pass
 
+    @abstractmethod
+    def get_existing_documents(self, documents: List[str]) -> set[str]:
+        """Documentos de la lista que ya existen, resuelto en una sola consulta IN."""
+        pass
+
+    @abstractmethod
+    def add_many(self, rows: List[dict]) -> dict[str, int]:
+        """
+        Inserta varias filas en una sola transacción (executemany). Las filas
+        cuyo documento ya exista se omiten. Retorna {document: id} de las
+        filas insertadas.
+        """
+        pass
+
+    @abstractmethod
+    def upsert_by_document(self, values: dict) -> Tuple[Patient, bool]:
+        """
+        Inserta o actualiza el paciente con values["document"] en un solo
+        round trip. En conflicto solo se actualizan las columnas presentes en
+        values. Retorna (paciente, creado).
+        """
+        pass
+
     @abstractmethod
     def search_paginated(self, q: str | None, page: int, per_page: int) -> Tuple[List[Patient], int]:
         """
@@ -54,6 +78,74 @@ class PatientRepositoryPort(ABC):
         """
         pass
 
+    @abstractmethod
+    def search_page(self, q: str | None, page: int, per_page: int, columns: List[str] | None = None,
+                    as_rows: bool = False) -> List[Patient]:
+        """
+        Igual que search_paginated pero sin calcular el total. Si se indica
+        columns, solo se cargan esas columnas (más id); el resto queda diferido.
+        Con as_rows retorna filas planas (acceso por nombre) en lugar de
+        entidades, para serialización rápida.
+        """
+        pass
+
+    @abstractmethod
+    def count(self, q: str | None) -> int:
+        """Total exacto de pacientes que coinciden con q."""
+        pass
+
+    @abstractmethod
+    def estimate_count(self, q: str | None) -> int:
+        """
+        Total aproximado de costo acotado (sin recorrer toda la tabla). Puede
+        sobreestimar tras eliminaciones o ser una cota inferior con filtro.
+        """
+        pass
+
+    @abstractmethod
+    def search_keyset(self, q: str | None, after: Tuple[datetime, int] | None, limit: int, columns: List[str] | None = None,
+                      as_rows: bool = False) -> Tuple[List[Patient], bool]:
+        """
+        Paginación por cursor (keyset) sobre (created_at, id) descendente.
+        Retorna (items, has_more) con los pacientes posteriores a `after`,
+        sin COUNT ni OFFSET. columns y as_rows funcionan como en search_page.
+        """
+        pass
+
+    @abstractmethod
+    def iter_rows(self, q: str | None) -> Iterator[dict]:
+        """
+        Itera todas las columnas de los pacientes que coinciden con q como
+        dicts planos, ordenados por id, sin materializar el resultado.
+        """
+        pass
+
+    @abstractmethod
+    def get_many(self, patient_ids: List[int], include: List[str] | None = None) -> List[Patient]:
+        """
+        Pacientes por id con las relaciones de `include` ('appointments',
+        'records') precargadas: 1 consulta + 1 por relación, sin N+1.
+        """
+        pass
+
+    @abstractmethod
+    def data_version(self, include: List[str] | None = None) -> int | None:
+        """
+        Contador que cambia con cada escritura en pacientes (y en las
+        relaciones de `include`), para ETag. None si el adaptador no puede
+        ofrecerlo.
+        """
+        pass
+
+    @abstractmethod
+    def suggest(self, prefix: str, limit: int) -> List[dict]:
+        """
+        Autocompletado: hasta `limit` pacientes cuyo documento o nombre
+        normalizado empieza por `prefix`, como dicts (id, first_name,
+        last_name, document).
+        """
+        pass
+
 
 class AppointmentRepositoryPort(ABC):
     @abstractmethod
@@ -61,7 +153,17 @@ class AppointmentRepositoryPort(ABC):
         pass
 
     @abstractmethod
-    def get(self, appointment_id: int) -> Appointment | None:
+    def add_if_free(self, appointment: Appointment) -> Appointment | None:
+        """
+        Inserta la cita solo si su agenda no tiene otra no cancelada que se
+        solape, comprobándolo en la misma transacción que la escritura.
+        Retorna la cita guardada o None si el horario ya estaba ocupado.
+        """
+        pass
+
+    @abstractmethod
+    def get(self, appointment_id: int, load_patient: str | None = None) -> Appointment | None:
+        """load_patient: None (lazy), 'joined' o 'selectin' para precargar el paciente."""
         pass
 
     @abstractmethod
@@ -69,13 +171,118 @@ class AppointmentRepositoryPort(ABC):
         pass
 
     @abstractmethod
-    def list(self) -> List[Appointment]:
+    def list(self, load_patient: str | None = None) -> List[Appointment]:
         pass
 
     @abstractmethod
     def list_by_patient(self, patient_id: int) -> List[Appointment]:
         pass
 
+    @abstractmethod
+    def search_page(self, page: int, per_page: int, status: str | None = None, patient_id: int | None = None,
+                    date_from: datetime | None = None, date_to: datetime | None = None,
+                    load_patient: str | None = None, employee_id: int | None = None) -> List[Appointment]:
+        """
+        Página de citas ordenadas por scheduled_at, filtradas por estado,
+        paciente, profesional y rango [date_from, date_to).
+        """
+        pass
+
+    @abstractmethod
+    def count_by_status(self, patient_id: int | None = None, date_from: datetime | None = None,
+                        date_to: datetime | None = None, employee_id: int | None = None) -> Dict[str, int]:
+        """Conteo por estado con los mismos filtros (sin estado), en una sola consulta GROUP BY."""
+        pass
+
+    @abstractmethod
+    def add_many_if_free(self, rows: List[dict]) -> Tuple[List[int], List[datetime]]:
+        """
+        Inserta varias citas en un único INSERT condicional y un commit, todo o
+        nada: cada fila se inserta solo si no choca con una cita no cancelada
+        de su agenda, comprobado en la misma sentencia. Retorna (ids_creados,
+        []) o ([], inicios_ocupados) si alguna chocó y se revirtió la serie.
+        """
+        pass
+
+    @abstractmethod
+    def find_conflicts(self, starts: List[datetime], employee_id: int | None = None) -> Dict[datetime, List[int]]:
+        """
+        Para cada inicio, IDs de citas no canceladas en la agenda de
+        `employee_id` (None: citas sin profesional) que se solaparían con una
+        cita nueva en ese horario. Una sola consulta para todos los inicios.
+        """
+        pass
+
+    @abstractmethod
+    def find_overlapping(self, start: datetime, end: datetime, employee_id: int | None = None) -> List[int]:
+        """IDs de citas no canceladas de la agenda de `employee_id` que ocupan parte de [start, end)."""
+        pass
+
+    @abstractmethod
+    def next_free_slots(self, after: datetime, length: timedelta, limit: int,
+                        workday: Tuple[time, time], employee_id: int | None = None) -> List[datetime]:
+        """Próximos `limit` inicios libres de duración `length` desde `after` dentro de `workday`."""
+        pass
+
+    @abstractmethod
+    def list_for_provider(self, employee_id: int, start: datetime, end: datetime) -> List[Appointment]:
+        """Citas del profesional en [start, end) por hora, con el paciente precargado."""
+        pass
+
+    @abstractmethod
+    def booked_by_provider(self, date_from: datetime, date_to: datetime,
+                           period: str = "day") -> List[Tuple[int, str, int]]:
+        """
+        Citas no canceladas por profesional y periodo ('day' o 'week', la
+        fecha ISO del lunes) en [date_from, date_to), agregadas en la base de
+        datos con un solo GROUP BY. Retorna filas (employee_id, periodo, citas).
+        """
+        pass
+
+    @abstractmethod
+    def transition_many(self, appointment_ids: List[int], from_status: str, to_status: str) -> List[int]:
+        """
+        Pasa a `to_status` las citas de `appointment_ids` que estén en
+        `from_status`, en un único UPDATE condicional. Retorna los IDs cambiados.
+        """
+        pass
+
+    @abstractmethod
+    def transition_returning(self, appointment_id: int, from_status: str,
+                             to_status: str) -> Tuple[datetime, int | None, int] | None:
+        """
+        Compare-and-set: UPDATE ... WHERE id = :id AND status = :from_status.
+        Retorna (scheduled_at, employee_id, patient_id) de la cita cambiada, o
+        None si no existe o ya cambió de estado.
+        """
+        pass
+
+
+class WaitlistRepositoryPort(ABC):
+    @abstractmethod
+    def add(self, entry: WaitlistEntry) -> WaitlistEntry:
+        pass
+
+    @abstractmethod
+    def get(self, entry_id: int) -> WaitlistEntry | None:
+        pass
+
+    @abstractmethod
+    def list_page(self, page: int, per_page: int) -> Tuple[List[WaitlistEntry], int]:
+        """Entradas en espera u ofrecidas, por prioridad y llegada, con su paciente precargado."""
+        pass
+
+    @abstractmethod
+    def best_candidate(self, slot_start: datetime, exclude: Set[int] | None = None) -> int | None:
+        """ID de la mejor entrada en espera cuya ventana admite una cita en `slot_start`."""
+        pass
+
+    @abstractmethod
+    def set_status(self, entry_id: int, from_status: str, to_status: str,
+                   offered_slot: datetime | None = None, offered_employee_id: int | None = None) -> int:
+        """Compare-and-set del estado de una entrada. Retorna las filas afectadas."""
+        pass
+
 
 class MedicalRecordRepositoryPort(ABC):
     @abstractmethod
@@ -83,7 +290,61 @@ class MedicalRecordRepositoryPort(ABC):
         pass
 
     @abstractmethod
-    def list_by_patient(self, patient_id: int) -> List[MedicalRecord]:
+    def get(self, record_id: int) -> MedicalRecord | None:
+        """Entrada completa, incluida la nota."""
+        pass
+
+    @abstractmethod
+    def list_by_patient(self, patient_id: int, after: Tuple[datetime, int] | None = None,
+                        limit: int = 20) -> Tuple[List[MedicalRecord], bool]:
+        """
+        Línea de tiempo por cursor (keyset) sobre (created_at, id)
+        descendente: retorna (items, has_more) con las entradas posteriores a
+        `after`, sin COUNT ni OFFSET. notes queda diferida; los listados usan
+        preview.
+        """
+        pass
+
+    @abstractmethod
+    def search(self, q: str, page: int, per_page: int) -> Tuple[List[dict], bool]:
+        """
+        Búsqueda full-text en título y notas de todos los pacientes, por
+        relevancia. Retorna (hits, has_more); cada hit es un dict con id,
+        patient_id, created_at, first_name, last_name, document, title y
+        snippet (título y extracto con los términos marcados).
+        """
+        pass
+
+
+class AttachmentRepositoryPort(ABC):
+    @abstractmethod
+    def add(self, attachment: RecordAttachment) -> RecordAttachment:
+        pass
+
+    @abstractmethod
+    def get(self, attachment_id: int) -> RecordAttachment | None:
+        pass
+
+    @abstractmethod
+    def list_by_record(self, record_id: int) -> List[RecordAttachment]:
+        pass
+
+
+class BlobStorePort(ABC):
+    """Contenido binario direccionado por su SHA-256."""
+
+    @abstractmethod
+    def put(self, stream: BinaryIO, max_bytes: int | None = None) -> Tuple[str, int, bool]:
+        """Guarda el contenido leyendo por bloques. Retorna (sha256, tamaño, creado)."""
+        pass
+
+    @abstractmethod
+    def path(self, sha256: str) -> str:
+        """Ruta local del contenido, para servirlo con soporte de Range."""
+        pass
+
+    @abstractmethod
+    def exists(self, sha256: str) -> bool:
         pass
 
 
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+from typing import List, Optional, Set, Tuple
+from ..models import Appointment, WaitlistEntry
+from .ports import WaitlistRepositoryPort
+
+PRIORITIES = range(1, 6)
+# Intentos de oferta por cupo si otra petición toma la misma entrada primero
+MAX_OFFER_ATTEMPTS = 5
+
+
+class WaitlistService:
+    def __init__(self, repo: WaitlistRepositoryPort):
+        self.repo = repo
+
+    def join(self, patient_id: int, window_start: datetime, window_end: datetime, priority: int = 3,
+             reason: str | None = None) -> Tuple[bool, str, Optional[WaitlistEntry]]:
+        if priority not in PRIORITIES:
+            return False, "La prioridad debe estar entre 1 (urgente) y 5.", None
+        if window_end - window_start < timedelta(minutes=Appointment.DURATION_MINUTES):
+            return False, "La ventana debe admitir al menos una cita.", None
+        if window_end <= datetime.now():
+            return False, "La ventana ya pasó.", None
+        entry = WaitlistEntry(patient_id=patient_id, priority=priority, window_start=window_start,
+                              window_end=window_end, reason=reason or "")
+        self.repo.add(entry)
+        return True, "Paciente agregado a la lista de espera.", entry
+
+    def list_page(self, page: int, per_page: int) -> Tuple[List[WaitlistEntry], int]:
+        return self.repo.list_page(max(page, 1), per_page)
+
+    def offer_slot(self, slot_start: datetime, exclude: Set[int] | None = None,
+                   employee_id: int | None = None) -> Optional[WaitlistEntry]:
+        """
+        Ofrece un cupo liberado (de la agenda de `employee_id`, si la cita
+        tenía profesional) a la mejor entrada en espera (prioridad y luego
+        orden de llegada) cuya ventana lo admite. Retorna la entrada ofrecida
+        o None si nadie lo puede tomar.
+        """
+        if slot_start <= datetime.now():
+            return None
+        exclude = set(exclude or ())
+        for _ in range(MAX_OFFER_ATTEMPTS):
+            entry_id = self.repo.best_candidate(slot_start, exclude)
+            if entry_id is None:
+                return None
+            if self.repo.set_status(entry_id, 'waiting', 'offered', offered_slot=slot_start,
+                                    offered_employee_id=employee_id):
+                return self.repo.get(entry_id)
+            # Otro proceso la tomó antes: se descarta y se prueba la siguiente
+            exclude.add(entry_id)
+        return None
+
+    def get(self, entry_id: int) -> Optional[WaitlistEntry]:
+        return self.repo.get(entry_id)
+
+    def mark_booked(self, entry_id: int) -> bool:
+        return bool(self.repo.set_status(entry_id, 'offered', 'booked'))
+
+    def decline(self, entry_id: int) -> Tuple[bool, str, Optional[WaitlistEntry]]:
+        """
+        El paciente rechaza el cupo: vuelve a la lista de espera y el cupo se
+        ofrece a la siguiente entrada. Retorna la nueva entrada ofrecida, si hay.
+        """
+        entry = self.repo.get(entry_id)
+        if not entry or entry.status != 'offered':
+            return False, "No hay una oferta pendiente para esta entrada.", None
+        slot, employee_id = entry.offered_slot, entry.offered_employee_id
+        if not self.repo.set_status(entry_id, 'offered', 'waiting'):
+            return False, "La oferta ya fue respondida.", None
+        return True, "Oferta rechazada.", self.offer_slot(slot, exclude={entry_id}, employee_id=employee_id)
+
+    def remove(self, entry_id: int) -> bool:
+        if self.repo.set_status(entry_id, 'waiting', 'removed'):
+            return True
+        entry = self.repo.get(entry_id)
+        if not entry or entry.status != 'offered':
+            return False
+        slot, employee_id = entry.offered_slot, entry.offered_employee_id
+        if not self.repo.set_status(entry_id, 'offered', 'removed'):
+            return False
+        # El cupo que tenía ofrecido pasa a la siguiente entrada
+        self.offer_slot(slot, exclude={entry_id}, employee_id=employee_id)
+        return True
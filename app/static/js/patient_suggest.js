@@ -0,0 +1,45 @@
+// Autocompletado de pacientes para el formulario de citas.
+// Consulta /api/v1/patients/suggest y llena el <select> con los resultados.
+(function () {
+    const input = document.getElementById('patientSearch');
+    const select = document.getElementById('patient_id');
+    if (!input || !select) {
+        return;
+    }
+
+    let timer = null;
+    let controller = null;
+
+    function render(items) {
+        const selected = select.value;
+        select.innerHTML = '';
+        items.forEach(function (p) {
+            const option = document.createElement('option');
+            option.value = p.id;
+            option.textContent = p.first_name + ' ' + p.last_name + ' (' + p.document + ')';
+            if (String(p.id) === selected) {
+                option.selected = true;
+            }
+            select.appendChild(option);
+        });
+    }
+
+    input.addEventListener('input', function () {
+        clearTimeout(timer);
+        const prefix = input.value.trim();
+        if (prefix.length < 2) {
+            return;
+        }
+        timer = setTimeout(function () {
+            if (controller) {
+                controller.abort();
+            }
+            controller = new AbortController();
+            const url = input.dataset.suggestUrl + '?prefix=' + encodeURIComponent(prefix) + '&limit=20';
+            fetch(url, { credentials: 'same-origin', signal: controller.signal })
+                .then(function (r) { return r.ok ? r.json() : { items: [] }; })
+                .then(function (data) { render(data.items); })
+                .catch(function () { /* solicitud cancelada o red caída */ });
+        }, 150);
+    });
+})();
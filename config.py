@@ -29,6 +29,19 @@ class Config:
     # App metadata
     APP_VERSION = os.environ.get('APP_VERSION', '1.2.0')
 
+    # Búsqueda full-text de pacientes (SQLite FTS5)
+    PATIENT_FTS_ENABLED = os.environ.get('PATIENT_FTS_ENABLED', 'True').lower() == 'true'
+    # Búsqueda full-text en la historia clínica
+    RECORD_FTS_ENABLED = os.environ.get('RECORD_FTS_ENABLED', 'True').lower() == 'true'
+    # Diccionario zlib para las notas (scripts/compress_notes.py --build-dict); vacío = sin diccionario.
+    # Una vez usado debe seguir configurado para poder leer esas notas.
+    NOTES_COMPRESSION_DICT = os.environ.get('NOTES_COMPRESSION_DICT', '')
+
+    # Adjuntos de la historia clínica (almacén por SHA-256); vacío = <instance>/attachments
+    ATTACHMENTS_DIR = os.environ.get('ATTACHMENTS_DIR', '')
+    ATTACHMENT_MAX_MB = int(os.environ.get('ATTACHMENT_MAX_MB', 64))
+    # MAX_CONTENT_LENGTH (cuerpo máximo de cualquier petición) se deriva de ATTACHMENT_MAX_MB si no se define
+
     # CORS / API
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*')
 
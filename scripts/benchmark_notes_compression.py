@@ -0,0 +1,135 @@
+"""
+Benchmark de compresión de notas clínicas
+==========================================
+
+Llena una base SQLite con notas dictadas (texto largo y repetitivo) en
+formato TEXT, mide tamaño del archivo y lectura de notas, las migra con
+scripts/compress_notes.py (zlib y zlib con diccionario) y vuelve a medir.
+El tamaño incluye el índice de búsqueda FTS5, como en una instalación real;
+--without-fts lo omite para medir solo la tabla.
+
+Ejecutar:
+    python scripts/benchmark_notes_compression.py
+    python scripts/benchmark_notes_compression.py --rows 50000 --repeat 5
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__) + '/..'))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from sqlalchemy import text
+
+from app import create_app, db
+from app.adapters.sql_record_search import rebuild_record_fts
+from app.infrastructure.persistence.compressed_text import build_dictionary, configure_dictionary
+from app.models import MedicalRecord, Patient
+from compress_notes import compress_existing_notes, sample_notes
+
+SECTIONS = [
+    "Motivo de consulta: {motivo}. Paciente refiere evolución de {dias} días.",
+    "Antecedentes: hipertensión arterial en tratamiento con losartán 50 mg cada 12 horas.",
+    "Revisión por sistemas: niega fiebre, niega pérdida de peso, niega disnea.",
+    "Examen físico: paciente alerta, orientado, hidratado. Tensión arterial {ta}, frecuencia cardiaca {fc}.",
+    "Cardiopulmonar: ruidos cardiacos rítmicos sin soplos, murmullo vesicular conservado.",
+    "Abdomen: blando, depresible, no doloroso a la palpación, sin masas ni megalias.",
+    "Análisis: cuadro compatible con {motivo}. Se explican signos de alarma.",
+    "Plan: {plan}. Control en {control} semanas o antes si presenta signos de alarma.",
+]
+MOTIVOS = ['cefalea tensional', 'control de diabetes', 'lumbalgia mecánica', 'rinitis alérgica', 'gastritis']
+PLANES = ['acetaminofén 500 mg cada 8 horas', 'metformina 850 mg con el almuerzo', 'omeprazol 20 mg en ayunas',
+          'loratadina 10 mg diaria', 'terapia física 10 sesiones']
+
+
+def _note(rng):
+    paragraphs = rng.randint(6, 14)
+    return "\n".join(
+        rng.choice(SECTIONS).format(
+            motivo=rng.choice(MOTIVOS), dias=rng.randint(1, 30), ta=f"{rng.randint(100, 150)}/{rng.randint(60, 95)}",
+            fc=rng.randint(55, 110), plan=rng.choice(PLANES), control=rng.randint(1, 8),
+        )
+        for _ in range(paragraphs)
+    )
+
+
+def _populate(n: int, chunk: int = 5000):
+    rng = random.Random(7)
+    patient = Patient(first_name='Bench', last_name='Notas', document='BENCH0001')
+    db.session.add(patient)
+    db.session.commit()
+    base = datetime(2020, 1, 1)
+    # Inserción como TEXT plano: el formato de antes de la migración
+    for start in range(0, n, chunk):
+        db.session.execute(
+            text("INSERT INTO medical_records (patient_id, title, notes, preview, created_at) "
+                 "VALUES (:patient_id, :title, :notes, '', :created_at)"),
+            [{'patient_id': patient.id, 'title': f'Consulta {i}', 'notes': _note(rng),
+              'created_at': base + timedelta(minutes=i)} for i in range(start, min(start + chunk, n))],
+        )
+        db.session.commit()
+
+
+def _file_mb(path: str) -> float:
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql('VACUUM')
+    return os.path.getsize(path) / 1024 / 1024
+
+
+def _read_rate(repeat: int) -> float:
+    """Notas leídas (y decodificadas) por segundo, en páginas de 100 entradas."""
+    ids = [row[0] for row in db.session.execute(text('SELECT id FROM medical_records ORDER BY id'))]
+    pages = [ids[i:i + 100] for i in range(0, len(ids), 100)]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            db.session.execute(db.select(MedicalRecord.notes).where(MedicalRecord.id.in_(page))).scalars().all()
+    return repeat * len(ids) / (time.perf_counter() - start)
+
+
+def run(n: int, repeat: int, fts: bool = True):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + path,
+            'RECORD_FTS_ENABLED': fts,
+        })
+        with app.app_context():
+            _populate(n)
+            if app.extensions['record_fts']:
+                # Las filas se insertaron con SQL directo, sin pasar por la sesión
+                rebuild_record_fts(db.session.connection())
+                db.session.commit()
+            results = [('TEXT', _file_mb(path), _read_rate(repeat))]
+
+            configure_dictionary(None)
+            compress_existing_notes(only_plain=True)
+            results.append(('zlib', _file_mb(path), _read_rate(repeat)))
+
+            configure_dictionary(build_dictionary(sample_notes()))
+            compress_existing_notes(only_plain=False)
+            results.append(('zlib + diccionario', _file_mb(path), _read_rate(repeat)))
+            configure_dictionary(None)
+
+            print(f"\n📊 {n:,} notas ({'con' if app.extensions['record_fts'] else 'sin'} índice FTS5)")
+            print(f"   {'formato':<20}{'archivo (MB)':>14}{'notas/s':>12}")
+            for name, size, rate in results:
+                print(f"   {name:<20}{size:>14.1f}{rate:>12,.0f}")
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--without-fts', action='store_true', help='medir sin el índice de búsqueda')
+    args = parser.parse_args()
+    for rows in args.rows:
+        run(rows, args.repeat, fts=not args.without_fts)
@@ -0,0 +1,89 @@
+"""
+Benchmark de búsqueda de pacientes: ILIKE vs FTS5
+==================================================
+
+Compara el camino anterior (tres ILIKE '%q%' con OR, full scan) con el índice
+full-text FTS5 de `patients_fts` sobre bases SQLite de distinto tamaño.
+
+Ejecutar:
+    python scripts/benchmark_patient_search.py
+    python scripts/benchmark_patient_search.py --sizes 10000 100000 --repeat 20
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__) + '/..'))
+
+from app import create_app, db
+from app.models import Patient
+from app.adapters.sql_patient_repository import SqlAlchemyPatientRepository
+from app.adapters.sql_patient_search import install_patient_fts
+
+FIRST_NAMES = ['José', 'María', 'Ana', 'Luis', 'Andrés', 'Lucía', 'Sofía', 'Julián', 'Camila', 'Ramón']
+LAST_NAMES = ['Pérez', 'Gómez', 'Rodríguez', 'López', 'Martínez', 'Núñez', 'Díaz', 'Muñoz', 'Ruiz', 'Suárez']
+QUERIES = ['perez', 'Maria Gomez', 'DOC00042', 'nunez', 'zzz-no-match']
+
+
+def _populate(n: int, chunk: int = 10000):
+    rng = random.Random(42)
+    base = datetime(2020, 1, 1)
+    for start in range(0, n, chunk):
+        rows = [
+            {
+                'first_name': rng.choice(FIRST_NAMES),
+                'last_name': f"{rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}",
+                'document': f"DOC{i:08d}",
+                'created_at': base + timedelta(seconds=i),
+            }
+            for i in range(start, min(start + chunk, n))
+        ]
+        db.session.execute(db.insert(Patient), rows)
+        db.session.commit()
+
+
+def _time_search(repo, q: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        repo.search_paginated(q, 1, 20)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run(n: int, repeat: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'bench.db'),
+            'PATIENT_FTS_ENABLED': False,
+        })
+        with app.app_context():
+            _populate(n)
+            t0 = time.perf_counter()
+            install_patient_fts(db.engine)
+            build_ms = (time.perf_counter() - t0) * 1000
+            repo = SqlAlchemyPatientRepository()
+
+            print(f"\n📊 {n:,} pacientes (construcción índice FTS5: {build_ms:,.0f} ms)")
+            print(f"   {'consulta':<16}{'ILIKE (ms)':>12}{'FTS5 (ms)':>12}{'mejora':>10}")
+            for q in QUERIES:
+                app.extensions['patient_fts'] = False
+                ilike_ms = _time_search(repo, q, repeat)
+                app.extensions['patient_fts'] = True
+                fts_ms = _time_search(repo, q, repeat)
+                print(f"   {q:<16}{ilike_ms:>12.2f}{fts_ms:>12.2f}{ilike_ms / fts_ms:>9.1f}x")
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args.repeat)
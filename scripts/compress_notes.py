@@ -0,0 +1,97 @@
+"""
+Migra las notas clínicas al formato comprimido de CompressedText
+================================================================
+
+Re-escribe por lotes (keyset sobre id, un commit por lote) las notas que
+siguen guardadas como TEXT. La aplicación lee ambos formatos, así que puede
+ejecutarse con el sistema en uso.
+
+Ejecutar:
+    python scripts/compress_notes.py
+    python scripts/compress_notes.py --build-dict instance/notes.zdict
+    NOTES_COMPRESSION_DICT=instance/notes.zdict python scripts/compress_notes.py --all
+
+--build-dict arma un diccionario zlib con las líneas más repetidas de una
+muestra de notas; para usarlo se configura NOTES_COMPRESSION_DICT y se
+re-escriben todas las filas con --all. Al terminar conviene un VACUUM para
+devolver el espacio al sistema de archivos (--vacuum).
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__) + '/..'))
+
+from sqlalchemy import func, select, update
+
+from app import create_app, db
+from app.infrastructure.persistence.compressed_text import build_dictionary
+from app.models import MedicalRecord
+
+DICT_SAMPLE_SIZE = 2000
+
+
+def compress_existing_notes(batch_size: int = 500, only_plain: bool = True) -> int:
+    """
+    Re-escribe las notas con la configuración de compresión actual. Con
+    only_plain solo toca las filas aún guardadas como TEXT (SQLite).
+    Retorna el número de filas re-escritas.
+    """
+    table = MedicalRecord.__table__
+    last_id, total = 0, 0
+    while True:
+        stmt = select(table.c.id, table.c.notes).where(table.c.id > last_id)
+        if only_plain:
+            stmt = stmt.where(func.typeof(table.c.notes) == 'text')
+        # El tipo de la columna descomprime al leer y comprime al escribir
+        rows = db.session.execute(stmt.order_by(table.c.id).limit(batch_size)).all()
+        if not rows:
+            return total
+        stmt = (
+            update(table)
+            .where(table.c.id == db.bindparam('record_id'))
+            .values(notes=db.bindparam('body', type_=table.c.notes.type))
+        )
+        db.session.execute(stmt, [{'record_id': row.id, 'body': row.notes} for row in rows])
+        db.session.commit()
+        total += len(rows)
+        last_id = rows[-1].id
+
+
+def sample_notes(limit: int = DICT_SAMPLE_SIZE):
+    # Las más recientes reflejan mejor las plantillas de dictado en uso
+    stmt = select(MedicalRecord.notes).order_by(MedicalRecord.id.desc()).limit(limit)
+    return [notes for notes in db.session.scalars(stmt) if notes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--all', action='store_true', help='re-escribir también las filas ya comprimidas')
+    parser.add_argument('--build-dict', metavar='PATH', help='generar un diccionario zlib y salir')
+    parser.add_argument('--vacuum', action='store_true', help='ejecutar VACUUM al terminar (SQLite)')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.build_dict:
+            zdict = build_dictionary(sample_notes())
+            with open(args.build_dict, 'wb') as fh:
+                fh.write(zdict)
+            print(f"✅ Diccionario de {len(zdict):,} bytes guardado en {args.build_dict}")
+            print("   Configure NOTES_COMPRESSION_DICT y ejecute con --all para aplicarlo.")
+            return
+
+        start = time.perf_counter()
+        count = compress_existing_notes(args.batch_size, only_plain=not args.all)
+        print(f"✅ {count:,} notas re-escritas en {time.perf_counter() - start:.1f} s")
+        if args.vacuum and db.engine.dialect.name == 'sqlite':
+            with db.engine.connect() as conn:
+                conn.exec_driver_sql('VACUUM')
+            print("   VACUUM completado")
+
+
+if __name__ == '__main__':
+    main()
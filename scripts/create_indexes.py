@@ -42,14 +42,14 @@ def create_indexes():
             
             # Appointments table
             ("idx_appointment_patient", "appointments", "patient_id"),
-            ("idx_appointment_employee", "appointments", "employee_id"),
+            # Agenda por profesional: el prefijo employee_id también sirve al FK
+            ("idx_appointment_employee", "appointments", "employee_id, scheduled_at"),
             ("idx_appointment_date", "appointments", "scheduled_at"),
-            ("idx_appointment_estado", "appointments", "estado"),
+            ("idx_appointment_estado", "appointments", "status, scheduled_at"),
             
             # Medical Records table
-            ("idx_medical_record_patient", "medical_records", "patient_id"),
-            ("idx_medical_record_employee", "medical_records", "employee_id"),
-            ("idx_medical_record_date", "medical_records", "fecha_registro"),
+            # Línea de tiempo por paciente (keyset sobre created_at, id)
+            ("idx_medical_record_patient_date", "medical_records", "patient_id, created_at"),
         ]
         
         created = 0
@@ -8,12 +8,26 @@ if REPO_ROOT not in sys.path:
     sys.path.insert(0, REPO_ROOT)
 
 from app import create_app
-from app.models import db
+from app.infrastructure.persistence.compressed_text import decompress_text
+from app.models import MedicalRecord, db
 
 SQLITE_ADD_COLUMNS = [
     ("user", "role", "TEXT NOT NULL DEFAULT 'recepcionista'"),
     ("user", "failed_login_attempts", "INTEGER NOT NULL DEFAULT 0"),
     ("user", "locked_until", "DATETIME NULL"),
+    ("medical_records", "preview", "VARCHAR(200) NULL"),
+    ("appointments", "employee_id", "INTEGER NULL REFERENCES employees(id)"),
+    ("waitlist_entries", "offered_employee_id", "INTEGER NULL REFERENCES employees(id)"),
+]
+
+# Índices que create_all() no agrega a tablas existentes
+SQLITE_INDEXES = [
+    ("ix_patients_created_at_id", "patients", "created_at, id"),
+    ("ix_medical_records_patient_created_at", "medical_records", "patient_id, created_at"),
+    ("ix_appointments_patient_id", "appointments", "patient_id"),
+    ("ix_appointments_scheduled_at", "appointments", "scheduled_at"),
+    ("ix_appointments_status_scheduled_at", "appointments", "status, scheduled_at"),
+    ("ix_appointments_employee_scheduled_at", "appointments", "employee_id, scheduled_at"),
 ]
 
 
@@ -23,6 +37,22 @@ def column_exists(conn, table: str, column: str) -> bool:
     return column in cols
 
 
+def backfill_record_previews(conn, batch_size: int = 500) -> bool:
+    """Completa preview de las entradas previas a la columna, por lotes."""
+    changed = False
+    while True:
+        rows = conn.execute(
+            "SELECT id, notes FROM medical_records WHERE preview IS NULL LIMIT ?", (batch_size,)
+        ).fetchall()
+        if not rows:
+            return changed
+        conn.executemany(
+            "UPDATE medical_records SET preview = ? WHERE id = ?",
+            [(MedicalRecord.make_preview(decompress_text(notes)), record_id) for record_id, notes in rows],
+        )
+        changed = True
+
+
 def ensure_columns():
     app = create_app()
     with app.app_context():
@@ -36,6 +66,9 @@ def ensure_columns():
                     print(f"Adding missing column {table}.{col} ...")
                     conn.execute(f"ALTER TABLE {table} ADD COLUMN {col} {ddl}")
                     changed = True
+            for name, table, columns in SQLITE_INDEXES:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({columns})")
+            changed = backfill_record_previews(conn) or changed
             if changed:
                 conn.commit()
                 print("Migration applied successfully.")
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app.models import db, Patient, Appointment, User
+
+
+def _seed(app, n=5):
+    with app.app_context():
+        patient = Patient(first_name="Lote", last_name="Citas", document="BULK0001")
+        db.session.add(patient)
+        db.session.flush()
+        appointments = [
+            Appointment(patient_id=patient.id, scheduled_at=datetime(2030, 2, 1, 8) + timedelta(hours=i))
+            for i in range(n)
+        ]
+        db.session.add_all(appointments)
+        db.session.commit()
+        return [a.id for a in appointments]
+
+
+def test_bulk_status_updates_only_scheduled(app, auth_client):
+    ids = _seed(app)
+    with app.app_context():
+        db.session.get(Appointment, ids[0]).status = 'cancelled'
+        db.session.commit()
+        engine = db.engine
+
+    updates = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("UPDATE"):
+            updates.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _capture)
+    try:
+        r = auth_client.post('/api/v1/appointments/status', json={"ids": ids + [9999], "status": "completed"})
+    finally:
+        event.remove(engine, "before_cursor_execute", _capture)
+
+    assert r.status_code == 200
+    data = r.get_json()
+    assert data["updated"] == ids[1:]
+    assert data["skipped"] == sorted([ids[0], 9999])
+    assert len(updates) == 1
+    with app.app_context():
+        statuses = dict(db.session.query(Appointment.id, Appointment.status).all())
+    assert statuses[ids[0]] == 'cancelled'
+    assert all(statuses[i] == 'completed' for i in ids[1:])
+
+    # Repetir el lote no cambia nada
+    assert auth_client.post('/api/v1/appointments/status', json={"ids": ids, "status": "completed"}).get_json()["updated"] == []
+
+
+def test_bulk_status_validation(app, auth_client):
+    ids = _seed(app, 1)
+    url = '/api/v1/appointments/status'
+    assert auth_client.post(url, json={"ids": ids, "status": "scheduled"}).status_code == 422
+    assert auth_client.post(url, json={"ids": "1,2", "status": "cancelled"}).status_code == 422
+    assert auth_client.post(url, json={"ids": [], "status": "cancelled"}).status_code == 422
+    assert auth_client.post(url, data="ids=1").status_code == 415
+    r = auth_client.post(url, json=[1])
+    assert r.status_code == 422 and r.get_json() == {"errors": {"_schema": ["Invalid input type."]}}
+
+
+def test_bulk_status_role_per_transition(app, client):
+    ids = _seed(app, 2)
+    with app.app_context():
+        user = User(username='recepcion', role='recepcionista')
+        user.set_password('recepcion123')
+        db.session.add(user)
+        db.session.commit()
+    client.post('/auth/login', data={'username': 'recepcion', 'password': 'recepcion123'})
+
+    url = '/api/v1/appointments/status'
+    assert client.post(url, json={"ids": ids, "status": "completed"}).status_code == 403
+    r = client.post(url, json={"ids": ids, "status": "cancelled"})
+    assert r.status_code == 200 and r.get_json()["updated"] == ids
+
+
+def test_bulk_cancel_frees_slots(app, auth_client):
+    ids = _seed(app, 1)
+    slots_url = '/api/v1/appointments/slots?after=2030-02-01T08:00&count=1'
+    assert auth_client.get(slots_url).get_json()["slots"] == ["2030-02-01T08:30:00"]
+    auth_client.post('/api/v1/appointments/status', json={"ids": ids, "status": "cancelled"})
+    assert auth_client.get(slots_url).get_json()["slots"] == ["2030-02-01T08:00:00"]
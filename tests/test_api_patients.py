@@ -61,3 +61,465 @@ def test_create_patient_conflict_document():
         r2 = client.post("/api/v1/patients", json=payload)
         assert r2.status_code == 409
         assert "unique" in r2.get_json()["error"]
+
+
+def test_list_patients_cursor_pagination():
+    app = make_app()
+    with app.test_client() as client:
+        for i in range(5):
+            r = client.post("/api/v1/patients", json={
+                "first_name": "Paciente",
+                "last_name": f"Numero{i}",
+                "document": f"CUR{i:05d}",
+            })
+            assert r.status_code == 201
+
+        seen = []
+        cursor = ""
+        pages = 0
+        while cursor is not None:
+            r = client.get("/api/v1/patients", query_string={"cursor": cursor, "per_page": 2})
+            assert r.status_code == 200
+            data = r.get_json()
+            assert "total" not in data
+            seen.extend(item["document"] for item in data["items"])
+            cursor = data["next_cursor"]
+            pages += 1
+
+        assert pages == 3
+        assert len(seen) == len(set(seen)) == 5
+        # Mismo orden que el modo page/per_page
+        r = client.get("/api/v1/patients", query_string={"per_page": 5})
+        assert [item["document"] for item in r.get_json()["items"]] == seen
+
+
+def test_list_patients_invalid_cursor():
+    app = make_app()
+    with app.test_client() as client:
+        r = client.get("/api/v1/patients", query_string={"cursor": "not-a-cursor"})
+        assert r.status_code == 400
+        assert r.get_json()["error"] == "invalid cursor"
+
+
+def test_search_patients_full_text_folds_accents_and_stays_in_sync():
+    app = make_app()
+    assert app.extensions["patient_fts"]
+    with app.test_client() as client:
+        r = client.post("/api/v1/patients", json={
+            "first_name": "José",
+            "last_name": "Pérez",
+            "document": "FTS00001",
+        })
+        created = r.get_json()
+        client.post("/api/v1/patients", json={
+            "first_name": "Ana",
+            "last_name": "Gomez",
+            "document": "FTS00002",
+        })
+
+        data = client.get("/api/v1/patients", query_string={"q": "perez"}).get_json()
+        assert data["total"] == 1
+        assert data["items"][0]["document"] == "FTS00001"
+        # Prefijo de documento (búsqueda mientras se escribe)
+        data = client.get("/api/v1/patients", query_string={"q": "FTS0000"}).get_json()
+        assert data["total"] == 2
+
+        with app.app_context():
+            from app.models import db, Patient
+            patient = db.session.get(Patient, created["id"])
+            patient.last_name = "Ramírez"
+            db.session.commit()
+        assert client.get("/api/v1/patients", query_string={"q": "Pérez"}).get_json()["total"] == 0
+        assert client.get("/api/v1/patients", query_string={"q": "ramirez"}).get_json()["total"] == 1
+
+        with app.app_context():
+            from app.models import db, Patient
+            db.session.delete(db.session.get(Patient, created["id"]))
+            db.session.commit()
+        assert client.get("/api/v1/patients", query_string={"q": "ramirez"}).get_json()["total"] == 0
+
+
+def _login_admin(app, client):
+    from app.models import db, User
+    with app.app_context():
+        user = User(username="admin_api", role="admin")
+        user.set_password("admin12345")
+        db.session.add(user)
+        db.session.commit()
+    client.post("/auth/login", data={"username": "admin_api", "password": "admin12345"})
+
+
+def test_suggest_patients_prefix_index():
+    app = make_app()
+    with app.test_client() as client:
+        assert client.get("/api/v1/patients/suggest", query_string={"prefix": "pe"}).status_code == 302
+        _login_admin(app, client)
+
+        client.post("/api/v1/patients", json={"first_name": "José", "last_name": "Pérez Gómez", "document": "SUG00001"})
+        data = client.get("/api/v1/patients/suggest", query_string={"prefix": "perez g"}).get_json()
+        assert [p["document"] for p in data["items"]] == ["SUG00001"]
+
+        # Altas, cambios y bajas posteriores se reflejan sin reconstruir el índice
+        r = client.post("/api/v1/patients", json={"first_name": "Ana", "last_name": "Peña", "document": "SUG00002"})
+        new_id = r.get_json()["id"]
+        data = client.get("/api/v1/patients/suggest", query_string={"prefix": "pe"}).get_json()
+        assert {p["document"] for p in data["items"]} == {"SUG00001", "SUG00002"}
+        assert client.get("/api/v1/patients/suggest", query_string={"prefix": "sug0000"}).get_json()["items"]
+
+        with app.app_context():
+            from app.models import db, Patient
+            patient = db.session.get(Patient, new_id)
+            patient.last_name = "Rojas"
+            db.session.commit()
+            db.session.delete(db.session.get(Patient, new_id))
+            db.session.commit()
+        data = client.get("/api/v1/patients/suggest", query_string={"prefix": "pe", "limit": 1}).get_json()
+        assert [p["document"] for p in data["items"]] == ["SUG00001"]
+        assert client.get("/api/v1/patients/suggest", query_string={"prefix": "rojas"}).get_json()["items"] == []
+
+
+def test_appointment_form_does_not_load_all_patients():
+    app = make_app()
+    with app.test_client() as client:
+        _login_admin(app, client)
+        r = client.post("/api/v1/patients", json={"first_name": "Luis", "last_name": "Diaz", "document": "APP00001"})
+        patient_id = r.get_json()["id"]
+
+        html = client.get("/appointments/create").get_data(as_text=True)
+        assert "APP00001" not in html
+
+        r = client.post("/appointments/create", data={
+            "patient_id": patient_id,
+            "scheduled_at": "2030-01-15 10:00",
+            "reason": "Control",
+        })
+        assert r.status_code == 302
+
+
+def test_list_patients_total_param():
+    app = make_app()
+    with app.test_client() as client:
+        for i in range(3):
+            client.post("/api/v1/patients", json={"first_name": "Eva", "last_name": f"Ruiz{i}", "document": f"TOT{i:05d}"})
+        data = client.get("/api/v1/patients", query_string={"per_page": 2, "total": "none"}).get_json()
+        assert data["total"] is None and len(data["items"]) == 2
+        data = client.get("/api/v1/patients", query_string={"per_page": 2, "total": "estimate"}).get_json()
+        assert data["total"] == 3
+        assert client.get("/api/v1/patients", query_string={"total": "bogus"}).status_code == 400
+
+
+def test_export_patients_streams_csv_and_ndjson():
+    import csv
+    import io
+    import json
+    app = make_app()
+    with app.test_client() as client:
+        assert client.get("/api/v1/patients/export").status_code == 302
+        _login_admin(app, client)
+        client.post("/api/v1/patients", json={"first_name": "Ana", "last_name": "Gómez", "document": "EXP00001", "birth_date": "1990-05-17"})
+        client.post("/api/v1/patients", json={"first_name": "Luis", "last_name": "Díaz", "document": "EXP00002"})
+
+        r = client.get("/api/v1/patients/export", query_string={"format": "ndjson"})
+        assert r.status_code == 200
+        assert r.mimetype == "application/x-ndjson"
+        lines = [json.loads(line) for line in r.get_data(as_text=True).splitlines()]
+        listed = client.get("/api/v1/patients").get_json()["items"]
+        assert sorted(lines, key=lambda p: p["id"]) == sorted(listed, key=lambda p: p["id"])
+
+        r = client.get("/api/v1/patients/export", query_string={"format": "csv", "q": "gomez"})
+        assert r.mimetype == "text/csv"
+        rows = list(csv.DictReader(io.StringIO(r.get_data(as_text=True))))
+        assert [row["document"] for row in rows] == ["EXP00001"]
+        assert rows[0]["birth_date"] == "1990-05-17"
+
+        assert client.get("/api/v1/patients/export", query_string={"format": "xml"}).status_code == 400
+
+
+def test_bulk_create_patients_ndjson_and_csv():
+    import json
+    app = make_app()
+    with app.test_client() as client:
+        _login_admin(app, client)
+        client.post("/api/v1/patients", json={"first_name": "Ana", "last_name": "Gomez", "document": "BULK00001"})
+        # Construye el índice de prefijos antes de la carga masiva
+        assert len(client.get("/api/v1/patients/suggest", query_string={"prefix": "bulk"}).get_json()["items"]) == 1
+
+        lines = [
+            {"first_name": "Ana", "last_name": "Gomez", "document": "BULK00001"},    # ya existe
+            {"first_name": "Luis", "last_name": "Díaz", "document": "BULK00002", "birth_date": "1980-02-03"},
+            {"first_name": "Luis", "last_name": "Díaz", "document": "BULK00002"},    # repetido en el lote
+            {"first_name": "Sin", "last_name": "Documento"},                         # inválido
+        ]
+        body = "\n".join(json.dumps(l) for l in lines) + "\nnot json\n"
+        r = client.post("/api/v1/patients/bulk", data=body, content_type="application/x-ndjson")
+        assert r.status_code == 200
+        data = r.get_json()
+        assert data["summary"] == {"created": 1, "duplicate": 2, "invalid": 2}
+        assert [res["status"] for res in data["results"]] == ["duplicate", "created", "duplicate", "invalid", "invalid"]
+        assert "document" in data["results"][3]["errors"]
+
+        csv_body = "first_name,last_name,document,email\nEva,Ruiz,BULK00003,\nJuan,Peña,BULK00004,juan@example.com\n"
+        r = client.post("/api/v1/patients/bulk", data=csv_body, content_type="text/csv")
+        assert r.get_json()["summary"] == {"created": 2, "duplicate": 0, "invalid": 0}
+
+        # Totales en caché invalidados, FTS e índice de prefijos sincronizados
+        assert client.get("/api/v1/patients", query_string={"per_page": 2}).get_json()["total"] == 4
+        assert client.get("/api/v1/patients", query_string={"q": "pena"}).get_json()["total"] == 1
+        suggested = client.get("/api/v1/patients/suggest", query_string={"prefix": "bulk0000"}).get_json()["items"]
+        assert len(suggested) == 4
+
+        assert client.post("/api/v1/patients/bulk", data="x", content_type="text/plain").status_code == 415
+
+
+def test_bulk_import_reports_progress_on_invalid_utf8(monkeypatch):
+    import json
+    import app.api as api
+    from app.models import Patient
+    monkeypatch.setattr(api, "IMPORT_CHUNK_ROWS", 100)
+    app = make_app()
+    with app.test_client() as client:
+        _login_admin(app, client)
+        r = client.post("/api/v1/patients/bulk", data=b"\xff\xfe", content_type="application/x-ndjson")
+        assert r.status_code == 400
+        assert (r.get_json()["row"], r.get_json()["committed_chunks"]) == (1, 0)
+
+        # El error llega después de varios bloques ya guardados
+        body = "\n".join(json.dumps({"first_name": "Utf", "last_name": f"Fila {i}", "document": f"UTF{i:06d}"})
+                         for i in range(400)).encode() + b"\n\xff\xfe\n"
+        r = client.post("/api/v1/patients/bulk", data=body, content_type="application/x-ndjson")
+        assert r.status_code == 400
+        data = r.get_json()
+        assert data["committed_chunks"] >= 1 and data["committed_rows"] == data["committed_chunks"] * 100
+        assert data["row"] > data["committed_rows"]
+        assert data["summary"]["created"] == data["committed_rows"]
+    with app.app_context():
+        assert Patient.query.filter(Patient.document.like("UTF%")).count() == data["committed_rows"]
+
+
+def test_upsert_patient_by_document():
+    app = make_app()
+    with app.test_client() as client:
+        url = "/api/v1/patients/by-document/UPS00001"
+        _login_admin(app, client)
+        r = client.put(url, json={"first_name": "Ana", "last_name": "Gomez", "phone": "3001234567"})
+        assert r.status_code == 201
+        created = r.get_json()
+
+        r = client.put(url, json={"first_name": "Ana María", "last_name": "Gomez"})
+        assert r.status_code == 200
+        updated = r.get_json()
+        assert updated["id"] == created["id"]
+        assert updated["first_name"] == "Ana María"
+        # Campos opcionales no enviados se conservan
+        assert updated["phone"] == "3001234567"
+        assert updated["created_at"] == created["created_at"]
+
+        data = client.get("/api/v1/patients", query_string={"q": "maria"}).get_json()
+        assert data["total"] == 1
+
+        r = client.put(url, json={"first_name": "Ana", "last_name": "Gomez", "document": "OTRO00001"})
+        assert r.status_code == 422
+
+        r = client.put(url, json=[{"first_name": "Ana"}])
+        assert r.status_code == 422 and r.get_json() == {"errors": {"_schema": ["Invalid input type."]}}
+
+
+def test_upsert_patient_requires_admin_or_reception():
+    from app.models import db, Patient, User
+    app = make_app()
+    url = "/api/v1/patients/by-document/UPS00002"
+    payload = {"first_name": "Ana", "last_name": "Gomez"}
+    with app.app_context():
+        user = User(username="medico_api", role="medico")
+        user.set_password("medico12345")
+        db.session.add(user)
+        db.session.commit()
+    with app.test_client() as client:
+        # Sin sesión: redirige al login (login_required), sin escribir
+        assert client.put(url, json=payload).status_code == 302
+        client.post("/auth/login", data={"username": "medico_api", "password": "medico12345"})
+        assert client.put(url, json=payload).status_code == 403
+    with app.app_context():
+        assert Patient.query.filter_by(document="UPS00002").count() == 0
+
+
+def test_list_patients_sparse_fieldsets():
+    from sqlalchemy import event
+    from app.models import db
+    app = make_app()
+    with app.test_client() as client:
+        for i in range(3):
+            client.post("/api/v1/patients", json={
+                "first_name": "Eva", "last_name": f"Ruiz{i}", "document": f"FLD{i:05d}",
+                "address": "Calle 123", "email": "eva@example.com",
+            })
+
+        statements = []
+
+        def capture(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            fields = "id,first_name,last_name,document"
+            data = client.get("/api/v1/patients", query_string={"fields": fields, "per_page": 2}).get_json()
+            cursor_data = client.get("/api/v1/patients", query_string={"fields": "document", "cursor": ""}).get_json()
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+
+        assert all(set(item) == {"id", "first_name", "last_name", "document"} for item in data["items"])
+        assert data["total"] == 3
+        assert [set(item) for item in cursor_data["items"]] == [{"document"}] * 3
+        page_selects = [s for s in statements if "FROM patients" in s and "LIMIT" in s]
+        assert page_selects and not any("patients.address" in s for s in page_selects)
+
+        assert client.get("/api/v1/patients", query_string={"fields": "id,password"}).status_code == 400
+
+
+def test_list_patients_conditional_get():
+    from sqlalchemy import event
+    from app.models import db
+    app = make_app()
+    with app.test_client() as client:
+        client.post("/api/v1/patients", json={"first_name": "Eva", "last_name": "Ruiz", "document": "ETAG00001"})
+        r = client.get("/api/v1/patients", query_string={"per_page": 5})
+        etag = r.headers["ETag"]
+        assert r.status_code == 200 and etag
+
+        statements = []
+
+        def capture(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            r = client.get("/api/v1/patients", query_string={"per_page": 5}, headers={"If-None-Match": etag})
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+        assert r.status_code == 304
+        assert r.headers["ETag"] == etag
+        assert not any("FROM patients" in s for s in statements)
+
+        # Otra URL, otro ETag
+        other = client.get("/api/v1/patients", query_string={"per_page": 6}).headers["ETag"]
+        assert other != etag
+
+        # Cualquier escritura cambia la versión
+        _login_admin(app, client)
+        client.put("/api/v1/patients/by-document/ETAG00001", json={"first_name": "Eva", "last_name": "Ruiz Soto"})
+        r = client.get("/api/v1/patients", query_string={"per_page": 5}, headers={"If-None-Match": etag})
+        assert r.status_code == 200
+        assert r.headers["ETag"] != etag
+
+
+def _seed_patients_with_history(app, n, per_patient=3):
+    from datetime import datetime, timedelta
+    from app.models import db, Patient, Appointment, MedicalRecord
+    with app.app_context():
+        ids = []
+        for i in range(n):
+            patient = Patient(first_name="Hist", last_name=f"Paciente{i}", document=f"HIST{i:05d}")
+            db.session.add(patient)
+            db.session.flush()
+            for j in range(per_patient):
+                db.session.add(Appointment(patient_id=patient.id, scheduled_at=datetime(2030, 1, 1) + timedelta(days=j)))
+                db.session.add(MedicalRecord(patient_id=patient.id, title=f"Control {j}", notes="Sin novedad"))
+            ids.append(patient.id)
+        db.session.commit()
+        return ids
+
+
+def test_patient_detail_with_includes():
+    app = make_app()
+    ids = _seed_patients_with_history(app, 2)
+    with app.test_client() as client:
+        _login_admin(app, client)
+        r = client.get(f"/api/v1/patients/{ids[0]}", query_string={"include": "appointments,records"})
+        assert r.status_code == 200
+        data = r.get_json()
+        assert data["document"] == "HIST00000"
+        assert len(data["appointments"]) == 3 and len(data["records"]) == 3
+        # Orden de la relación: citas más recientes primero
+        assert data["appointments"][0]["scheduled_at"] > data["appointments"][-1]["scheduled_at"]
+
+        etag = r.headers["ETag"]
+        r = client.get(f"/api/v1/patients/{ids[0]}", query_string={"include": "appointments,records"},
+                       headers={"If-None-Match": etag})
+        assert r.status_code == 304
+
+        assert "appointments" not in client.get(f"/api/v1/patients/{ids[0]}").get_json()
+        assert client.get("/api/v1/patients/99999").status_code == 404
+        assert client.get(f"/api/v1/patients/{ids[0]}", query_string={"include": "secrets"}).status_code == 400
+
+        r = client.get("/api/v1/patients/batch", query_string={"ids": f"{ids[1]},99999,{ids[0]}", "include": "records"})
+        data = r.get_json()
+        assert [p["id"] for p in data["items"]] == [ids[1], ids[0]]
+        assert data["missing"] == [99999]
+
+
+def test_patient_detail_records_require_clinical_role():
+    from app.models import db, User
+    app = make_app()
+    ids = _seed_patients_with_history(app, 1)
+    with app.app_context():
+        user = User(username="recep_api", role="recepcionista")
+        user.set_password("recep12345")
+        db.session.add(user)
+        db.session.commit()
+    with app.test_client() as client:
+        client.post("/auth/login", data={"username": "recep_api", "password": "recep12345"})
+        assert client.get(f"/api/v1/patients/{ids[0]}", query_string={"include": "appointments"}).status_code == 200
+        assert client.get(f"/api/v1/patients/{ids[0]}", query_string={"include": "records"}).status_code == 403
+
+
+def test_patient_batch_includes_use_constant_queries():
+    from sqlalchemy import event
+    from app.models import db
+    app = make_app()
+    ids = _seed_patients_with_history(app, 8, per_patient=4)
+    with app.test_client() as client:
+        _login_admin(app, client)
+        with app.app_context():
+            engine = db.engine
+
+        def data_queries(query_string):
+            statements = []
+
+            def capture(conn, cursor, statement, *args):
+                if statement.lstrip().upper().startswith("SELECT") and "table_versions" not in statement \
+                        and "FROM user" not in statement:
+                    statements.append(statement)
+
+            event.listen(engine, "before_cursor_execute", capture)
+            try:
+                assert client.get("/api/v1/patients/batch", query_string=query_string).status_code == 200
+            finally:
+                event.remove(engine, "before_cursor_execute", capture)
+            return len(statements)
+
+        one = data_queries({"ids": str(ids[0]), "include": "appointments,records"})
+        many = data_queries({"ids": ",".join(map(str, ids)), "include": "appointments,records"})
+        assert one == many == 3
+        assert data_queries({"ids": ",".join(map(str, ids)), "include": "appointments"}) == 2
+        assert data_queries({"ids": ",".join(map(str, ids))}) == 1
+
+
+def test_list_patients_fast_serializer_matches_marshmallow():
+    from app.api import patients_schema
+    from app.models import Patient
+    app = make_app()
+    with app.test_client() as client:
+        client.post("/api/v1/patients", json={
+            "first_name": "Ana", "last_name": "Gómez", "document": "FAST00001",
+            "birth_date": "1990-05-17", "email": "ana@example.com", "phone": "300", "address": "Calle 1",
+        })
+        client.post("/api/v1/patients", json={"first_name": "Luis", "last_name": "Díaz", "document": "FAST00002"})
+        items = client.get("/api/v1/patients").get_json()["items"]
+        with app.app_context():
+            patients = Patient.query.order_by(Patient.created_at.desc(), Patient.id.desc()).all()
+            expected = patients_schema.dump(patients)
+        assert items == expected
@@ -0,0 +1,101 @@
+from datetime import date, datetime
+
+from sqlalchemy import event
+
+from app.models import db, Patient, Appointment, Employee
+
+
+def _seed(app):
+    with app.app_context():
+        patient = Patient(first_name="Agenda", last_name="Propia", document="PROV0001")
+        doctors = [
+            Employee(first_name="Ana", last_name="Medina", document="EMP0001", position="Médico general"),
+            Employee(first_name="Luis", last_name="Rojas", document="EMP0002", position="Pediatra"),
+        ]
+        db.session.add_all([patient, *doctors])
+        db.session.commit()
+        return patient.id, [d.id for d in doctors]
+
+
+def _book(auth_client, patient_id, when, employee_id=0):
+    return auth_client.post('/appointments/create', data={
+        "patient_id": patient_id, "scheduled_at": when, "employee_id": employee_id,
+    })
+
+
+def test_double_booking_is_checked_per_provider(app, auth_client):
+    patient_id, (ana, luis) = _seed(app)
+    assert _book(auth_client, patient_id, "2030-02-04 10:00", ana).status_code == 302
+    # Otro profesional (o ninguno) puede atender a la misma hora
+    assert _book(auth_client, patient_id, "2030-02-04 10:00", luis).status_code == 302
+    assert _book(auth_client, patient_id, "2030-02-04 10:00").status_code == 302
+
+    html = _book(auth_client, patient_id, "2030-02-04 10:15", ana).get_data(as_text=True)
+    assert 'El horario ya está ocupado' in html
+
+    data = auth_client.get(f'/api/v1/appointments/slots?after=2030-02-04T10:00&count=1&employee_id={ana}').get_json()
+    assert data["slots"] == ["2030-02-04T10:30:00"]
+    data = auth_client.get('/api/v1/appointments/slots?after=2030-02-04T10:30&count=1&employee_id=0').get_json()
+    assert data["slots"] == ["2030-02-04T10:30:00"]
+
+
+def test_cancelled_slot_is_offered_with_its_provider(app, auth_client):
+    from app.models import WaitlistEntry
+    patient_id, (ana, _) = _seed(app)
+    _book(auth_client, patient_id, "2030-02-04 11:00", ana)
+    with app.app_context():
+        appointment_id = Appointment.query.one().id
+        entry = WaitlistEntry(patient_id=patient_id, priority=1, window_start=datetime(2030, 2, 4, 8),
+                              window_end=datetime(2030, 2, 4, 18))
+        db.session.add(entry)
+        db.session.commit()
+        entry_id = entry.id
+
+    auth_client.post(f'/appointments/{appointment_id}/cancel')
+    auth_client.post(f'/appointments/waitlist/{entry_id}/accept')
+    with app.app_context():
+        booked = Appointment.query.filter_by(status='scheduled').one()
+        assert booked.employee_id == ana and booked.scheduled_at == datetime(2030, 2, 4, 11)
+
+
+def test_calendar_shows_one_provider_day(app, auth_client):
+    patient_id, (ana, luis) = _seed(app)
+    for when, employee_id in [("2030-02-04 09:00", ana), ("2030-02-04 14:00", ana),
+                              ("2030-02-05 09:00", ana), ("2030-02-04 09:00", luis)]:
+        _book(auth_client, patient_id, when, employee_id)
+
+    html = auth_client.get(f'/appointments/calendar?employee_id={ana}&date=2030-02-04').get_data(as_text=True)
+    assert html.count('calendar-slot') == 2
+    assert 'Ana Medina' in html
+    assert auth_client.get('/appointments/calendar').status_code == 200
+
+
+def test_utilization_is_aggregated_in_one_query(app, auth_client):
+    patient_id, (ana, luis) = _seed(app)
+    for when, employee_id in [("2030-02-04 09:00", ana), ("2030-02-04 10:00", ana),
+                              ("2030-02-05 09:00", ana), ("2030-02-04 09:00", luis)]:
+        _book(auth_client, patient_id, when, employee_id)
+
+    with app.app_context():
+        from app.appointments.routes import service
+        rows = service.utilization_report(date(2030, 2, 4), date(2030, 2, 10), 'week')
+        assert [(r['employee_id'], r['period'], r['appointments']) for r in rows] == [
+            (ana, date(2030, 2, 4), 3), (luis, date(2030, 2, 4), 1),
+        ]
+        # 3 citas de 30 minutos sobre 7 jornadas de 10 horas
+        assert rows[0]['booked_minutes'] == 90 and rows[0]['capacity_minutes'] == 4200
+        engine = db.engine
+
+    statements = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if 'appointments' in statement:
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _capture)
+    try:
+        html = auth_client.get('/appointments/utilization?date_from=2030-02-04&date_to=2030-02-05').get_data(as_text=True)
+    finally:
+        event.remove(engine, "before_cursor_execute", _capture)
+    assert html.count('class="utilization-row"') == 3
+    assert len(statements) == 1 and 'GROUP BY' in statements[0]
@@ -0,0 +1,135 @@
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import event
+
+from app.domain.recurrence import RecurrenceRule, MAX_OCCURRENCES
+from app.models import db, Patient, Appointment
+
+
+def test_weekly_rule_with_weekdays_and_count():
+    # 2025-06-02 es lunes
+    rule = RecurrenceRule('weekly', interval=2, count=4, weekdays=(0, 3))
+    assert rule.occurrences(datetime(2025, 6, 2, 9)) == [
+        datetime(2025, 6, 2, 9), datetime(2025, 6, 5, 9),
+        datetime(2025, 6, 16, 9), datetime(2025, 6, 19, 9),
+    ]
+
+
+def test_daily_rule_until_skips_weekends():
+    rule = RecurrenceRule('daily', until=date(2025, 6, 10), weekdays=(0, 1, 2, 3, 4))
+    result = rule.occurrences(datetime(2025, 6, 5, 14, 30))
+    assert [d.day for d in result] == [5, 6, 9, 10]
+
+
+def test_monthly_rule_skips_short_months():
+    rule = RecurrenceRule('monthly', count=3)
+    assert rule.occurrences(datetime(2025, 1, 31, 8)) == [
+        datetime(2025, 1, 31, 8), datetime(2025, 3, 31, 8), datetime(2025, 5, 31, 8),
+    ]
+
+
+def test_invalid_rules():
+    with pytest.raises(ValueError):
+        RecurrenceRule('weekly').occurrences(datetime(2025, 6, 2))
+    with pytest.raises(ValueError):
+        RecurrenceRule('daily', until=date(2026, 12, 31)).occurrences(datetime(2025, 6, 2))
+    assert RecurrenceRule('yearly', count=2, interval=0).validate()
+    assert len(RecurrenceRule('daily', count=MAX_OCCURRENCES).occurrences(datetime(2025, 6, 2))) == MAX_OCCURRENCES
+
+
+def test_daily_rule_that_never_matches_is_rejected_not_looped():
+    # Cada 7 días desde un lunes solo se llega a lunes: nunca a miércoles
+    monday = datetime(2025, 6, 2, 9)
+    rule = RecurrenceRule('daily', interval=7, count=3, weekdays=(2,))
+    assert rule.validate(monday)
+    with pytest.raises(ValueError):
+        rule.occurrences(monday)
+    # Con `until` la serie termina aunque ningún candidato coincida
+    assert RecurrenceRule('daily', interval=2, until=date(2025, 6, 3), weekdays=(6,)).occurrences(monday) == []
+    assert not RecurrenceRule('daily', interval=14, count=2, weekdays=(0,)).validate(monday)
+
+
+def _patient(app):
+    with app.app_context():
+        patient = Patient(first_name="Serie", last_name="Cronica", document="SERIE001")
+        db.session.add(patient)
+        db.session.commit()
+        return patient.id
+
+
+def _statements(app, action):
+    with app.app_context():
+        engine = db.engine
+    statements = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if 'appointments' in statement:
+            statements.append(statement.lstrip().split()[0].upper())
+
+    event.listen(engine, "before_cursor_execute", _capture)
+    try:
+        result = action()
+    finally:
+        event.remove(engine, "before_cursor_execute", _capture)
+    return result, statements
+
+
+def test_series_form_inserts_in_one_batch(app, auth_client):
+    patient_id = _patient(app)
+    form = {
+        "patient_id": patient_id,
+        "scheduled_at": "2030-03-04 10:00",
+        "reason": "Control crónico",
+        "repeat": "weekly",
+        "repeat_interval": 1,
+        "repeat_count": 12,
+    }
+    response, statements = _statements(app, lambda: auth_client.post('/appointments/create', data=form))
+    assert response.status_code == 302
+    assert statements.count('SELECT') == 1
+    assert statements.count('INSERT') == 1
+    with app.app_context():
+        assert Appointment.query.filter_by(patient_id=patient_id).count() == 12
+
+
+def test_series_is_rejected_when_any_slot_is_taken(app, auth_client):
+    patient_id = _patient(app)
+    with app.app_context():
+        db.session.add(Appointment(patient_id=patient_id, scheduled_at=datetime(2030, 3, 18, 10, 15)))
+        db.session.commit()
+    form = {
+        "patient_id": patient_id,
+        "scheduled_at": "2030-03-04 10:00",
+        "repeat": "weekly",
+        "repeat_count": 4,
+    }
+    html = auth_client.post('/appointments/create', data=form).get_data(as_text=True)
+    assert 'Horarios ocupados: 2030-03-18 10:00' in html
+    with app.app_context():
+        assert Appointment.query.count() == 1
+
+
+def test_series_rechecks_conflicts_in_the_insert(app, monkeypatch):
+    from app.adapters.sql_appointment_repository import SqlAlchemyAppointmentRepository
+    from app.services.appointment_service import AppointmentService
+    patient_id = _patient(app)
+    repo = SqlAlchemyAppointmentRepository()
+    service = AppointmentService(repo)
+
+    def _racing_find_conflicts(starts, employee_id=None):
+        # Otra reserva ocupa la tercera fecha justo después del chequeo
+        db.session.add(Appointment(patient_id=patient_id, scheduled_at=datetime(2030, 3, 18, 10, 15)))
+        db.session.commit()
+        return {}
+
+    monkeypatch.setattr(repo, "find_conflicts", _racing_find_conflicts)
+    with app.app_context():
+        ok, msg, ids = service.schedule_series(patient_id, datetime(2030, 3, 4, 10), RecurrenceRule('weekly', count=4))
+        assert not ok and ids == []
+        assert msg == 'Horarios ocupados: 2030-03-18 10:00.'
+        # Se revierte la serie completa: solo queda la cita que ganó la carrera
+        assert Appointment.query.count() == 1
+        monkeypatch.undo()
+        ok, _, ids = service.schedule_series(patient_id, datetime(2030, 4, 1, 10), RecurrenceRule('weekly', count=4))
+        assert ok and len(ids) == 4
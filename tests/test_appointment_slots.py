@@ -0,0 +1,114 @@
+from datetime import date, datetime, time, timedelta
+
+from app.adapters.appointment_slot_index import AppointmentSlotIndex
+from app.models import db, Patient, Appointment
+
+WORKDAY = (time(8, 0), time(18, 0))
+HALF_HOUR = timedelta(minutes=30)
+
+
+def _index(starts):
+    calls = []
+
+    def loader(start, end):
+        calls.append((start, end))
+        return [(i, s) for i, s in enumerate(starts, 1) if start <= s < end]
+
+    return AppointmentSlotIndex(loader, duration=HALF_HOUR), calls
+
+
+def test_free_slots_skip_booked_blocks():
+    day = datetime(2025, 6, 2)
+    index, _ = _index([day.replace(hour=8), day.replace(hour=8, minute=30), day.replace(hour=10, minute=10)])
+    slots = index.free_slots(day.replace(hour=7), HALF_HOUR, 4, WORKDAY)
+    assert slots == [
+        day.replace(hour=9), day.replace(hour=9, minute=30),
+        # 10:00-10:30 choca con la cita de 10:10; se reanuda al final redondeado a 15 min
+        day.replace(hour=10, minute=45), day.replace(hour=11, minute=15),
+    ]
+
+
+def test_free_slots_respect_workday_and_length():
+    day = datetime(2025, 6, 2)
+    index, _ = _index([day.replace(hour=h) for h in range(8, 17)] + [day.replace(hour=17, minute=15)])
+    # 17:45 no alcanza para una hora antes del cierre: pasa al día siguiente
+    slots = index.free_slots(day.replace(hour=8), timedelta(hours=1), 2, WORKDAY)
+    assert slots == [datetime(2025, 6, 3, 8), datetime(2025, 6, 3, 9)]
+
+
+def test_full_days_are_skipped_with_few_loads():
+    booked = [
+        datetime(2025, 6, 1) + timedelta(days=d, hours=8) + HALF_HOUR * k
+        for d in range(30) for k in range(20)
+    ]
+    index, calls = _index(booked)
+    assert index.free_slots(datetime(2025, 6, 1), HALF_HOUR, 1, WORKDAY) == [datetime(2025, 7, 1, 8)]
+    assert len(calls) <= 3
+
+
+def test_overlapping_and_invalidate():
+    day = datetime(2025, 6, 2)
+    starts = [day.replace(hour=9)]
+    index, calls = _index(starts)
+    assert index.overlapping(day.replace(hour=9, minute=15), day.replace(hour=9, minute=45)) == [1]
+    assert index.overlapping(day.replace(hour=9, minute=30), day.replace(hour=10)) == []
+    assert index.overlapping(day.replace(hour=8, minute=30), day.replace(hour=9)) == []
+
+    starts.append(day.replace(hour=10))
+    assert index.overlapping(day.replace(hour=10), day.replace(hour=10, minute=30)) == []
+    index.invalidate([date(2025, 6, 2)])
+    assert index.overlapping(day.replace(hour=10), day.replace(hour=10, minute=30)) == [2]
+
+
+def _patient(app):
+    with app.app_context():
+        patient = Patient(first_name="Cupo", last_name="Libre", document="SLOT0001")
+        db.session.add(patient)
+        db.session.commit()
+        return patient.id
+
+
+def test_schedule_rejects_double_booking(app, auth_client):
+    patient_id = _patient(app)
+    form = {"patient_id": patient_id, "scheduled_at": "2030-01-15 10:00", "reason": "Control"}
+    assert auth_client.post('/appointments/create', data=form).status_code == 302
+
+    form["scheduled_at"] = "2030-01-15 10:15"
+    html = auth_client.post('/appointments/create', data=form).get_data(as_text=True)
+    assert 'El horario ya está ocupado' in html
+
+    with app.app_context():
+        assert Appointment.query.count() == 1
+        Appointment.query.one().status = 'cancelled'
+        db.session.commit()
+    # Una cita cancelada libera el horario
+    assert auth_client.post('/appointments/create', data=form).status_code == 302
+
+
+def test_slots_endpoint(app, auth_client):
+    patient_id = _patient(app)
+    data = auth_client.get('/api/v1/appointments/slots?after=2030-01-15T08:00&count=2').get_json()
+    assert data["slots"] == ["2030-01-15T08:00:00", "2030-01-15T08:30:00"]
+
+    auth_client.post('/appointments/create', data={"patient_id": patient_id, "scheduled_at": "2030-01-15 08:00"})
+    data = auth_client.get('/api/v1/appointments/slots?after=2030-01-15T08:00&count=2&length=60').get_json()
+    assert data["slots"] == ["2030-01-15T08:30:00", "2030-01-15T09:30:00"]
+
+    assert auth_client.get('/api/v1/appointments/slots?after=manana').status_code == 400
+
+
+def test_schedule_rechecks_overlap_in_the_insert(app, monkeypatch):
+    from app.adapters.sql_appointment_repository import SqlAlchemyAppointmentRepository
+    from app.services.appointment_service import AppointmentService
+    patient_id = _patient(app)
+    repo = SqlAlchemyAppointmentRepository()
+    service = AppointmentService(repo)
+    with app.app_context():
+        ok, _, first = service.schedule(patient_id, datetime(2030, 1, 15, 10), "Control")
+        assert ok and first.id and first.status == 'scheduled'
+        # Otra petición (u otro worker) pasó el chequeo previo con el índice desactualizado
+        monkeypatch.setattr(repo, "find_overlapping", lambda *args, **kwargs: [])
+        ok, msg, appt = service.schedule(patient_id, datetime(2030, 1, 15, 10, 15))
+        assert not ok and appt is None and 'ocupado' in msg
+        assert service.schedule(patient_id, datetime(2030, 1, 15, 10, 30))[0]
+        assert Appointment.query.count() == 2
@@ -0,0 +1,167 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.models import db, Patient, Appointment
+
+
+def _seed_appointments(app):
+    """30 programadas (una por día desde 2025-01-01), 5 completadas y 3 canceladas."""
+    with app.app_context():
+        p1 = Patient(first_name="Ana", last_name="Citas", document="APPT001")
+        p2 = Patient(first_name="Luis", last_name="Citas", document="APPT002")
+        db.session.add_all([p1, p2])
+        db.session.flush()
+        start = datetime(2025, 1, 1, 9, 0)
+        for i in range(30):
+            db.session.add(Appointment(patient_id=p1.id, scheduled_at=start + timedelta(days=i), reason=f"Control {i}"))
+        for i in range(5):
+            db.session.add(Appointment(patient_id=p2.id, scheduled_at=start + timedelta(days=i), status='completed'))
+        for i in range(3):
+            db.session.add(Appointment(patient_id=p2.id, scheduled_at=start + timedelta(days=40 + i), status='cancelled'))
+        db.session.commit()
+        return p1.id, p2.id
+
+
+def test_appointments_index_is_paginated_with_counts(app, auth_client):
+    _seed_appointments(app)
+    html = auth_client.get('/appointments/').get_data(as_text=True)
+    assert html.count('class="col appointment-item"') == 24
+    assert 'Página 1 de 2' in html
+    assert 'badge bg-secondary">38<' in html
+    assert 'badge bg-primary">30<' in html
+    assert 'badge bg-success">5<' in html
+    assert 'badge bg-danger">3<' in html
+
+    html = auth_client.get('/appointments/?page=2').get_data(as_text=True)
+    assert html.count('class="col appointment-item"') == 14
+
+
+def test_appointments_index_filters(app, auth_client):
+    p1_id, p2_id = _seed_appointments(app)
+
+    html = auth_client.get('/appointments/?status=cancelled').get_data(as_text=True)
+    assert html.count('class="col appointment-item"') == 3
+    assert 'pagination' not in html
+
+    # date_to es inclusivo
+    html = auth_client.get('/appointments/?date_from=2025-01-01&date_to=2025-01-03').get_data(as_text=True)
+    assert html.count('class="col appointment-item"') == 6
+    assert 'badge bg-secondary">6<' in html
+
+    html = auth_client.get(f'/appointments/?patient_id={p2_id}').get_data(as_text=True)
+    assert html.count('class="col appointment-item"') == 8
+    assert 'badge bg-primary">0<' in html
+    assert 'Luis Citas' in html
+
+    html = auth_client.get('/appointments/?date_from=2030-01-01').get_data(as_text=True)
+    assert 'No hay citas con estos filtros' in html
+
+
+def test_appointments_counts_use_single_group_by(app, auth_client):
+    _seed_appointments(app)
+    with app.app_context():
+        engine = db.engine
+    statements = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM appointments' in statement:
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _capture)
+    try:
+        assert auth_client.get('/appointments/?status=scheduled').status_code == 200
+    finally:
+        event.remove(engine, "before_cursor_execute", _capture)
+    assert len(statements) == 2
+    assert sum('GROUP BY' in s for s in statements) == 1
+    assert all('LIMIT' in s for s in statements if 'GROUP BY' not in s)
+
+
+def _seed_distinct_patients(app, n, offset=0):
+    with app.app_context():
+        for i in range(offset, offset + n):
+            patient = Patient(first_name="Paciente", last_name=f"N1{i:03d}", document=f"N1DOC{i:04d}")
+            db.session.add(patient)
+            db.session.flush()
+            db.session.add(Appointment(patient_id=patient.id, scheduled_at=datetime(2025, 3, 1) + timedelta(hours=i)))
+        db.session.commit()
+
+
+def _count_queries(app, client, url):
+    with app.app_context():
+        engine = db.engine
+    statements = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _capture)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, "before_cursor_execute", _capture)
+    assert response.status_code == 200
+    return len(statements)
+
+
+def test_appointments_index_query_count_is_constant(app, auth_client):
+    _seed_distinct_patients(app, 3)
+    few = _count_queries(app, auth_client, '/appointments/')
+    _seed_distinct_patients(app, 20, offset=3)
+    many = _count_queries(app, auth_client, '/appointments/')
+    assert many == few
+    assert many <= 5
+
+
+def test_appointment_view_loads_patient_eagerly(app, auth_client):
+    _seed_distinct_patients(app, 1)
+    with app.app_context():
+        appointment_id = Appointment.query.first().id
+    assert _count_queries(app, auth_client, f'/appointments/{appointment_id}') <= 3
+
+
+def test_unknown_load_strategy_is_rejected(app):
+    from app.adapters.sql_appointment_repository import SqlAlchemyAppointmentRepository
+
+    with app.app_context():
+        with pytest.raises(ValueError):
+            SqlAlchemyAppointmentRepository().list(load_patient='subquery')
+
+
+def test_status_transitions_are_compare_and_set(app, auth_client):
+    _seed_distinct_patients(app, 1)
+    with app.app_context():
+        appointment_id = Appointment.query.first().id
+        engine = db.engine
+    statements = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if 'appointments' in statement:
+            statements.append(statement.lstrip().split()[0].upper())
+
+    event.listen(engine, "before_cursor_execute", _capture)
+    try:
+        r = auth_client.post(f'/appointments/{appointment_id}/cancel')
+    finally:
+        event.remove(engine, "before_cursor_execute", _capture)
+    assert r.status_code == 302
+    assert statements == ['UPDATE']
+
+    # Una cita cancelada ya no puede completarse ni volver a cancelarse
+    html = auth_client.post(f'/appointments/{appointment_id}/complete', follow_redirects=True).get_data(as_text=True)
+    assert 'ya no está programada' in html
+    with app.app_context():
+        assert db.session.get(Appointment, appointment_id).status == 'cancelled'
+
+
+def test_illegal_transition_fails_without_queries(app):
+    from app.services.appointment_service import AppointmentService
+
+    class NoCallsRepository:
+        def __getattr__(self, name):
+            raise AssertionError(f"unexpected repository call: {name}")
+
+    ok, msg = AppointmentService(NoCallsRepository()).transition(1, 'scheduled')
+    assert not ok and 'inválida' in msg
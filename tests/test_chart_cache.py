@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app import cache
+from app.adapters.sql_appointment_repository import SqlAlchemyAppointmentRepository
+from app.adapters.sql_patient_repository import SqlAlchemyPatientRepository
+from app.models import db, Patient, MedicalRecord
+from app.services.appointment_service import AppointmentService
+from app.services.patient_service import PatientService
+
+
+def _seed(app):
+    with app.app_context():
+        patient = Patient(first_name="Caché", last_name="Historia", document="CHART001")
+        db.session.add(patient)
+        db.session.flush()
+        db.session.add(MedicalRecord(patient_id=patient.id, title="Ingreso", notes="Primera consulta"))
+        db.session.commit()
+        return patient.id
+
+
+def _view(app, auth_client, patient_id):
+    with app.app_context():
+        engine = db.engine
+    statements = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM medical_records' in statement or 'FROM patients' in statement \
+                or 'FROM appointments' in statement:
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _capture)
+    try:
+        html = auth_client.get(f'/records/{patient_id}').get_data(as_text=True)
+    finally:
+        event.remove(engine, "before_cursor_execute", _capture)
+    return html, statements
+
+
+def test_repeat_views_are_served_from_cache(app, auth_client):
+    patient_id = _seed(app)
+    html, first = _view(app, auth_client, patient_id)
+    assert 'Ingreso' in html and first
+    html, again = _view(app, auth_client, patient_id)
+    assert 'Ingreso' in html and 'Caché Historia' in html
+    assert again == []
+
+
+def test_new_entry_is_visible_on_next_view(app, auth_client):
+    patient_id = _seed(app)
+    _view(app, auth_client, patient_id)
+    resp = auth_client.post(f'/records/{patient_id}/add', data={'title': 'Control post-alta', 'notes': 'Estable'})
+    assert resp.status_code == 302
+    html, statements = _view(app, auth_client, patient_id)
+    assert 'Control post-alta' in html and statements
+
+
+def test_patient_and_appointment_changes_invalidate_chart(app, auth_client):
+    patient_id = _seed(app)
+    _view(app, auth_client, patient_id)
+
+    with app.app_context():
+        ok, _, _ = PatientService(SqlAlchemyPatientRepository(), cache=cache).update(patient_id, last_name="Renombrado")
+        assert ok
+    html, _ = _view(app, auth_client, patient_id)
+    assert 'Caché Renombrado' in html
+
+    appointments = AppointmentService(SqlAlchemyAppointmentRepository(), cache=cache)
+    when = datetime.combine(datetime.now().date() + timedelta(days=3), datetime.min.time()).replace(hour=9)
+    with app.app_context():
+        ok, _, appt = appointments.schedule(patient_id, when, reason="Control de tensión")
+        assert ok
+        appt_id = appt.id
+    html, _ = _view(app, auth_client, patient_id)
+    assert 'Control de tensión' in html
+
+    with app.app_context():
+        assert appointments.cancel(appt_id)[0]
+    html, _ = _view(app, auth_client, patient_id)
+    assert 'Control de tensión' not in html
@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import text
+
+from app.infrastructure.persistence.compressed_text import (
+    build_dictionary, compress_text, configure_dictionary, decompress_text, MIN_COMPRESS_BYTES,
+)
+from app.models import db, Patient, MedicalRecord
+
+NOTE = "Examen físico: abdomen blando, depresible, no doloroso.\n" * 40
+
+
+@pytest.fixture(autouse=True)
+def _no_dictionary():
+    configure_dictionary(None)
+    yield
+    configure_dictionary(None)
+
+
+def test_roundtrip_formats():
+    short = "Sin novedad"
+    assert compress_text(short)[:1] == b"\x00" and decompress_text(compress_text(short)) == short
+    packed = compress_text(NOTE)
+    assert packed[:1] == b"\x01" and len(packed) < len(NOTE) // 10
+    assert decompress_text(packed) == NOTE
+    # Filas sin migrar (TEXT) se leen tal cual
+    assert decompress_text(NOTE) == NOTE
+    assert compress_text(None) is None and decompress_text(None) is None
+    assert len(compress_text("x" * (MIN_COMPRESS_BYTES - 1))) == MIN_COMPRESS_BYTES
+
+
+def test_dictionary_shrinks_notes_and_stays_readable():
+    notes = [f"Paciente {i}. Tensión arterial normal. Ruidos cardiacos rítmicos sin soplos.\n" * 3 +
+             "Plan: control en un mes o antes si presenta signos de alarma.\n" * 3 for i in range(20)]
+    plain = compress_text(notes[0])
+    configure_dictionary(build_dictionary(notes))
+    with_dict = compress_text(notes[0])
+    assert with_dict[:1] == b"\x02" and len(with_dict) < len(plain)
+    # Un diccionario nuevo no impide leer lo escrito con el anterior
+    configure_dictionary(b"otro diccionario")
+    assert decompress_text(with_dict) == notes[0]
+
+
+def test_notes_are_stored_compressed_and_legacy_rows_still_load(app):
+    with app.app_context():
+        patient = Patient(first_name="Nota", last_name="Larga", document="ZLIB0001")
+        db.session.add(patient)
+        db.session.flush()
+        record = MedicalRecord(patient_id=patient.id, title="Dictado", notes=NOTE)
+        db.session.add(record)
+        db.session.execute(text(
+            "INSERT INTO medical_records (patient_id, title, notes, created_at) "
+            "VALUES (:p, 'Antigua', :notes, CURRENT_TIMESTAMP)"), {"p": patient.id, "notes": NOTE})
+        db.session.commit()
+        kinds = db.session.execute(text("SELECT title, typeof(notes) FROM medical_records ORDER BY id")).all()
+        assert kinds == [("Dictado", "blob"), ("Antigua", "text")]
+        db.session.expire_all()
+        assert [r.notes for r in MedicalRecord.query.order_by(MedicalRecord.id)] == [NOTE, NOTE]
@@ -0,0 +1,77 @@
+import pytest
+from app import create_app, cache
+from app.adapters.sql_patient_repository import SqlAlchemyPatientRepository
+from app.services.patient_service import PatientService
+
+
+class CountingPatientRepository(SqlAlchemyPatientRepository):
+    """Repositorio real que registra cuántos COUNT se ejecutan."""
+    def __init__(self):
+        self.count_calls = 0
+        self.estimate_calls = 0
+
+    def count(self, q):
+        self.count_calls += 1
+        return super().count(q)
+
+    def estimate_count(self, q):
+        self.estimate_calls += 1
+        return super().estimate_count(q)
+
+
+@pytest.fixture
+def app():
+    app = create_app({
+        "TESTING": True,
+        "WTF_CSRF_ENABLED": False,
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+    })
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def repo():
+    return CountingPatientRepository()
+
+
+@pytest.fixture
+def service(app, repo):
+    service = PatientService(repo, cache=cache)
+    for i in range(5):
+        service.create(first_name="Paciente", last_name=f"Numero{i}", document=f"SVC{i:05d}")
+    return service
+
+
+def test_list_paginated_caches_total_until_write(service, repo):
+    _, total = service.list_paginated(None, 1, 2)
+    assert total == 5
+    _, total = service.list_paginated("  ", 2, 2)
+    assert total == 5
+    assert repo.count_calls == 1
+
+    ok, _, patient = service.create(first_name="Nuevo", last_name="Paciente", document="SVC99999")
+    assert ok
+    assert service.list_paginated(None, 1, 2)[1] == 6
+    assert repo.count_calls == 2
+
+    service.delete(patient.id)
+    assert service.list_paginated(None, 1, 2)[1] == 5
+    assert repo.count_calls == 3
+
+
+def test_list_paginated_total_modes(service, repo):
+    items, total = service.list_paginated(None, 1, 2, total="none")
+    assert len(items) == 2 and total is None
+
+    _, total = service.list_paginated(None, 1, 2, total="estimate")
+    assert total == 5
+    assert repo.count_calls == 0 and repo.estimate_calls == 1
+
+    # Página incompleta: el total se deduce sin COUNT
+    _, total = service.list_paginated(None, 3, 2)
+    assert total == 5
+    assert repo.count_calls == 0
+
+    with pytest.raises(ValueError):
+        service.list_paginated(None, 1, 2, total="bogus")
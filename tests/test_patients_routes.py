@@ -0,0 +1,30 @@
+from app.models import db, Patient
+
+
+def _seed_patients(app, n):
+    with app.app_context():
+        for i in range(n):
+            db.session.add(Patient(first_name="Paciente", last_name=f"Lista{i:03d}", document=f"HTML{i:05d}"))
+        db.session.commit()
+
+
+def test_patients_index_is_paginated(app, auth_client):
+    _seed_patients(app, 45)
+    html = auth_client.get('/patients/').get_data(as_text=True)
+    assert 'Total: 45 pacientes' in html
+    assert html.count('badge bg-secondary">HTML') == 20
+    assert 'Página 1 de 3' in html
+
+    html = auth_client.get('/patients/?page=3').get_data(as_text=True)
+    assert 'Página 3 de 3' in html
+    assert html.count('badge bg-secondary">HTML') == 5
+
+
+def test_patients_index_search(app, auth_client):
+    _seed_patients(app, 3)
+    html = auth_client.get('/patients/?q=Lista001').get_data(as_text=True)
+    assert 'HTML00001' in html and 'HTML00002' not in html
+    assert 'Total: 1 pacientes' in html
+
+    html = auth_client.get('/patients/?q=ZZZZNONEXISTENT').get_data(as_text=True)
+    assert 'No se encontraron pacientes' in html
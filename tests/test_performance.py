@@ -256,6 +256,43 @@ def test_bulk_read_performance(benchmark, app):
         db.session.commit()
 
 
+@pytest.mark.slow
+def test_bulk_import_endpoint_throughput(client, auth, app):
+    """POST /api/v1/patients/bulk debe superar ampliamente al alta fila a fila"""
+    import json
+    import time
+
+    with app.app_context():
+        auth.login(username='admin', password='admin123')
+
+        single_rows = 200
+        start = time.perf_counter()
+        for i in range(single_rows):
+            client.post('/api/v1/patients', json={
+                'first_name': 'Single', 'last_name': f'Row {i}', 'document': f'SINGLE{i:06d}',
+            })
+        single_per_row = (time.perf_counter() - start) / single_rows
+
+        bulk_rows = 5000
+        # Mejor de 3 cargas: una sola medición varía hasta 2x por ruido del sistema
+        bulk_per_row = float('inf')
+        for run in range(3):
+            body = '\n'.join(
+                json.dumps({'first_name': 'Bulk', 'last_name': f'Row {i}', 'document': f'BULKIMP{run}{i:06d}'})
+                for i in range(bulk_rows)
+            )
+            start = time.perf_counter()
+            r = client.post('/api/v1/patients/bulk', data=body, content_type='application/x-ndjson')
+            bulk_per_row = min(bulk_per_row, (time.perf_counter() - start) / bulk_rows)
+            assert r.get_json()['summary']['created'] == bulk_rows
+
+        speedup = single_per_row / bulk_per_row
+        # Objetivo: >= 50x. Se exige 40x para tolerar el ruido de CI (~80x en local)
+        assert speedup >= 40, (
+            f"single: {single_per_row * 1e6:.0f} us/fila, bulk: {bulk_per_row * 1e6:.0f} us/fila, speedup: {speedup:.1f}x"
+        )
+
+
 # ==========================================
 # TESTS DE SERVICIOS
 # ==========================================
@@ -277,6 +314,91 @@ def test_patient_service_list_performance(benchmark, app):
         assert benchmark.stats.stats.mean < 0.1  # 100ms
 
 
+def test_next_free_slots_performance(benchmark):
+    """Próximos cupos libres con el índice de agenda caliente: sub-milisegundo"""
+    from datetime import time, timedelta
+    from app.adapters.appointment_slot_index import AppointmentSlotIndex
+
+    step = timedelta(minutes=30)
+    # Dos meses con la jornada completa ocupada salvo un hueco al final de cada semana
+    booked = [
+        datetime(2025, 1, 1, 8) + timedelta(days=d) + step * k
+        for d in range(60) for k in range(20)
+        if not (d % 7 == 6 and k == 19)
+    ]
+
+    def loader(start, end):
+        return [(i, s) for i, s in enumerate(booked) if start <= s < end]
+
+    index = AppointmentSlotIndex(loader, duration=step)
+    index.load(datetime(2024, 12, 31).date(), datetime(2025, 4, 1).date())
+
+    def next_slots():
+        return index.free_slots(datetime(2025, 1, 1), step, 5, (time(8, 0), time(18, 0)))
+
+    result = benchmark(next_slots)
+    assert len(result) == 5
+    assert benchmark.stats.stats.mean < 0.001  # 1ms
+
+
+def test_waitlist_match_performance(benchmark):
+    """Emparejar un cupo liberado con 5000 pacientes en espera: sub-milisegundo"""
+    import random
+    from datetime import timedelta
+    from app.adapters.waitlist_matcher import WaitlistMatcher
+
+    rng = random.Random(42)
+    start = datetime(2030, 1, 1, 8)
+    entries = []
+    for i in range(5000):
+        window_start = start + timedelta(days=rng.randrange(60), hours=rng.randrange(10))
+        window_end = window_start + timedelta(hours=rng.randrange(1, 72))
+        entries.append((i, rng.randint(1, 5), start - timedelta(minutes=i), window_start, window_end))
+    matcher = WaitlistMatcher(duration=timedelta(minutes=30))
+    matcher.build(entries)
+    slots = [start + timedelta(days=rng.randrange(60), minutes=15 * rng.randrange(40)) for _ in range(100)]
+
+    def match_slots():
+        return [matcher.best(slot) for slot in slots]
+
+    result = benchmark(match_slots)
+    assert any(result)
+    assert benchmark.stats.stats.mean / len(slots) < 0.001  # 1ms por cupo
+
+
+@pytest.mark.parametrize("serializer", ["marshmallow", "fast"])
+def test_patient_list_serialization_per_row(benchmark, app, serializer):
+    """Costo por fila de serializar 500 pacientes: marshmallow vs camino rápido"""
+    import json
+    from app.api import patients_schema, patient_schema, EXPORT_FIELDS
+    from app.api.fast_json import compile_row_serializer, dumps
+
+    with app.app_context():
+        for i in range(100, 500):
+            db.session.add(Patient(
+                first_name='Serial', last_name=f'Test {i}', document=f'SER{i:05d}',
+                birth_date=datetime(1990, 1, 1), address='Test', phone='0000000000'
+            ))
+        db.session.commit()
+
+        if serializer == "marshmallow":
+            def serialize_page():
+                patients = Patient.query.limit(500).all()
+                return json.dumps(patients_schema.dump(patients))
+        else:
+            serialize = compile_row_serializer(patient_schema, EXPORT_FIELDS)
+            columns = [getattr(Patient, f) for f in EXPORT_FIELDS]
+
+            def serialize_page():
+                rows = db.session.execute(db.select(*columns).limit(500)).all()
+                return dumps([serialize(row) for row in rows])
+
+        result = benchmark(serialize_page)
+        assert len(json.loads(result)) == 500
+        benchmark.extra_info['us_per_row'] = round(benchmark.stats.stats.mean / 500 * 1e6, 2)
+        assert benchmark.stats.stats.mean < 0.2
+
+
 # ==========================================
 # TESTS DE MEMORIA
 # ==========================================
@@ -301,6 +423,37 @@ def test_memory_usage_stays_reasonable(app):
         assert peak < 50 * 1024 * 1024  # 50 MB
 
 
+@pytest.mark.slow
+def test_patient_export_memory_stays_flat(app):
+    """Exportación NDJSON en streaming: la memoria pico no crece con las filas"""
+    import tracemalloc
+    from app.api import service, _iter_ndjson
+
+    def export_peak():
+        tracemalloc.start()
+        for _ in _iter_ndjson(service.export()):
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak
+
+    def add_patients(start, n):
+        db.session.execute(db.insert(Patient), [
+            {'first_name': 'Export', 'last_name': f'Test {i}', 'document': f'EXPORT{i:07d}', 'created_at': datetime(2020, 1, 1)}
+            for i in range(start, start + n)
+        ])
+        db.session.commit()
+
+    with app.app_context():
+        add_patients(0, 2000)
+        small_peak = export_peak()
+        add_patients(2000, 18000)
+        large_peak = export_peak()
+
+        # 10x más filas no debe implicar 10x más memoria
+        assert large_peak < small_peak * 2
+
+
 # ==========================================
 # BENCHMARKS COMPARATIVOS
 # ==========================================
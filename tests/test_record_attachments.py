@@ -0,0 +1,110 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from app.models import db, Patient, MedicalRecord, RecordAttachment
+from app.records.attachment_store import ContentAddressedStore, BlobTooLarge, EmptyBlob, CHUNK_SIZE
+
+
+class _ChunkedStream(io.RawIOBase):
+    """Stream que registra el mayor bloque pedido."""
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+        self.max_read = 0
+
+    def read(self, size=-1):
+        self.max_read = max(self.max_read, size)
+        return self._data.read(size)
+
+
+def test_store_deduplicates_and_reads_in_chunks(tmp_path):
+    store = ContentAddressedStore(str(tmp_path))
+    data = os.urandom(CHUNK_SIZE * 3 + 17)
+    stream = _ChunkedStream(data)
+    sha, size, created = store.put(stream)
+    assert sha == hashlib.sha256(data).hexdigest() and size == len(data) and created
+    assert 0 < stream.max_read <= CHUNK_SIZE
+    assert store.put(io.BytesIO(data)) == (sha, size, False)
+    assert store.path(sha).endswith(os.path.join(sha[:2], sha[2:4], sha))
+    # Sin temporales sueltos: solo el archivo final
+    files = [os.path.join(d, f) for d, _, fs in os.walk(tmp_path) for f in fs]
+    assert files == [store.path(sha)]
+
+    with pytest.raises(BlobTooLarge):
+        store.put(io.BytesIO(b"x" * 100), max_bytes=10)
+    with pytest.raises(EmptyBlob):
+        store.put(io.BytesIO(b""))
+    assert len([f for _, _, fs in os.walk(tmp_path) for f in fs]) == 1
+    with pytest.raises(ValueError):
+        store.path("../../etc/passwd")
+
+
+@pytest.fixture
+def record(app, tmp_path):
+    app.config['ATTACHMENTS_DIR'] = str(tmp_path)
+    with app.app_context():
+        patient = Patient(first_name="Adjunto", last_name="Lab", document="ATT0001")
+        db.session.add(patient)
+        db.session.flush()
+        entry = MedicalRecord(patient_id=patient.id, title="Laboratorio", notes="Hemograma")
+        db.session.add(entry)
+        db.session.commit()
+        return patient.id, entry.id
+
+
+def _upload(client, patient_id, record_id, data, name):
+    return client.post(f'/records/{patient_id}/entries/{record_id}/attachments',
+                       data={"file": (io.BytesIO(data), name)}, content_type='multipart/form-data')
+
+
+def test_upload_dedupes_and_download_supports_range(app, auth_client, record, tmp_path):
+    patient_id, record_id = record
+    data = os.urandom(200_000)
+    assert _upload(auth_client, patient_id, record_id, data, "hemograma.pdf").status_code == 302
+    assert _upload(auth_client, patient_id, record_id, data, "copia.pdf").status_code == 302
+    with app.app_context():
+        rows = RecordAttachment.query.order_by(RecordAttachment.id).all()
+        assert [(r.filename, r.content_type, r.size) for r in rows] == [
+            ("hemograma.pdf", "application/pdf", 200_000), ("copia.pdf", "application/pdf", 200_000),
+        ]
+        assert rows[0].sha256 == rows[1].sha256
+        attachment_id = rows[0].id
+    assert len([f for _, _, fs in os.walk(tmp_path) for f in fs]) == 1
+
+    url = f'/records/{patient_id}/entries/{record_id}/attachments/{attachment_id}'
+    full = auth_client.get(url)
+    assert full.status_code == 200 and full.headers['Accept-Ranges'] == 'bytes'
+    assert full.get_data() == data
+    part = auth_client.get(url, headers={'Range': 'bytes=100-199'})
+    assert part.status_code == 206
+    assert part.headers['Content-Range'] == 'bytes 100-199/200000'
+    assert part.get_data() == data[100:200]
+    assert auth_client.get(url, headers={'Range': 'bytes=300000-'}).status_code == 416
+
+    html = auth_client.get(f'/records/{patient_id}/entries/{record_id}').get_data(as_text=True)
+    assert html.count('record-attachment') == 2
+
+
+def test_upload_rejects_disallowed_and_oversized_files(app, auth_client, record, tmp_path):
+    patient_id, record_id = record
+    _upload(auth_client, patient_id, record_id, b"<script>", "pagina.html")
+    _upload(auth_client, patient_id, record_id, b"", "vacio.txt")
+    app.config['ATTACHMENT_MAX_MB'] = 0
+    _upload(auth_client, patient_id, record_id, b"12345", "nota.txt")
+    with app.app_context():
+        assert RecordAttachment.query.count() == 0
+    assert not [f for _, _, fs in os.walk(tmp_path) for f in fs]
+    # Un adjunto no se sirve bajo otro paciente o entrada
+    assert auth_client.get(f'/records/{patient_id + 1}/entries/{record_id}/attachments/1').status_code == 404
+
+
+def test_request_body_is_capped_before_reaching_the_store(app, auth_client, record, tmp_path):
+    patient_id, record_id = record
+    assert app.config['MAX_CONTENT_LENGTH'] == (app.config['ATTACHMENT_MAX_MB'] + 1) * 1024 * 1024
+    app.config['MAX_CONTENT_LENGTH'] = 1024
+    resp = _upload(auth_client, patient_id, record_id, b"x" * 4096, "escaneo.pdf")
+    assert resp.status_code == 302 and resp.headers['Location'].endswith(f'/records/{patient_id}/entries/{record_id}')
+    assert 'supera' in auth_client.get(resp.headers['Location']).get_data(as_text=True)
+    assert not [f for _, _, fs in os.walk(tmp_path) for f in fs]
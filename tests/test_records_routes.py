@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app.models import db, Patient, MedicalRecord
+
+
+def _seed(app, n):
+    with app.app_context():
+        patient = Patient(first_name="Historia", last_name="Larga", document="HIST0001")
+        db.session.add(patient)
+        db.session.flush()
+        base = datetime(2024, 1, 1, 8, 0)
+        # Pares con el mismo created_at para ejercitar el desempate por id
+        db.session.add_all([
+            MedicalRecord(patient_id=patient.id, title=f"Control {i:03d}", notes=f"Nota {i} " + "x" * 500,
+                          created_at=base + timedelta(hours=i // 2))
+            for i in range(n)
+        ])
+        db.session.commit()
+        return patient.id
+
+
+def test_preview_is_stored_with_the_note():
+    record = MedicalRecord(patient_id=1, title="Control", notes="Dolor   de\ncabeza " + "y" * 400)
+    assert record.preview.startswith("Dolor de cabeza y")
+    assert len(record.preview) == MedicalRecord.PREVIEW_LENGTH and record.preview.endswith("…")
+    record.notes = None
+    assert record.preview == ""
+
+
+def test_timeline_pages_with_cursor_without_loading_notes(app, auth_client):
+    patient_id = _seed(app, 45)
+    with app.app_context():
+        engine = db.engine
+    statements = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM medical_records' in statement:
+            statements.append(statement)
+
+    seen = []
+    url = f'/records/{patient_id}'
+    event.listen(engine, "before_cursor_execute", _capture)
+    try:
+        while url:
+            html = auth_client.get(url).get_data(as_text=True)
+            titles = [line.split('Control ')[1][:3] for line in html.splitlines() if 'bi-clipboard-pulse' in line]
+            seen.extend(titles)
+            marker = 'cursor='
+            url = None
+            if marker in html:
+                cursor = html.split(marker, 1)[1].split('"', 1)[0]
+                url = f'/records/{patient_id}?cursor={cursor}'
+    finally:
+        event.remove(engine, "before_cursor_execute", _capture)
+
+    # Orden (created_at, id) descendente, sin repetir ni saltar entradas
+    assert seen == [f"{i:03d}" for i in reversed(range(45))]
+    assert len(statements) == 3
+    assert all('medical_records.notes' not in s and 'medical_records.preview' in s for s in statements)
+
+
+def test_entry_view_loads_full_note(app, auth_client):
+    patient_id = _seed(app, 1)
+    with app.app_context():
+        record_id = MedicalRecord.query.one().id
+    html = auth_client.get(f'/records/{patient_id}/entries/{record_id}').get_data(as_text=True)
+    assert "Nota 0 " + "x" * 500 in html
+    assert auth_client.get(f'/records/{patient_id + 1}/entries/{record_id}').status_code == 404
+    assert auth_client.get(f'/records/{patient_id}?cursor=%%%').status_code == 302
+
+
+def _seed_search(app):
+    with app.app_context():
+        patients = [Patient(first_name="Busca", last_name=f"P{i}", document=f"FTSR{i:03d}") for i in range(3)]
+        db.session.add_all(patients)
+        db.session.flush()
+        db.session.add_all([
+            MedicalRecord(patient_id=patients[0].id, title="Control", notes="Se inicia metformina 850 mg <b>diaria</b>"),
+            MedicalRecord(patient_id=patients[1].id, title="Diabetes: metformina", notes="Ajuste de dosis de metformina"),
+            MedicalRecord(patient_id=patients[2].id, title="Gripe", notes="Acetaminofén cada 8 horas"),
+        ])
+        db.session.commit()
+        return [p.id for p in patients]
+
+
+def test_search_ranks_and_highlights_across_patients(app, auth_client):
+    patient_ids = _seed_search(app)
+    assert app.extensions["record_fts"]
+    html = auth_client.get('/records/search?q=Metformina').get_data(as_text=True)
+    assert html.count('class="list-group-item list-group-item-action record-hit"') == 2
+    # La coincidencia en el título pesa más
+    assert html.index('P1') < html.index('P0')
+    assert '<mark>metformina</mark>' in html
+    # El texto de la nota se escapa; solo el resaltado es HTML
+    assert '&lt;b&gt;diaria&lt;/b&gt;' in html
+
+    # Pliega acentos y se mantiene al día con add_entry
+    auth_client.post(f'/records/{patient_ids[2]}/add', data={"title": "Fiebre", "notes": "Persiste, acetaminofen"})
+    html = auth_client.get('/records/search?q=acetaminofen').get_data(as_text=True)
+    assert html.count('record-hit') == 2
+
+
+def test_search_paginates_without_count(app, auth_client):
+    with app.app_context():
+        patient = Patient(first_name="Muchas", last_name="Notas", document="FTSR999")
+        db.session.add(patient)
+        db.session.flush()
+        db.session.add_all([MedicalRecord(patient_id=patient.id, title=f"Control {i}", notes="losartán 50 mg")
+                            for i in range(25)])
+        db.session.commit()
+    first = auth_client.get('/records/search?q=losartan').get_data(as_text=True)
+    second = auth_client.get('/records/search?q=losartan&page=2').get_data(as_text=True)
+    assert first.count('record-hit') == 20 and 'page=2' in first
+    assert second.count('record-hit') == 5 and 'page=3' not in second
+
+
+def test_search_is_restricted_to_admin_and_medico(app, client):
+    with app.app_context():
+        from app.models import User
+        nurse = User(username='enfermera', role='enfermero')
+        nurse.set_password('clave-segura')
+        db.session.add(nurse)
+        db.session.commit()
+    client.post('/auth/login', data={'username': 'enfermera', 'password': 'clave-segura'})
+    assert client.get('/records/search?q=metformina').status_code == 403
+
+
+def test_record_index_keeps_no_text_copy_and_follows_writes(app, auth_client):
+    from sqlalchemy import text
+    from app.adapters.sql_record_search import FTS_TABLE
+    with app.app_context():
+        patient = Patient(first_name="Indice", last_name="Externo", document="FTSR500")
+        db.session.add(patient)
+        db.session.flush()
+        record = MedicalRecord(patient_id=patient.id, title="Control", notes="Inicia enalapril 10 mg")
+        db.session.add(record)
+        db.session.commit()
+        # Contenido externo: no existe la tabla de copia del texto
+        shadow = db.session.execute(text(
+            "SELECT name FROM sqlite_master WHERE name = :name"), {"name": f"{FTS_TABLE}_content"}).first()
+        assert shadow is None
+
+        record.notes = "Cambia a losartán 50 mg"
+        db.session.commit()
+        patient_id = patient.id
+    assert 'record-hit' in auth_client.get('/records/search?q=losartan').get_data(as_text=True)
+    assert 'record-hit' not in auth_client.get('/records/search?q=enalapril').get_data(as_text=True)
+
+    with app.app_context():
+        # Borrar el paciente borra sus entradas por cascada y también del índice
+        db.session.delete(db.session.get(Patient, patient_id))
+        db.session.commit()
+        db.session.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('integrity-check')"))
+        assert db.session.execute(text(f"SELECT count(*) FROM {FTS_TABLE}('losartan')")).scalar() == 0
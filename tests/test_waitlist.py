@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta
+
+from app.adapters.waitlist_matcher import WaitlistMatcher
+from app.models import db, Patient, Appointment, WaitlistEntry
+
+T0 = datetime(2030, 5, 6, 8, 0)
+HOUR = timedelta(hours=1)
+
+
+def _matcher(*entries):
+    matcher = WaitlistMatcher(duration=timedelta(minutes=30))
+    matcher.build(entries)
+    return matcher
+
+
+def test_best_prefers_priority_then_arrival():
+    matcher = _matcher(
+        (1, 3, T0, T0, T0 + 10 * HOUR),
+        (2, 1, T0 + HOUR, T0, T0 + 10 * HOUR),
+        (3, 1, T0 + 2 * HOUR, T0, T0 + 10 * HOUR),
+    )
+    assert matcher.best(T0 + 2 * HOUR) == 2
+    matcher.remove(2)
+    assert matcher.best(T0 + 2 * HOUR) == 3
+    assert matcher.best(T0 + 2 * HOUR, exclude={3}) == 1
+
+
+def test_best_only_considers_windows_that_fit_the_slot():
+    matcher = _matcher(
+        (1, 1, T0, T0, T0 + HOUR),               # solo mañana temprano
+        (2, 5, T0, T0 + 4 * HOUR, T0 + 6 * HOUR),
+    )
+    assert matcher.best(T0 + timedelta(minutes=30)) == 1
+    # 08:45 termina 09:15, fuera de la ventana de la entrada 1
+    assert matcher.best(T0 + timedelta(minutes=45)) is None
+    assert matcher.best(T0 + 5 * HOUR) == 2
+    # Cupo fuera de la grilla de 15 minutos: se valida contra la ventana exacta
+    assert matcher.best(T0 + timedelta(minutes=31)) is None
+    assert matcher.best(T0 + 6 * HOUR) is None
+
+
+def test_off_grid_slots_match_exact_windows():
+    minutes = lambda m: T0 + timedelta(minutes=m)  # noqa: E731
+    matcher = _matcher(
+        (1, 1, T0, minutes(125), minutes(200)),   # 10:05 - 11:20
+        (2, 5, T0, minutes(120), minutes(150)),   # 10:00 - 10:30, solo cabe el cupo de las 10:00
+        (3, 9, T0, minutes(65), minutes(100)),    # 09:05 - 09:40, ningún inicio de la grilla cabe
+    )
+    # 10:10 cae dentro de la ventana de 1 aunque su paso (10:00) no
+    assert matcher.best(minutes(130)) == 1
+    # 10:00 solo cabe en 2; 1 abre 10:05
+    assert matcher.best(minutes(120)) == 2
+    assert matcher.best(minutes(66)) == 3
+    assert matcher.best(minutes(64)) is None and matcher.best(minutes(71)) is None
+    # El mejor candidato no cabe: se pasa al siguiente sin perderlo
+    matcher.upsert(4, 0, T0, minutes(120), minutes(152))
+    assert matcher.best(minutes(125)) == 1
+    assert matcher.best(minutes(120)) == 4
+
+
+def test_upsert_reorders_entry():
+    matcher = _matcher((1, 3, T0, T0, T0 + HOUR), (2, 2, T0, T0, T0 + HOUR))
+    matcher.upsert(1, 1, T0, T0, T0 + HOUR)
+    assert matcher.best(T0) == 1
+    assert len(matcher) == 2
+
+
+def _seed(app, priorities):
+    with app.app_context():
+        patients = [Patient(first_name="Espera", last_name=f"P{i}", document=f"WAIT{i:04d}") for i in range(len(priorities) + 1)]
+        db.session.add_all(patients)
+        db.session.flush()
+        appointment = Appointment(patient_id=patients[0].id, scheduled_at=datetime(2030, 5, 6, 10, 0))
+        db.session.add(appointment)
+        entries = [
+            WaitlistEntry(patient_id=p.id, priority=priority, window_start=datetime(2030, 5, 6, 8),
+                          window_end=datetime(2030, 5, 6, 18))
+            for p, priority in zip(patients[1:], priorities)
+        ]
+        db.session.add_all(entries)
+        db.session.commit()
+        return appointment.id, [e.id for e in entries], [p.id for p in patients[1:]]
+
+
+def test_cancel_offers_slot_and_accept_books_it(app, auth_client):
+    appointment_id, entry_ids, patient_ids = _seed(app, [3, 1])
+    html = auth_client.post(f'/appointments/{appointment_id}/cancel', follow_redirects=True).get_data(as_text=True)
+    assert f'entrada #{entry_ids[1]}' in html
+
+    with app.app_context():
+        entry = db.session.get(WaitlistEntry, entry_ids[1])
+        assert entry.status == 'offered' and entry.offered_slot == datetime(2030, 5, 6, 10, 0)
+        assert db.session.get(WaitlistEntry, entry_ids[0]).status == 'waiting'
+
+    assert auth_client.post(f'/appointments/waitlist/{entry_ids[1]}/accept').status_code == 302
+    with app.app_context():
+        assert db.session.get(WaitlistEntry, entry_ids[1]).status == 'booked'
+        booked = Appointment.query.filter_by(patient_id=patient_ids[1], status='scheduled').one()
+        assert booked.scheduled_at == datetime(2030, 5, 6, 10, 0)
+
+
+def test_decline_passes_offer_to_next(app, auth_client):
+    appointment_id, entry_ids, _ = _seed(app, [3, 1])
+    auth_client.post(f'/appointments/{appointment_id}/cancel')
+    auth_client.post(f'/appointments/waitlist/{entry_ids[1]}/decline')
+    with app.app_context():
+        assert db.session.get(WaitlistEntry, entry_ids[1]).status == 'waiting'
+        assert db.session.get(WaitlistEntry, entry_ids[0]).status == 'offered'
+
+
+def test_waitlist_page_and_join(app, auth_client):
+    _, _, patient_ids = _seed(app, [2])
+    html = auth_client.get('/appointments/waitlist').get_data(as_text=True)
+    assert html.count('class="waitlist-entry"') == 1
+
+    r = auth_client.post('/appointments/waitlist', data={
+        "patient_id": patient_ids[0],
+        "window_start": "2030-06-01 08:00",
+        "window_end": "2030-06-01 08:15",
+        "priority": 1,
+    })
+    assert 'La ventana debe admitir al menos una cita' in r.get_data(as_text=True)
+    r = auth_client.post('/appointments/waitlist', data={
+        "patient_id": patient_ids[0],
+        "window_start": "2030-06-01 08:00",
+        "window_end": "2030-06-05 12:00",
+        "priority": 1,
+    })
+    assert r.status_code == 302
+    with app.app_context():
+        assert WaitlistEntry.query.count() == 2